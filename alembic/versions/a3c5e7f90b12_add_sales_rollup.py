@@ -0,0 +1,44 @@
+"""add sales rollup
+
+Revision ID: a3c5e7f90b12
+Revises:
+Create Date: 2026-10-17 14:20:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "a3c5e7f90b12"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by the API's rollup refresher on startup (full build on the first run)
+    op.create_table(
+        "sales_rollup",
+        sa.Column("country", sa.String(), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("sum", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("max", sa.Float(), nullable=False),
+        sa.Column("median", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("country", "year"),
+    )
+    op.create_table(
+        "rollup_watermarks",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("last_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("refreshed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rollup_watermarks")
+    op.drop_table("sales_rollup")
@@ -0,0 +1,37 @@
+"""add product daily revenue
+
+Revision ID: b7d2e4f61c38
+Revises: a3c5e7f90b12
+Create Date: 2026-10-17 15:05:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d2e4f61c38"
+down_revision = "a3c5e7f90b12"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled by the API's rollup refresher on startup (full build on the first run)
+    op.create_table(
+        "product_daily_revenue",
+        sa.Column("country", sa.String(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("product_id", sa.Integer(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["product_id"], ["products.id"]),
+        sa.PrimaryKeyConstraint("country", "day", "product_id"),
+    )
+    op.create_index("ix_product_daily_revenue_day", "product_daily_revenue", ["day"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_product_daily_revenue_day", table_name="product_daily_revenue")
+    op.drop_table("product_daily_revenue")
@@ -0,0 +1,42 @@
+"""add customer order stats
+
+Revision ID: c4f8a1d2e975
+Revises: b7d2e4f61c38
+Create Date: 2026-10-17 16:20:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4f8a1d2e975"
+down_revision = "b7d2e4f61c38"
+branch_labels = None
+depends_on = None
+
+RANKING_COLUMNS = ("order_count", "total_spent", "max_order")
+
+
+def upgrade() -> None:
+    # Filled by the API's rollup refresher on startup (full build on the first run)
+    op.create_table(
+        "customer_order_stats",
+        sa.Column("customer_id", sa.Integer(), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("total_spent", sa.Float(), nullable=False),
+        sa.Column("max_order", sa.Float(), nullable=False),
+        sa.Column("first_order_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_order_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["customer_id"], ["customers.id"]),
+        sa.PrimaryKeyConstraint("customer_id"),
+    )
+    for column in RANKING_COLUMNS:
+        op.create_index(f"ix_customer_order_stats_{column}", "customer_order_stats", [column])
+
+
+def downgrade() -> None:
+    for column in RANKING_COLUMNS:
+        op.drop_index(f"ix_customer_order_stats_{column}", table_name="customer_order_stats")
+    op.drop_table("customer_order_stats")
@@ -0,0 +1,59 @@
+"""add order analytics indexes
+
+Revision ID: d9e3b5a7c146
+Revises: c4f8a1d2e975
+Create Date: 2026-10-17 18:10:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d9e3b5a7c146"
+down_revision = "c4f8a1d2e975"
+branch_labels = None
+depends_on = None
+
+DELIVERED = sa.text("status = 'delivered'")
+
+# (name, table, columns, partial index predicate)
+INDEXES = [
+    # Customer joins and the customer_order_stats refresh
+    ("ix_orders_customer_id", "orders", ["customer_id"], None),
+    # Rollup change windows (created_at OR updated_at since the last refresh)
+    ("ix_orders_created_at", "orders", ["created_at"], None),
+    # Also serve the max(updated_at) data versions are read from
+    ("ix_orders_updated_at", "orders", ["updated_at"], None),
+    ("ix_products_updated_at", "products", ["updated_at"], None),
+    ("ix_reviews_updated_at", "reviews", ["updated_at"], None),
+    # Delivered-order analytics: year ranges, and per-customer (country) lookups
+    ("ix_orders_delivered_created_at", "orders", ["created_at"], DELIVERED),
+    (
+        "ix_orders_delivered_customer_id_created_at",
+        "orders",
+        ["customer_id", "created_at"],
+        DELIVERED,
+    ),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps orders writable while the indexes build; it can't run in a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_where=where,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,32 @@
+"""add sales rollup percentiles
+
+Revision ID: e1a7c3f5b284
+Revises: d9e3b5a7c146
+Create Date: 2026-10-17 19:30:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e1a7c3f5b284"
+down_revision = "d9e3b5a7c146"
+branch_labels = None
+depends_on = None
+
+PERCENTILES = ("p90", "p95", "p99")
+
+
+def upgrade() -> None:
+    # Emptied and rebuilt with the new columns by the API's next rollup refresh
+    op.execute("DELETE FROM sales_rollup")
+    op.execute("UPDATE rollup_watermarks SET refreshed_at = NULL WHERE name = 'sales_rollup'")
+    for column in PERCENTILES:
+        op.add_column("sales_rollup", sa.Column(column, sa.Float(), nullable=False))
+
+
+def downgrade() -> None:
+    for column in PERCENTILES:
+        op.drop_column("sales_rollup", column)
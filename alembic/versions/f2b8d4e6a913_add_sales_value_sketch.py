@@ -0,0 +1,34 @@
+"""add sales value sketch
+
+Revision ID: f2b8d4e6a913
+Revises: e1a7c3f5b284
+Create Date: 2026-10-17 20:40:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f2b8d4e6a913"
+down_revision = "e1a7c3f5b284"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sales_value_sketch",
+        sa.Column("country", sa.String(), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("bucket", sa.Integer(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("country", "year", "bucket"),
+    )
+    # Maintained with sales_rollup: have its next refresh rebuild both
+    op.execute("UPDATE rollup_watermarks SET refreshed_at = NULL WHERE name = 'sales_rollup'")
+
+
+def downgrade() -> None:
+    op.drop_table("sales_value_sketch")
@@ -2,31 +2,378 @@
 Database configuration and session management
 """
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import asyncio
+import json
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import create_engine, event, exc, func, select, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
 
-# Create database engine
+# Postgres error code for a statement cancelled by statement_timeout or pg_cancel_backend
+QUERY_CANCELED_SQLSTATE = "57014"
+
+# Characters of the slowest statement sent in its debug header
+SLOWEST_STATEMENT_HEADER_CHARS = 200
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """SQL round-trips issued while serving a single request"""
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement: Optional[str] = None
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+
+    def as_headers(self) -> list[tuple[bytes, bytes]]:
+        headers = [
+            (b"x-db-query-count", str(self.count).encode()),
+            (b"x-db-time-ms", f"{self.total_ms:.2f}".encode()),
+            (b"x-db-slowest-ms", f"{self.slowest_ms:.2f}".encode()),
+        ]
+        if self.slowest_statement is not None:
+            # One line, cut short; header values can't hold newlines
+            statement = " ".join(self.slowest_statement.split())
+            if len(statement) > SLOWEST_STATEMENT_HEADER_CHARS:
+                statement = statement[: SLOWEST_STATEMENT_HEADER_CHARS - 3] + "..."
+            headers.append((b"x-db-slowest-statement", statement.encode("latin-1", "replace")))
+        return headers
+
+
+# Stats of the request being served in the current context (None outside requests)
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Adds the statement to the current request's stats and logs it when slow.
+    """
+    elapsed_ms = (time.perf_counter() - conn.info["query_start_time"].pop()) * 1000
+    if context is not None and context.execution_options.get("session_setup"):
+        # Transaction setup issued by the session itself, not by the request
+        return
+
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+    if elapsed_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "path": stats.path if stats else None,
+                    "duration_ms": round(elapsed_ms, 2),
+                    "threshold_ms": settings.SLOW_QUERY_THRESHOLD_MS,
+                    "statement": " ".join(statement.split()),
+                }
+            )
+        )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Hooks cursor execution events to time every statement the engine runs.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def get_async_url(url: str) -> str:
+    """
+    Converts a libpq-style Postgres URL into its asyncpg equivalent.
+    asyncpg understands `ssl` instead of `sslmode`, so it is renamed here.
+    """
+    parsed = make_url(url).set(drivername="postgresql+asyncpg")
+    if "sslmode" in parsed.query:
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed.render_as_string(hide_password=False)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that records how long callers wait to check out a connection.
+    The measured wait includes queueing for a free slot, opening new connections
+    and the pre-ping round-trip, i.e. everything a request pays before its first query.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+
+
+def get_pool_status(engine: AsyncEngine) -> dict:
+    """
+    Returns a snapshot of the engine's connection pool usage and checkout waits.
+    """
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        with pool._stats_lock:
+            status.update(
+                {
+                    "checkouts": pool.checkouts,
+                    "timeouts": pool.timeouts,
+                    "avg_wait_ms": (pool.total_wait / pool.checkouts * 1000)
+                    if pool.checkouts
+                    else 0.0,
+                    "max_wait_ms": pool.max_wait * 1000,
+                }
+            )
+    return status
+
+
+def create_api_engine(url: str) -> AsyncEngine:
+    """
+    Creates an async engine with the configured pool settings.
+    """
+    async_engine = create_async_engine(
+        get_async_url(url),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        echo=settings.DEBUG,
+    )
+    instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+def create_session_factory(bind: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """
+    Creates an async session factory bound to the given engine.
+    """
+    return async_sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+class Replica:
+    """A read replica engine with its cached health probe result"""
+
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_factory = create_session_factory(engine)
+        self.healthy = True
+        self.checked_at = float("-inf")
+
+
+class ReplicaRouter:
+    """
+    Routes read-only sessions across replicas in round-robin order.
+    A replica whose health probe fails is skipped until a later probe succeeds;
+    when no replica is healthy, reads fall back to the primary.
+    """
+
+    def __init__(
+        self,
+        primary: async_sessionmaker[AsyncSession],
+        replica_engines: list[AsyncEngine],
+        health_check_interval: float = 10.0,
+        probe_timeout: float = 2.0,
+    ):
+        self.primary = primary
+        self.replicas = [Replica(e) for e in replica_engines]
+        self.health_check_interval = health_check_interval
+        self.probe_timeout = probe_timeout
+        self._next = 0
+
+    async def probe(self, replica: Replica) -> bool:
+        """Runs SELECT 1 against the replica and caches the outcome"""
+        # Stamp first so concurrent requests don't all probe the same replica
+        replica.checked_at = time.monotonic()
+        try:
+            async with asyncio.timeout(self.probe_timeout):
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            replica.healthy = True
+        except Exception:
+            replica.healthy = False
+        return replica.healthy
+
+    def mark_unhealthy(self, replica: Replica) -> None:
+        """Takes a replica out of rotation until its next probe"""
+        replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+    async def choose(self) -> Replica | None:
+        """Returns the next healthy replica, or None to use the primary"""
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next % len(self.replicas)]
+            self._next += 1
+            if time.monotonic() - replica.checked_at >= self.health_check_interval:
+                await self.probe(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+
+# Async engine used by the API request path (primary)
+async_engine = create_api_engine(settings.DATABASE_URL)
+
+# Async session factory (primary)
+AsyncSessionLocal = create_session_factory(async_engine)
+
+# Read replicas for analytics queries
+replica_router = ReplicaRouter(
+    AsyncSessionLocal,
+    [create_api_engine(url) for url in settings.DATABASE_REPLICA_URLS],
+    health_check_interval=settings.REPLICA_HEALTH_CHECK_INTERVAL,
+    probe_timeout=settings.REPLICA_PROBE_TIMEOUT,
+)
+
+# Sync engine kept for Alembic and local scripts (seeder)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     echo=settings.DEBUG,
 )
 
-# Create session factory
+# Sync session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db():
+async def dispose_engines() -> None:
+    """
+    Closes pooled connections of the primary and every replica engine.
+    """
+    await async_engine.dispose()
+    for replica in replica_router.replicas:
+        await replica.engine.dispose()
+
+
+@event.listens_for(Session, "after_begin")
+def _prepare_transaction(session, transaction, connection):
+    """
+    Applies the session's statement timeout class to every transaction it opens
+    and remembers the backend pid so the running query can be cancelled later.
+    SET LOCAL keeps the setting scoped to the transaction, so pooled connections
+    never leak one request's timeout into the next.
     """
-    Dependency function to get database session
+    timeout_ms = session.info.get("statement_timeout_ms")
+    if timeout_ms:
+        connection.exec_driver_sql(
+            f"SET LOCAL statement_timeout = {int(timeout_ms)}",
+            execution_options={"session_setup": True},
+        )
+
+    get_server_pid = getattr(connection.connection.driver_connection, "get_server_pid", None)
+    if get_server_pid:
+        session.info["backend_pid"] = get_server_pid()
+
+
+def is_query_canceled(error: exc.DBAPIError) -> bool:
+    """True when Postgres cancelled the statement (statement_timeout or a cancel request)"""
+    return getattr(error.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE
+
+
+async def cancel_backend_query(db: AsyncSession) -> None:
     """
-    db = SessionLocal()
-    try:
+    Asks Postgres to cancel whatever the session's backend is running.
+    Sent over a separate pooled connection of the same engine.
+    """
+    pid = db.info.get("backend_pid")
+    if pid is None:
+        return
+    async with db.bind.connect() as conn:
+        await conn.execute(select(func.pg_cancel_backend(pid)))
+
+
+@asynccontextmanager
+async def primary_session(timeout_ms: int = settings.STATEMENT_TIMEOUT_MS):
+    """
+    Opens an async session on the primary with the given statement timeout.
+    """
+    async with AsyncSessionLocal() as db:
+        db.info["statement_timeout_ms"] = timeout_ms
         yield db
-    finally:
-        db.close()
+
+
+@asynccontextmanager
+async def read_session(timeout_ms: int = settings.ANALYTICS_STATEMENT_TIMEOUT_MS):
+    """
+    Opens an async read-only session with the given statement timeout.
+    Served by a healthy replica when replicas are configured, otherwise by the primary.
+    """
+    replica = await replica_router.choose()
+    if replica is None:
+        async with primary_session(timeout_ms) as db:
+            yield db
+        return
+
+    async with replica.session_factory() as db:
+        db.info["statement_timeout_ms"] = timeout_ms
+        try:
+            yield db
+        except exc.DBAPIError as e:
+            # A dropped connection means the replica went away mid-request
+            if e.connection_invalidated:
+                replica_router.mark_unhealthy(replica)
+            raise
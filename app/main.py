@@ -2,23 +2,78 @@
 FastAPI E-commerce Main Application
 """
 
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
 from fastapi import Depends, FastAPI, HTTPException, status
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
-from app.routers import customers, order_items, orders, products, reviews
+from app.database import dispose_engines
+from app.routers import admin, customers, order_items, orders, products, reviews
+from app.utils.data_versions import data_version_dependency
 from app.utils.dependencies import get_db
+from app.utils.order_snapshot import order_snapshot
 from app.utils.rate_limiter import rate_limit_dependency
+from app.utils.response_cache import prewarm, response_cache
+from app.utils.rollup_refresher import rollup_refresher
+from app.utils.sql_metrics import QueryStatsMiddleware
+
+
+def prewarm_paths() -> list[str]:
+    """Dashboard queries computed at startup: no filters and the current year"""
+    year = datetime.now(timezone.utc).year
+    return [
+        "/orders/sales-summary",
+        f"/orders/sales-summary?year={year}",
+        "/orders/sales-timeseries",
+        "/products/top-revenue",
+        f"/products/top-revenue?year={year}",
+        "/customers/per-country",
+        "/customers/most-frequent",
+        "/customers/high-value",
+    ]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: runs the rollup and response cache refreshers (and
+    loads the order snapshot and prewarms the cache in the background), and
+    releases pooled async connections on shutdown.
+    """
+    # Rollups built before (by an earlier run or another worker) are served
+    # right away; otherwise analytics come from orders until the first build ends
+    await rollup_refresher.check_built()
+    background = [
+        asyncio.create_task(response_cache.run_refresher()),
+        asyncio.create_task(rollup_refresher.run()),
+    ]
+    if settings.ORDER_SNAPSHOT_ENABLED:
+        # Loaded in the background; analytics are served from SQL until it is ready
+        background.append(asyncio.create_task(order_snapshot.try_refresh()))
+    if settings.RESPONSE_CACHE_PREWARM:
+        background.append(asyncio.create_task(prewarm(app, prewarm_paths())))
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await dispose_engines()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description=f"A modern analytics API built with {settings.PROJECT_NAME}",
     version="0.1.0",
-    dependencies=[Depends(rate_limit_dependency)],
+    dependencies=[Depends(rate_limit_dependency), Depends(data_version_dependency)],
     swagger_ui_parameters={"defaultModelsExpandDepth": 0},
+    lifespan=lifespan,
 )
 
+# Per-request SQL stats (X-DB-* response headers in debug mode)
+app.add_middleware(QueryStatsMiddleware)
 
 # Include routers
 app.include_router(customers.router, prefix="/customers", tags=["customers"])
@@ -26,6 +81,7 @@ app.include_router(products.router, prefix="/products", tags=["products"])
 app.include_router(orders.router, prefix="/orders", tags=["orders"])
 app.include_router(reviews.router, prefix="/reviews", tags=["reviews"])
 app.include_router(order_items.router, prefix="/order_items", tags=["order_items"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"], include_in_schema=False)
 
 
 @app.get("/", include_in_schema=False)
@@ -35,13 +91,13 @@ async def root():
 
 
 @app.get("/health", tags=["Health Check"], include_in_schema=False)
-async def check_db_health(db: Session = Depends(get_db)):
+async def check_db_health(db: AsyncSession = Depends(get_db)):
     """
     Health check endpoint that verifies database connectivity.
     """
     try:
         # We use db.execute(text("SELECT 1")) to check if the DB is responding
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         raise HTTPException(
@@ -4,11 +4,28 @@ Database models
 
 # Import models for Alembic
 from app.models.customer import Customer
+from app.models.customer_order_stats import CustomerOrderStats
 
 # Import OrderStatus enum (doesn't require database)
 from app.models.order import Order, OrderStatus
 from app.models.order_item import OrderItem
 from app.models.product import Product
+from app.models.product_daily_revenue import ProductDailyRevenue
 from app.models.review import Review
+from app.models.rollup_watermark import RollupWatermark
+from app.models.sales_rollup import SalesRollup
+from app.models.sales_value_sketch import SalesValueSketch
 
-__all__ = ["Customer", "Product", "Order", "OrderItem", "Review", "OrderStatus"]
+__all__ = [
+    "Customer",
+    "Product",
+    "Order",
+    "OrderItem",
+    "Review",
+    "OrderStatus",
+    "RollupWatermark",
+    "SalesRollup",
+    "ProductDailyRevenue",
+    "CustomerOrderStats",
+    "SalesValueSketch",
+]
@@ -0,0 +1,24 @@
+"""
+Customer order stats model
+"""
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer
+
+from app.database import Base
+
+
+class CustomerOrderStats(Base):
+    """
+    Order aggregates per customer (orders of any status), maintained by
+    rollup_repository.refresh_customer_order_stats from the orders table.
+    The ranking columns are indexed so customer rankings are index-ordered top-N reads.
+    """
+
+    __tablename__ = "customer_order_stats"
+
+    customer_id = Column(Integer, ForeignKey("customers.id"), primary_key=True)
+    order_count = Column(Integer, nullable=False, index=True)
+    total_spent = Column(Float, nullable=False, index=True)
+    max_order = Column(Float, nullable=False, index=True)
+    first_order_at = Column(DateTime(timezone=True))
+    last_order_at = Column(DateTime(timezone=True))
@@ -4,7 +4,7 @@ Order model
 
 import enum
 
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -27,12 +27,27 @@ class Order(Base):
     __tablename__ = "orders"
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
     total_amount = Column(Float, nullable=False)
     status = Column(String(50), nullable=False, default="pending")
     shipping_address = Column(String, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
 
     # Relationships
     customer = relationship("Customer", backref="orders")
+
+    # Partial indexes for the delivered-only analytics
+    __table_args__ = (
+        Index(
+            "ix_orders_delivered_created_at",
+            "created_at",
+            postgresql_where=text("status = 'delivered'"),
+        ),
+        Index(
+            "ix_orders_delivered_customer_id_created_at",
+            "customer_id",
+            "created_at",
+            postgresql_where=text("status = 'delivered'"),
+        ),
+    )
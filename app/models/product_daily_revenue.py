@@ -0,0 +1,23 @@
+"""
+Product daily revenue model
+"""
+
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String
+
+from app.database import Base
+
+
+class ProductDailyRevenue(Base):
+    """
+    Delivered revenue and units per (country, day, product), maintained by
+    rollup_repository.refresh_product_daily_revenue from orders and order_items.
+    """
+
+    __tablename__ = "product_daily_revenue"
+
+    # Empty string for customers without a country
+    country = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    revenue = Column(Float, nullable=False)
+    units = Column(Integer, nullable=False)
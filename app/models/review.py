@@ -20,7 +20,7 @@ class Review(Base):
     rating = Column(Integer, nullable=False, index=True)
     comment = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
 
     # Relationships
     product = relationship("Product", backref="reviews")
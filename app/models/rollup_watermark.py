@@ -0,0 +1,21 @@
+"""
+Rollup watermark model
+"""
+
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+
+from app.database import Base
+
+
+class RollupWatermark(Base):
+    """How far each rollup table has been refreshed from its source tables"""
+
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    # Highest source id already folded in
+    last_id = Column(Integer, nullable=False, default=0)
+    # Start of the last refresh (database clock); None until the first build
+    refreshed_at = Column(DateTime(timezone=True), nullable=True)
+    # Bumped whenever a refresh changed the rollup (drives ETags and cache invalidation)
+    version = Column(BigInteger, nullable=False, default=0)
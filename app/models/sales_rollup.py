@@ -0,0 +1,27 @@
+"""
+Sales rollup model
+"""
+
+from sqlalchemy import Column, Float, Integer, String
+
+from app.database import Base
+
+
+class SalesRollup(Base):
+    """
+    Delivered order totals per (country, year), maintained by
+    rollup_repository.refresh_sales_rollup from the orders table.
+    """
+
+    __tablename__ = "sales_rollup"
+
+    country = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    sum = Column(Float, nullable=False)
+    count = Column(Integer, nullable=False)
+    max = Column(Float, nullable=False)
+    # Exact percentile_cont values, recomputed whenever the group is refreshed
+    median = Column(Float, nullable=False)
+    p90 = Column(Float, nullable=False)
+    p95 = Column(Float, nullable=False)
+    p99 = Column(Float, nullable=False)
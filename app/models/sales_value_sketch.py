@@ -0,0 +1,28 @@
+"""
+Sales value sketch model
+"""
+
+from sqlalchemy import Column, Integer, String
+
+from app.database import Base
+
+
+class SalesValueSketch(Base):
+    """
+    Quantile sketch of delivered order values per (country, year): how many
+    orders fall in each logarithmic value bucket. Maintained alongside
+    sales_rollup by rollup_repository.refresh_sales_rollup.
+
+    Bucket i holds values in (gamma^(i-1), gamma^i] with
+    gamma = (1 + a) / (1 - a) for the relative accuracy a (SKETCH_RELATIVE_ACCURACY),
+    and reports 2 * gamma^i / (gamma + 1), which is within a relative error of
+    a of every value in the bucket. Sketches merge by adding counts per bucket,
+    so quantiles across any set of countries and years keep the same bound.
+    """
+
+    __tablename__ = "sales_value_sketch"
+
+    country = Column(String, primary_key=True)
+    year = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
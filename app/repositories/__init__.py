@@ -1,5 +1,9 @@
 """
 Repository modules for database access
+
+Statements are built once per filter shape (lru_cache'd `_*_stmt` builders)
+and executed with bound parameters, so a call skips query construction and
+goes straight to SQLAlchemy's compiled-statement cache.
 """
 
 from app.repositories import (
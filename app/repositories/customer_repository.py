@@ -2,85 +2,190 @@
 Customer repository - Database access layer for customers
 """
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from functools import lru_cache
+
+from sqlalchemy import Integer, bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.customer import Customer
+from app.models.customer_order_stats import CustomerOrderStats
 from app.models.order import Order
 
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> list[Customer]:
-    """Get all customers with pagination"""
-    return db.query(Customer).offset(skip).limit(limit).all()  # type: ignore[return-value]
+@lru_cache
+def _all_stmt():
+    return (
+        select(Customer)
+        .offset(bindparam("skip", type_=Integer))
+        .limit(bindparam("limit", type_=Integer))
+    )
 
 
-def get_by_id(db: Session, customer_id: int) -> Customer | None:
-    """Get a specific customer by ID"""
-    return db.query(Customer).filter(Customer.id == customer_id).first()  # type: ignore[return-value]
+@lru_cache
+def _by_id_stmt():
+    return select(Customer).where(Customer.id == bindparam("customer_id"))
 
 
-def get_most_frequent(db: Session, limit: int = 5):
-    """
-    Returns top N customers ordered by total number of purchases (descending).
-    """
-    query = (
-        db.query(
+def _stats_total():
+    # Every customer_order_stats row is a customer with at least one order. A scalar
+    # subquery rather than COUNT(*) OVER (), which would read every row before the LIMIT
+    return (
+        select(func.count()).select_from(CustomerOrderStats).scalar_subquery().label("total_groups")
+    )
+
+
+@lru_cache
+def _most_frequent_stmt():
+    return (
+        select(
             Customer.name,
             Customer.email,
             Customer.country,
             Customer.city,
             Customer.signup_date,
-            func.count(Order.id).label("purchases_count"),
+            CustomerOrderStats.order_count.label("purchases_count"),
+            _stats_total(),
         )
-        .join(Order, Customer.id == Order.customer_id)
-        .group_by(Customer.id)
+        .join(Customer, CustomerOrderStats.customer_id == Customer.id)
+        # Walks ix_customer_order_stats_order_count backwards and stops after limit rows
+        .order_by(CustomerOrderStats.order_count.desc())
+        .limit(bindparam("limit", type_=Integer))
     )
 
-    total_groups = db.query(query.subquery()).count()
-    results = query.order_by(func.count(Order.id).desc()).limit(limit).all()
 
-    return results, total_groups
+@lru_cache
+def _high_value_stmt(total: bool):
+    value = CustomerOrderStats.total_spent if total else CustomerOrderStats.max_order
+    return (
+        select(
+            Customer.name,
+            Customer.email,
+            Customer.country,
+            Customer.city,
+            value.label("value"),
+            _stats_total(),
+        )
+        .join(Customer, CustomerOrderStats.customer_id == Customer.id)
+        .order_by(value.desc())
+        .limit(bindparam("limit", type_=Integer))
+    )
 
 
-def get_high_value(db: Session, total: bool = True, limit: int = 5):
-    """
-    Returns customers ranked by monetary value (descending).
-    If total=True, ranks by SUM(total_amount).
-    If total=False, ranks by MAX(total_amount).
-    """
+@lru_cache
+def _most_frequent_from_orders_stmt():
+    purchases_count = func.count(Order.id)
+    return (
+        select(
+            Customer.name,
+            Customer.email,
+            Customer.country,
+            Customer.city,
+            Customer.signup_date,
+            purchases_count.label("purchases_count"),
+            # Number of groups, computed before the LIMIT applies
+            func.count().over().label("total_groups"),
+        )
+        .join(Order, Customer.id == Order.customer_id)
+        .group_by(Customer.id)
+        .order_by(purchases_count.desc())
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+@lru_cache
+def _high_value_from_orders_stmt(total: bool):
     agg = func.sum(Order.total_amount) if total else func.max(Order.total_amount)
-    query = (
-        db.query(
+    return (
+        select(
             Customer.name,
             Customer.email,
             Customer.country,
             Customer.city,
             agg.label("value"),
+            # Number of groups, computed before the LIMIT applies
+            func.count().over().label("total_groups"),
         )
         .join(Order, Customer.id == Order.customer_id)
         .group_by(Customer.id)
+        .order_by(agg.desc())
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+@lru_cache
+def _count_per_country_stmt():
+    count_column = func.count(Customer.id).label("customer_count")
+    return (
+        select(Customer.country, count_column)
+        .group_by(Customer.country)
+        .order_by(count_column.desc())
     )
 
-    total_groups = db.query(query.subquery()).count()
-    results = query.order_by(agg.desc()).limit(limit).all()
+
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Customer]:
+    """Get all customers with pagination"""
+    result = await db.scalars(_all_stmt(), {"skip": skip, "limit": limit})
+    return list(result.all())
+
+
+async def get_by_id(db: AsyncSession, customer_id: int) -> Customer | None:
+    """Get a specific customer by ID"""
+    return await db.scalar(_by_id_stmt(), {"customer_id": customer_id})
+
+
+async def get_most_frequent(db: AsyncSession, limit: int = 5):
+    """
+    Returns top N customers ordered by total number of purchases (descending).
+    Read from the customer_order_stats rollup, which the rollup refresher keeps current.
+    """
+    results = (await db.execute(_most_frequent_stmt(), {"limit": limit})).all()
+    total_groups = results[0].total_groups if results else 0
 
     return results, total_groups
 
 
-def get_customer_count_per_country(db: Session):
+async def get_high_value(db: AsyncSession, total: bool = True, limit: int = 5):
+    """
+    Returns customers ranked by monetary value (descending).
+    If total=True, ranks by SUM(total_amount).
+    If total=False, ranks by MAX(total_amount).
+    Read from the customer_order_stats rollup, which the rollup refresher keeps current.
+    """
+    results = (await db.execute(_high_value_stmt(total), {"limit": limit})).all()
+    total_groups = results[0].total_groups if results else 0
+
+    return results, total_groups
+
+
+async def get_most_frequent_from_orders(db: AsyncSession, limit: int = 5):
+    """
+    Same result as get_most_frequent, grouping orders by customer on every call.
+    The reference the rollup is checked against.
+    """
+    stmt = _most_frequent_from_orders_stmt()
+    results = (await db.execute(stmt, {"limit": limit})).all()
+    total_groups = results[0].total_groups if results else 0
+
+    return results, total_groups
+
+
+async def get_high_value_from_orders(db: AsyncSession, total: bool = True, limit: int = 5):
+    """
+    Same result as get_high_value, grouping orders by customer on every call.
+    The reference the rollup is checked against.
+    """
+    stmt = _high_value_from_orders_stmt(total)
+    results = (await db.execute(stmt, {"limit": limit})).all()
+    total_groups = results[0].total_groups if results else 0
+
+    return results, total_groups
+
+
+async def get_customer_count_per_country(db: AsyncSession):
     """
     Groups customers by country and counts them.
     Aggregates at the database level.
     """
-    count_column = func.count(Customer.id).label("customer_count")
-    results = (
-        db.query(
-            Customer.country,
-            count_column,
-        )
-        .group_by(Customer.country)
-        .order_by(count_column.desc())
-        .all()
-    )
+    results = (await db.execute(_count_per_country_stmt())).all()
 
     return results, len(results)
@@ -2,16 +2,34 @@
 OrderItem repository - Database access layer for order items
 """
 
-from sqlalchemy.orm import Session
+from functools import lru_cache
+
+from sqlalchemy import Integer, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.order_item import OrderItem
 
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> list[OrderItem]:
+@lru_cache
+def _all_stmt():
+    return (
+        select(OrderItem)
+        .offset(bindparam("skip", type_=Integer))
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+@lru_cache
+def _by_id_stmt():
+    return select(OrderItem).where(OrderItem.id == bindparam("order_item_id"))
+
+
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[OrderItem]:
     """Get all order items with pagination"""
-    return db.query(OrderItem).offset(skip).limit(limit).all()  # type: ignore[return-value]
+    result = await db.scalars(_all_stmt(), {"skip": skip, "limit": limit})
+    return list(result.all())
 
 
-def get_by_id(db: Session, order_item_id: int) -> OrderItem | None:
+async def get_by_id(db: AsyncSession, order_item_id: int) -> OrderItem | None:
     """Get a specific order item by ID"""
-    return db.query(OrderItem).filter(OrderItem.id == order_item_id).first()  # type: ignore[return-value]
+    return await db.scalar(_by_id_stmt(), {"order_item_id": order_item_id})
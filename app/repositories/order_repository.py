@@ -2,84 +2,446 @@
 Order repository - Database access layer for orders
 """
 
-from typing import Optional
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional
 
-from sqlalchemy import extract, func
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    and_,
+    bindparam,
+    cast,
+    extract,
+    func,
+    literal_column,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.customer import Customer
 from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product import Product
+from app.models.product_daily_revenue import ProductDailyRevenue
+from app.models.sales_rollup import SalesRollup
+from app.models.sales_value_sketch import SalesValueSketch
+from app.repositories.rollup_repository import PERCENTILES, sketch_bucket_value
 
+# Sales summary metrics, in response order; count is always returned
+SALES_METRICS = ("sum", "avg", "median", "max", "count", "p90", "p95", "p99")
+DEFAULT_SALES_METRICS = ("sum", "avg", "median", "max", "count")
+# Keys sales summaries can be grouped by, besides the default (country, year)
+SALES_GROUP_BY = ("country", "year")
+# Bucket sizes of the sales time series (Postgres date_trunc fields)
+SALES_INTERVALS = ("day", "week", "month", "quarter")
+# Most buckets one time series may have (ten years of days)
+MAX_SALES_BUCKETS = 3660
 
-def get_all(db: Session, skip: int = 0, limit: int = 100) -> list[Order]:
+SalesBucket = namedtuple("SalesBucket", "bucket revenue units")
+
+
+@lru_cache
+def _all_stmt():
+    return (
+        select(Order)
+        .offset(bindparam("skip", type_=Integer))
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+@lru_cache
+def _by_id_stmt():
+    return select(Order).where(Order.id == bindparam("order_id"))
+
+
+@lru_cache
+def _counts_by_status_stmt(by_status: bool):
+    query = select(Order.status, func.count(Order.status).label("count"))
+    if by_status:
+        query = query.where(Order.status == bindparam("order_status"))
+    return query.group_by(Order.status)
+
+
+def normalize_sales_metrics(metrics: Iterable[str]) -> tuple:
+    """Deduplicated metrics in SALES_METRICS order, so equal requests share a statement"""
+    requested = set(metrics)
+    unknown = requested - set(SALES_METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {sorted(unknown)}")
+    return tuple(m for m in SALES_METRICS if m in requested)
+
+
+@lru_cache
+def _sales_summary_stmt(metrics: tuple, by_country: bool, by_year: bool):
+    # Extract year from created_at
+    order_year = extract("year", Order.created_at).label("year")
+
+    # Only the requested metrics are aggregated; sum also orders the groups
+    sum_agg = func.sum(Order.total_amount)
+    aggregates = {
+        "sum": sum_agg.label("sum"),
+        "avg": func.avg(Order.total_amount).label("average"),
+        "max": func.max(Order.total_amount).label("max"),
+        **{
+            metric: func.percentile_cont(fraction).within_group(Order.total_amount).label(metric)
+            for metric, fraction in PERCENTILES.items()
+        },
+    }
+
+    # Base query for aggregation - Restricted to 'delivered'
+    query = (
+        select(
+            Customer.country.label("country"),
+            order_year,
+            func.count(Order.id).label("count"),
+            *(aggregates[m] for m in metrics if m in aggregates),
+        )
+        .join(Customer, Order.customer_id == Customer.id)
+        # Customers without a country are left out, as in the sales rollup
+        .where(Order.status == "delivered", Customer.country.is_not(None))
+    )
+
+    # Filters
+    if by_country:
+        query = query.where(Customer.country == bindparam("country"))
+    if by_year:
+        # Half-open range on the bare column, so created_at indexes apply
+        year = bindparam("year", type_=Integer)
+        query = query.where(
+            Order.created_at >= func.make_timestamptz(year, 1, 1, 0, 0, 0),
+            Order.created_at < func.make_timestamptz(year + 1, 1, 1, 0, 0, 0),
+        )
+
+    # Grouping and Ordering
+    return query.group_by(Customer.country, order_year).order_by(order_year.desc(), sum_agg.desc())
+
+
+async def get_all(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[Order]:
     """Get all orders with pagination"""
-    return db.query(Order).offset(skip).limit(limit).all()  # type: ignore[return-value]
+    result = await db.scalars(_all_stmt(), {"skip": skip, "limit": limit})
+    return list(result.all())
 
 
-def get_by_id(db: Session, order_id: int) -> Order | None:
+async def get_by_id(db: AsyncSession, order_id: int) -> Order | None:
     """Get a specific order by ID"""
-    return db.query(Order).filter(Order.id == order_id).first()  # type: ignore[return-value]
+    return await db.scalar(_by_id_stmt(), {"order_id": order_id})
 
 
-def get_order_counts_by_status(db: Session, order_status: str):
+async def get_order_counts_by_status(db: AsyncSession, order_status: str):
     """
     Groups orders by status and counts them
     """
-    query = db.query(Order.status, func.count(Order.status).label("count"))
-    if order_status:
-        query = query.filter(Order.status == order_status)
-
-    results = query.group_by(Order.status).all()
+    stmt = _counts_by_status_stmt(bool(order_status))
+    results = (await db.execute(stmt, {"order_status": order_status})).all()
     return results, len(results)
 
 
-def get_sales_summary(
-    db: Session,
-    metric: Optional[str] = None,
+@lru_cache
+def _sales_rollup_stmt(metrics: tuple, by_country: bool, by_year: bool):
+    columns = {
+        "sum": SalesRollup.sum,
+        "avg": (SalesRollup.sum / cast(SalesRollup.count, Float)).label("average"),
+        "max": SalesRollup.max,
+        **{metric: getattr(SalesRollup, metric) for metric in PERCENTILES},
+    }
+    query = select(
+        SalesRollup.country,
+        SalesRollup.year,
+        SalesRollup.count,
+        *(columns[m] for m in metrics if m in columns),
+    )
+    if by_country:
+        query = query.where(SalesRollup.country == bindparam("country"))
+    if by_year:
+        query = query.where(SalesRollup.year == bindparam("year", type_=Integer))
+    return query.order_by(SalesRollup.year.desc(), SalesRollup.sum.desc())
+
+
+def _sketch_quantiles(percentiles: tuple, keys: tuple, filtered):
+    """
+    Subquery of the requested percentiles per group of keys, merged from the
+    value sketches: bucket counts are added up across the merged (country, year)
+    groups. Like percentile_cont, a percentile interpolates between the values
+    at ranks floor(fraction * (n - 1)) and the one after, each the value of the
+    first bucket whose cumulative count passes that rank.
+    """
+    sketch_keys = [getattr(SalesValueSketch, k) for k in keys]
+    merged = filtered(
+        select(*sketch_keys, SalesValueSketch.bucket, func.sum(SalesValueSketch.count).label("n")),
+        SalesValueSketch,
+    ).group_by(*sketch_keys, SalesValueSketch.bucket)
+    merged = merged.subquery("merged")
+
+    merged_keys = [merged.c[k] for k in keys]
+    cumulative = select(
+        *merged_keys,
+        merged.c.bucket,
+        func.sum(merged.c.n).over(partition_by=merged_keys, order_by=merged.c.bucket).label("cum"),
+        func.sum(merged.c.n).over(partition_by=merged_keys).label("total"),
+    ).subquery("cumulative")
+
+    def percentile(fraction: float):
+        rank = fraction * (cumulative.c.total - 1)
+        lower = func.min(cumulative.c.bucket).filter(cumulative.c.cum > func.floor(rank))
+        # The last rank has no successor; max(bucket) holds it
+        upper = func.coalesce(
+            func.min(cumulative.c.bucket).filter(cumulative.c.cum > func.floor(rank) + 1),
+            func.max(cumulative.c.bucket),
+        )
+        group_rank = fraction * (func.max(cumulative.c.total) - 1)
+        weight = cast(group_rank - func.floor(group_rank), Float)
+        lower_value = sketch_bucket_value(lower)
+        return lower_value + (sketch_bucket_value(upper) - lower_value) * weight
+
+    group_keys = [cumulative.c[k] for k in keys]
+    return (
+        select(*group_keys, *(percentile(PERCENTILES[m]).label(m) for m in percentiles))
+        .group_by(*group_keys)
+        .subquery("quantiles")
+    )
+
+
+@lru_cache
+def _sales_merged_stmt(metrics: tuple, keys: tuple, by_country: bool, by_year: bool):
+    """
+    Sales summary per group of keys, merged from the (country, year) rollup
+    groups: totals from sales_rollup, percentiles from the value sketches.
+    """
+
+    def filtered(query, model):
+        if by_country:
+            query = query.where(model.country == bindparam("country"))
+        if by_year:
+            query = query.where(model.year == bindparam("year", type_=Integer))
+        return query
+
+    rollup_keys = [getattr(SalesRollup, k) for k in keys]
+    count = func.sum(SalesRollup.count)
+    total = func.sum(SalesRollup.sum)
+    totals = filtered(
+        select(
+            *rollup_keys,
+            count.label("count"),
+            total.label("sum"),
+            (total / cast(count, Float)).label("average"),
+            func.max(SalesRollup.max).label("max"),
+        ),
+        SalesRollup,
+    )
+    totals = totals.group_by(*rollup_keys).subquery("totals")
+
+    columns = {"sum": totals.c.sum, "avg": totals.c.average, "max": totals.c.max}
+    query = select(
+        *(totals.c[k] for k in keys),
+        cast(totals.c["count"], Integer).label("count"),
+        *(columns[m] for m in metrics if m in columns),
+    )
+    percentiles = tuple(m for m in metrics if m in PERCENTILES)
+    if percentiles:
+        quantiles = _sketch_quantiles(percentiles, keys, filtered)
+        query = query.add_columns(*(quantiles.c[m] for m in percentiles)).join(
+            quantiles, and_(*(totals.c[k] == quantiles.c[k] for k in keys))
+        )
+
+    order = [totals.c.year.desc()] if "year" in keys else []
+    return query.order_by(*order, totals.c.sum.desc())
+
+
+async def get_sales_summary(
+    db: AsyncSession,
+    metrics: Iterable[str] = DEFAULT_SALES_METRICS,
     country: Optional[str] = None,
     year: Optional[int] = None,
+    approx: bool = False,
+    group_by: Optional[str] = None,
 ):
     """
     Returns a sales summary with aggregated metrics grouped by country and year.
     Only includes 'delivered' orders for data reliability.
-    Supported metrics: sum, avg, median, max, count.
+    Supported metrics: sum, avg, median, max, count, p90, p95, p99. Only the
+    requested ones are selected; count is always included.
+    Read from the sales_rollup table, which the rollup refresher keeps current.
+
+    approx=True reads the percentiles from the mergeable value sketches instead
+    (within SKETCH_RELATIVE_ACCURACY of the exact value). group_by ("country" or
+    "year") merges the (country, year) groups into one per key; exact
+    percentiles can't be merged, so with group_by they require approx=True.
     """
-    # Extract year from created_at
-    order_year = extract("year", Order.created_at).label("year")
+    metrics = normalize_sales_metrics(metrics)
+    params = {"country": country, "year": year}
 
-    # Metrics to calculate
-    sum_agg = func.sum(Order.total_amount).label("sum")
-    avg_agg = func.avg(Order.total_amount).label("average")
-    max_agg = func.max(Order.total_amount).label("max")
-    median_agg = func.percentile_cont(0.5).within_group(Order.total_amount).label("median")
-    count_agg = func.count(Order.id).label("count")
+    if not approx and group_by is None:
+        stmt = _sales_rollup_stmt(metrics, bool(country), bool(year))
+        results = (await db.execute(stmt, params)).all()
+        return results, len(results)
 
-    # Base query for aggregation - Restricted to 'delivered'
+    if group_by is not None and group_by not in SALES_GROUP_BY:
+        raise ValueError(f"Unknown group_by: {group_by}")
+    if not approx and any(m in PERCENTILES for m in metrics):
+        raise ValueError("Percentiles across merged groups require approx=True")
+
+    keys = (group_by,) if group_by else SALES_GROUP_BY
+    stmt = _sales_merged_stmt(metrics, keys, bool(country), bool(year))
+    results = (await db.execute(stmt, params)).all()
+
+    return results, len(results)
+
+
+async def get_sales_summary_from_orders(
+    db: AsyncSession,
+    metrics: Iterable[str] = DEFAULT_SALES_METRICS,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+):
+    """
+    Same result as get_sales_summary, aggregated from the orders table on every
+    call. The reference the rollup is checked against. Only the requested
+    metrics are aggregated, so leaving out the percentiles skips their sort.
+    """
+    stmt = _sales_summary_stmt(normalize_sales_metrics(metrics), bool(country), bool(year))
+    results = (await db.execute(stmt, {"country": country, "year": year})).all()
+
+    return results, len(results)
+
+
+def _bucket(interval: str, day):
+    """
+    First day of the bucket a day falls in. Truncates a timestamp (not a
+    timestamptz), so buckets don't shift with the session time zone. The
+    interval is inlined, so GROUP BY sees the same expression as the select.
+    """
+    if interval not in SALES_INTERVALS:
+        raise ValueError(f"Unknown interval: {interval}")
+    truncated = func.date_trunc(literal_column(f"'{interval}'"), cast(day, DateTime))
+    return cast(truncated, Date).label("bucket")
+
+
+@lru_cache
+def _sales_timeseries_stmt(interval: str, by_country: bool, by_category: bool):
+    day = ProductDailyRevenue.day
+    bucket = _bucket(interval, day)
+    query = select(
+        bucket,
+        func.sum(ProductDailyRevenue.revenue).label("revenue"),
+        func.sum(ProductDailyRevenue.units).label("units"),
+    ).where(day >= bindparam("start_date", type_=Date), day <= bindparam("end_date", type_=Date))
+    if by_country:
+        query = query.where(ProductDailyRevenue.country == bindparam("country"))
+    if by_category:
+        query = query.join(Product, ProductDailyRevenue.product_id == Product.id).where(
+            Product.category == bindparam("category")
+        )
+    return query.group_by(bucket).order_by(bucket)
+
+
+@lru_cache
+def _sales_timeseries_from_orders_stmt(interval: str, by_country: bool, by_category: bool):
+    day = cast(Order.created_at, Date)
+    bucket = _bucket(interval, day)
     query = (
-        db.query(
-            Customer.country.label("country"),
-            order_year,
-            sum_agg,
-            avg_agg,
-            max_agg,
-            median_agg,
-            count_agg,
+        select(
+            bucket,
+            func.sum(OrderItem.quantity * OrderItem.price).label("revenue"),
+            func.sum(OrderItem.quantity).label("units"),
+        )
+        .join(Order, OrderItem.order_id == Order.id)
+        .where(
+            Order.status == "delivered",
+            day >= bindparam("start_date", type_=Date),
+            day <= bindparam("end_date", type_=Date),
         )
-        .join(Customer, Order.customer_id == Customer.id)
-        .filter(Order.status == "delivered")
     )
+    if by_country:
+        query = query.join(Customer, Order.customer_id == Customer.id).where(
+            Customer.country == bindparam("country")
+        )
+    if by_category:
+        query = query.join(Product, OrderItem.product_id == Product.id).where(
+            Product.category == bindparam("category")
+        )
+    return query.group_by(bucket).order_by(bucket)
 
-    # Filters
-    if country:
-        query = query.filter(Customer.country == country)
-    if year:
-        query = query.filter(order_year == year)
 
-    # Grouping and Ordering
-    results = (
-        query.group_by(Customer.country, order_year)
-        .order_by(order_year.desc(), sum_agg.desc())
-        .all()
-    )
+def sales_bucket_starts(interval: str, start_date: date, end_date: date) -> list[date]:
+    """First day of every bucket overlapping [start_date, end_date], like date_trunc"""
+    if interval == "day":
+        bucket = start_date
+    elif interval == "week":
+        # ISO weeks start on Monday
+        bucket = start_date - timedelta(days=start_date.weekday())
+    else:
+        months = 1 if interval == "month" else 3
+        bucket = start_date.replace(month=(start_date.month - 1) // months * months + 1, day=1)
+
+    buckets = []
+    while bucket <= end_date:
+        buckets.append(bucket)
+        if len(buckets) > MAX_SALES_BUCKETS:
+            raise ValueError(f"More than {MAX_SALES_BUCKETS} buckets; use a larger interval")
+        if interval == "day":
+            bucket += timedelta(days=1)
+        elif interval == "week":
+            bucket += timedelta(days=7)
+        else:
+            month = bucket.month - 1 + months
+            bucket = bucket.replace(year=bucket.year + month // 12, month=month % 12 + 1)
+    return buckets
+
+
+async def _sales_timeseries(db: AsyncSession, stmt, interval, start_date, end_date, params):
+    # Validated before querying, so a too-long range never reaches the database
+    buckets = sales_bucket_starts(interval, start_date, end_date)
+    params = {"start_date": start_date, "end_date": end_date, **params}
+    totals = {row.bucket: row for row in (await db.execute(stmt, params)).all()}
 
+    results = []
+    for bucket in buckets:
+        row = totals.get(bucket)
+        if row is None:
+            # No delivered sales in the bucket
+            results.append(SalesBucket(bucket, 0.0, 0))
+        else:
+            results.append(SalesBucket(bucket, float(row.revenue), int(row.units)))
     return results, len(results)
+
+
+async def get_sales_timeseries(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    interval: str = "month",
+    country: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """
+    Returns delivered revenue and units per day, week, month or quarter from
+    start_date to end_date (inclusive), oldest first. Every bucket in the range
+    is returned, with zeros where nothing was sold; the first and last buckets
+    only count the days inside the range. Optionally filtered by customer
+    country and product category.
+    Read from the product_daily_revenue rollup, which the rollup refresher keeps current.
+    """
+    stmt = _sales_timeseries_stmt(interval, bool(country), bool(category))
+    params = {"country": country, "category": category}
+    return await _sales_timeseries(db, stmt, interval, start_date, end_date, params)
+
+
+async def get_sales_timeseries_from_orders(
+    db: AsyncSession,
+    start_date: date,
+    end_date: date,
+    interval: str = "month",
+    country: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """
+    Same result as get_sales_timeseries, aggregated from orders and order items
+    on every call. The reference the rollup is checked against.
+    """
+    stmt = _sales_timeseries_from_orders_stmt(interval, bool(country), bool(category))
+    params = {"country": country, "category": category}
+    return await _sales_timeseries(db, stmt, interval, start_date, end_date, params)
@@ -2,25 +2,25 @@
 Order Status repository - Database access layer for order statuses
 """
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from functools import lru_cache
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.order import Order
 
 
-def get_order_counts_by_status(db: Session, order_status: str):
+@lru_cache
+def _counts_by_status_stmt(by_status: bool):
+    query = select(Order.status, func.count(Order.status).label("count"))
+    if by_status:
+        query = query.where(Order.status == bindparam("order_status"))
+    return query.group_by(Order.status)
+
+
+async def get_order_counts_by_status(db: AsyncSession, order_status: str):
     """
     Groups orders by status and counts them
     """
-    if not order_status:
-        return (
-            db.query(Order.status, func.count(Order.status).label("count"))
-            .group_by(Order.status)
-            .all()
-        )
-    return (
-        db.query(Order.status, func.count(Order.status).label("count"))
-        .filter(Order.status == order_status)
-        .group_by(Order.status)
-        .all()
-    )
+    stmt = _counts_by_status_stmt(bool(order_status))
+    return (await db.execute(stmt, {"order_status": order_status})).all()
@@ -2,74 +2,168 @@
 Product repository - Database access layer for products
 """
 
+from datetime import date
+from functools import lru_cache
 from typing import Optional
 
-from sqlalchemy import extract, func
-from sqlalchemy.orm import Session
+from sqlalchemy import Date, Integer, bindparam, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.customer import Customer
 from app.models.order import Order
 from app.models.order_item import OrderItem
 from app.models.product import Product
+from app.models.product_daily_revenue import ProductDailyRevenue
 
 
-def get_all(
-    db: Session, skip: int = 0, limit: int = 100, category: str | None = None
-) -> list[Product]:
-    """Get all products with optional category filter and pagination"""
-    query = db.query(Product)
-    if category:
-        query = query.filter(Product.category == category)
-    return query.offset(skip).limit(limit).all()  # type: ignore[return-value]
+@lru_cache
+def _all_stmt(by_category: bool):
+    query = select(Product)
+    if by_category:
+        query = query.where(Product.category == bindparam("category"))
+    return query.offset(bindparam("skip", type_=Integer)).limit(bindparam("limit", type_=Integer))
 
 
-def get_by_id(db: Session, product_id: int) -> Product | None:
-    """Get a specific product by ID"""
-    return db.query(Product).filter(Product.id == product_id).first()  # type: ignore[return-value]
+@lru_cache
+def _by_id_stmt():
+    return select(Product).where(Product.id == bindparam("product_id"))
 
 
-def get_top_products_by_revenue(
-    db: Session,
-    limit: int = 5,
-    country: Optional[str] = None,
-    year: Optional[int] = None,
-):
-    """
-    Returns top products ranked by revenue.
-    Revenue is computed only for 'delivered' orders.
-    """
+@lru_cache
+def _top_revenue_stmt(by_country: bool, by_year: bool, by_start: bool, by_end: bool):
+    revenue_agg = func.sum(ProductDailyRevenue.revenue).label("revenue")
+    day = ProductDailyRevenue.day
+
+    query = select(Product.id, Product.name, revenue_agg).join(
+        ProductDailyRevenue, Product.id == ProductDailyRevenue.product_id
+    )
+
+    # Optional filters, all on the rollup's (country, day) key
+    if by_country:
+        query = query.where(ProductDailyRevenue.country == bindparam("country"))
+    if by_year:
+        query = query.where(
+            day >= bindparam("year_start", type_=Date), day < bindparam("year_end", type_=Date)
+        )
+    if by_start:
+        query = query.where(day >= bindparam("start_date", type_=Date))
+    if by_end:
+        query = query.where(day <= bindparam("end_date", type_=Date))
+
+    # Group by product
+    query = query.group_by(Product.id, Product.name)
+
+    # Total groups before limit, in the same statement as the ranked page
+    query = query.add_columns(func.count().over().label("total_groups"))
+    return query.order_by(revenue_agg.desc()).limit(bindparam("limit", type_=Integer))
+
+
+@lru_cache
+def _top_revenue_from_orders_stmt(by_country: bool, by_year: bool, by_start: bool, by_end: bool):
     # CTE for delivered orders
     delivered_orders_cte = (
-        db.query(Order.id, Order.customer_id, Order.created_at)
-        .filter(Order.status == "delivered")
+        select(Order.id, Order.customer_id, Order.created_at)
+        .where(Order.status == "delivered")
         .cte("delivered_orders")
     )
+    order_day = cast(delivered_orders_cte.c.created_at, Date)
 
     # Base query for revenue aggregation
     revenue_agg = func.sum(OrderItem.quantity * OrderItem.price).label("revenue")
 
     query = (
-        db.query(Product.id, Product.name, revenue_agg)
+        select(Product.id, Product.name, revenue_agg)
         .join(OrderItem, Product.id == OrderItem.product_id)
         .join(delivered_orders_cte, OrderItem.order_id == delivered_orders_cte.c.id)
     )
 
     # Optional filters
-    if country:
-        query = query.join(Customer, delivered_orders_cte.c.customer_id == Customer.id).filter(
-            Customer.country == country
+    if by_country:
+        query = query.join(Customer, delivered_orders_cte.c.customer_id == Customer.id).where(
+            Customer.country == bindparam("country")
         )
 
-    if year:
-        query = query.filter(extract("year", delivered_orders_cte.c.created_at) == year)
+    if by_year:
+        # Half-open range on the bare column, so created_at indexes apply
+        year = bindparam("year", type_=Integer)
+        query = query.where(
+            delivered_orders_cte.c.created_at >= func.make_timestamptz(year, 1, 1, 0, 0, 0),
+            delivered_orders_cte.c.created_at < func.make_timestamptz(year + 1, 1, 1, 0, 0, 0),
+        )
+    if by_start:
+        query = query.where(order_day >= bindparam("start_date", type_=Date))
+    if by_end:
+        query = query.where(order_day <= bindparam("end_date", type_=Date))
 
     # Group by product
     query = query.group_by(Product.id, Product.name)
 
-    # Get total groups before limit (safe way for grouped queries)
-    total_groups = db.query(query.subquery()).count()
+    # Total groups before limit, in the same statement as the ranked page
+    query = query.add_columns(func.count().over().label("total_groups"))
+    return query.order_by(revenue_agg.desc()).limit(bindparam("limit", type_=Integer))
+
+
+async def get_all(
+    db: AsyncSession, skip: int = 0, limit: int = 100, category: str | None = None
+) -> list[Product]:
+    """Get all products with optional category filter and pagination"""
+    params = {"skip": skip, "limit": limit, "category": category}
+    result = await db.scalars(_all_stmt(bool(category)), params)
+    return list(result.all())
+
+
+async def get_by_id(db: AsyncSession, product_id: int) -> Product | None:
+    """Get a specific product by ID"""
+    return await db.scalar(_by_id_stmt(), {"product_id": product_id})
+
+
+async def get_top_products_by_revenue(
+    db: AsyncSession,
+    limit: int = 5,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """
+    Returns top products ranked by revenue.
+    Revenue is computed only for 'delivered' orders.
+    Read from the product_daily_revenue rollup, which the rollup refresher keeps
+    current; start_date and end_date are inclusive days.
+    """
+    stmt = _top_revenue_stmt(bool(country), bool(year), bool(start_date), bool(end_date))
+    params = {
+        "country": country,
+        "year_start": date(year, 1, 1) if year else None,
+        "year_end": date(year + 1, 1, 1) if year else None,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+    results = (await db.execute(stmt, {**params, "limit": limit})).all()
+    total_groups = results[0].total_groups if results else 0
+
+    return results, total_groups
+
+
+async def get_top_products_by_revenue_from_orders(
+    db: AsyncSession,
+    limit: int = 5,
+    country: Optional[str] = None,
+    year: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+):
+    """
+    Same result as get_top_products_by_revenue, aggregated from orders and
+    order_items on every call. The reference the rollup is checked against.
+    """
+    stmt = _top_revenue_from_orders_stmt(
+        bool(country), bool(year), bool(start_date), bool(end_date)
+    )
+    params = {"country": country, "year": year, "start_date": start_date, "end_date": end_date}
 
-    # Final results with ordering and limit
-    results = query.order_by(revenue_agg.desc()).limit(limit).all()
+    results = (await db.execute(stmt, {**params, "limit": limit})).all()
+    total_groups = results[0].total_groups if results else 0
 
     return results, total_groups
@@ -2,21 +2,36 @@
 Review repository - Database access layer for reviews
 """
 
-from sqlalchemy.orm import Session
+from functools import lru_cache
+
+from sqlalchemy import Integer, bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.review import Review
 
 
-def get_all(
-    db: Session, skip: int = 0, limit: int = 100, product_id: int | None = None
+@lru_cache
+def _all_stmt(by_product: bool):
+    query = select(Review)
+    if by_product:
+        query = query.where(Review.product_id == bindparam("product_id"))
+    return query.offset(bindparam("skip", type_=Integer)).limit(bindparam("limit", type_=Integer))
+
+
+@lru_cache
+def _by_id_stmt():
+    return select(Review).where(Review.id == bindparam("review_id"))
+
+
+async def get_all(
+    db: AsyncSession, skip: int = 0, limit: int = 100, product_id: int | None = None
 ) -> list[Review]:
     """Get all reviews with optional product filter and pagination"""
-    query = db.query(Review)
-    if product_id:
-        query = query.filter(Review.product_id == product_id)
-    return query.offset(skip).limit(limit).all()  # type: ignore[return-value]
+    params = {"skip": skip, "limit": limit, "product_id": product_id}
+    result = await db.scalars(_all_stmt(bool(product_id)), params)
+    return list(result.all())
 
 
-def get_by_id(db: Session, review_id: int) -> Review | None:
+async def get_by_id(db: AsyncSession, review_id: int) -> Review | None:
     """Get a specific review by ID"""
-    return db.query(Review).filter(Review.id == review_id).first()  # type: ignore[return-value]
+    return await db.scalar(_by_id_stmt(), {"review_id": review_id})
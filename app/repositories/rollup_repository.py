@@ -0,0 +1,392 @@
+"""
+Rollup repository - Incremental maintenance of pre-aggregated analytics tables
+"""
+
+import math
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import (
+    Date,
+    Float,
+    Integer,
+    cast,
+    delete,
+    extract,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.customer import Customer
+from app.models.customer_order_stats import CustomerOrderStats
+from app.models.order import Order
+from app.models.order_item import OrderItem
+from app.models.product_daily_revenue import ProductDailyRevenue
+from app.models.rollup_watermark import RollupWatermark
+from app.models.sales_rollup import SalesRollup
+from app.models.sales_value_sketch import SalesValueSketch
+
+SALES_ROLLUP = "sales_rollup"
+PRODUCT_DAILY_REVENUE = "product_daily_revenue"
+CUSTOMER_ORDER_STATS = "customer_order_stats"
+
+# sales_rollup percentile columns and their fractions
+PERCENTILES = {"median": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+
+# Order value sketch (see SalesValueSketch): relative error bound, and the smallest
+# value told apart (order values below a cent are reported as one cent)
+SKETCH_RELATIVE_ACCURACY = 0.01
+SKETCH_GAMMA = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_MIN_VALUE = 0.01
+
+
+def _float_literal(value: float):
+    # Inlined rather than bound, so the expression matches itself in GROUP BY
+    return literal_column(repr(value))
+
+
+def sketch_bucket(value):
+    """SQL expression: the sketch bucket of a value"""
+    log_gamma = _float_literal(math.log(SKETCH_GAMMA))
+    clamped = func.greatest(value, _float_literal(SKETCH_MIN_VALUE))
+    return cast(func.ceil(func.ln(clamped) / log_gamma), Integer)
+
+
+def sketch_bucket_value(bucket):
+    """SQL expression: the value a sketch bucket reports"""
+    gamma = _float_literal(SKETCH_GAMMA)
+    return cast(2 * func.power(gamma, bucket) / (gamma + 1), Float)
+
+
+async def _lock_watermark(db: AsyncSession, name: str) -> RollupWatermark:
+    """Returns the rollup's watermark row, locked so concurrent refreshes run one at a time"""
+    await db.execute(
+        pg_insert(RollupWatermark)
+        .values(name=name, last_id=0, version=0)
+        .on_conflict_do_nothing(index_elements=[RollupWatermark.name])
+    )
+    return await db.scalar(
+        select(RollupWatermark).where(RollupWatermark.name == name).with_for_update()
+    )
+
+
+async def _rewrite_changed(db: AsyncSession, model, key_columns, fresh_stmt, current_stmt) -> int:
+    """
+    Compares freshly aggregated rows with the stored ones and rewrites only the
+    keys whose values changed, appeared or disappeared. Returns how many keys.
+    """
+    columns = [c.key for c in model.__table__.columns]
+    key_names = [c.key for c in key_columns]
+
+    fresh = {}
+    for row in (await db.execute(fresh_stmt)).all():
+        values = row._asdict()
+        fresh[tuple(values[k] for k in key_names)] = values
+    current = {}
+    for stored in await db.scalars(current_stmt):
+        values = {c: getattr(stored, c) for c in columns}
+        current[tuple(values[k] for k in key_names)] = values
+
+    changed = [key for key, values in fresh.items() if current.get(key) != values]
+    stale = changed + [key for key in current if key not in fresh]
+    if stale:
+        await db.execute(delete(model).where(tuple_(*key_columns).in_(stale)))
+    if changed:
+        await db.execute(insert(model), [fresh[key] for key in changed])
+    return len(stale)
+
+
+async def _rebuild(db: AsyncSession, model, fresh_stmt) -> int:
+    """Replaces every row of the rollup with fresh_stmt's, in the database. Returns the row count."""
+    await db.execute(delete(model))
+    columns = [c.name for c in fresh_stmt.selected_columns]
+    result = await db.execute(insert(model).from_select(columns, fresh_stmt))
+    return result.rowcount
+
+
+def _order_year():
+    return cast(extract("year", Order.created_at), Integer)
+
+
+def _order_day():
+    return cast(Order.created_at, Date)
+
+
+def _changed_orders_filter(watermark: RollupWatermark, overlap_seconds: float):
+    """Orders created or updated since the previous refresh started, minus the overlap"""
+    since = watermark.refreshed_at - timedelta(seconds=overlap_seconds)
+    return or_(Order.created_at >= since, Order.updated_at >= since)
+
+
+def _sales_groups_stmt():
+    """Delivered order aggregates per (country, year), as the raw sales summary computes them"""
+    return (
+        select(
+            Customer.country.label("country"),
+            _order_year().label("year"),
+            func.sum(Order.total_amount).label("sum"),
+            func.count(Order.id).label("count"),
+            func.max(Order.total_amount).label("max"),
+            # Ordered-set aggregates over the same column share one sort per group
+            *(
+                func.percentile_cont(fraction).within_group(Order.total_amount).label(column)
+                for column, fraction in PERCENTILES.items()
+            ),
+        )
+        .join(Customer, Order.customer_id == Customer.id)
+        # SalesGroup requires a country, so orders of customers without one are left out
+        .where(Order.status == "delivered", Customer.country.is_not(None))
+        .group_by(Customer.country, _order_year())
+    )
+
+
+def _sales_sketch_stmt():
+    """Delivered order counts per (country, year, value bucket)"""
+    bucket = sketch_bucket(Order.total_amount)
+    return (
+        select(
+            Customer.country.label("country"),
+            _order_year().label("year"),
+            bucket.label("bucket"),
+            func.count(Order.id).label("count"),
+        )
+        .join(Customer, Order.customer_id == Customer.id)
+        .where(Order.status == "delivered", Customer.country.is_not(None))
+        .group_by(Customer.country, _order_year(), bucket)
+    )
+
+
+async def refresh_sales_rollup(db: AsyncSession, overlap_seconds: float, full: bool = False):
+    """
+    Brings sales_rollup and the sales_value_sketch kept with it up to date with
+    orders and returns how many groups changed.
+
+    Only (country, year) groups touched since the previous refresh are
+    recomputed from orders: orders above the id watermark, or created or
+    updated since the previous refresh started. overlap_seconds widens that
+    window for write transactions that committed after it started. The first
+    refresh, or full=True, rebuilds every group (needed after deletes, which
+    leave no trace to detect).
+
+    The watermark's version is bumped only when a group's totals changed
+    (always on a rebuild).
+    Commits the session's transaction.
+    """
+    watermark = await _lock_watermark(db, SALES_ROLLUP)
+    started_at = await db.scalar(select(func.now()))
+    # Read before looking for changes: later orders are picked up next time
+    max_id = await db.scalar(select(func.max(Order.id))) or 0
+
+    fresh_stmt = _sales_groups_stmt()
+    current_stmt = select(SalesRollup)
+    sketch_fresh_stmt = _sales_sketch_stmt()
+    sketch_current_stmt = select(SalesValueSketch)
+    touched: Optional[list] = None
+    if not full and watermark.refreshed_at is not None:
+        touched_stmt = (
+            select(Customer.country, _order_year())
+            .join(Customer, Order.customer_id == Customer.id)
+            .where(
+                or_(
+                    Order.id > watermark.last_id,
+                    _changed_orders_filter(watermark, overlap_seconds),
+                ),
+                Customer.country.is_not(None),
+            )
+            .distinct()
+        )
+        touched = [tuple(row) for row in (await db.execute(touched_stmt)).all()]
+        fresh_stmt = fresh_stmt.where(tuple_(Customer.country, _order_year()).in_(touched))
+        current_stmt = current_stmt.where(
+            tuple_(SalesRollup.country, SalesRollup.year).in_(touched)
+        )
+        sketch_fresh_stmt = sketch_fresh_stmt.where(
+            tuple_(Customer.country, _order_year()).in_(touched)
+        )
+        sketch_current_stmt = sketch_current_stmt.where(
+            tuple_(SalesValueSketch.country, SalesValueSketch.year).in_(touched)
+        )
+
+    if touched is None:
+        changes = await _rebuild(db, SalesRollup, fresh_stmt)
+        await _rebuild(db, SalesValueSketch, sketch_fresh_stmt)
+    elif touched:
+        changes = await _rewrite_changed(
+            db, SalesRollup, (SalesRollup.country, SalesRollup.year), fresh_stmt, current_stmt
+        )
+        # A changed order value changes its group's totals too, so changes covers the sketch
+        await _rewrite_changed(
+            db,
+            SalesValueSketch,
+            (SalesValueSketch.country, SalesValueSketch.year, SalesValueSketch.bucket),
+            sketch_fresh_stmt,
+            sketch_current_stmt,
+        )
+    else:
+        changes = 0
+
+    watermark.last_id = max(watermark.last_id, max_id)
+    watermark.refreshed_at = started_at
+    if changes or touched is None:
+        watermark.version += 1
+    await db.commit()
+    return changes
+
+
+def _product_days_stmt():
+    """Delivered revenue and units per (country, day, product)"""
+    country = func.coalesce(Customer.country, "")
+    return (
+        select(
+            country.label("country"),
+            _order_day().label("day"),
+            OrderItem.product_id.label("product_id"),
+            func.sum(OrderItem.quantity * OrderItem.price).label("revenue"),
+            func.sum(OrderItem.quantity).label("units"),
+        )
+        .join(Order, OrderItem.order_id == Order.id)
+        .join(Customer, Order.customer_id == Customer.id)
+        .where(Order.status == "delivered")
+        .group_by(country, _order_day(), OrderItem.product_id)
+    )
+
+
+async def refresh_product_daily_revenue(
+    db: AsyncSession, overlap_seconds: float, full: bool = False
+):
+    """
+    Brings product_daily_revenue up to date and returns how many rows changed.
+
+    Every product row of a (country, day) touched since the previous refresh
+    is recomputed: days of orders created or updated since it started (minus
+    overlap_seconds), and of orders that got order items above the id
+    watermark. The first refresh, or full=True, rebuilds everything.
+
+    The watermark's version is bumped only when a row changed (always on a rebuild).
+    Commits the session's transaction.
+    """
+    watermark = await _lock_watermark(db, PRODUCT_DAILY_REVENUE)
+    started_at = await db.scalar(select(func.now()))
+    # Read before looking for changes: later order items are picked up next time
+    max_id = await db.scalar(select(func.max(OrderItem.id))) or 0
+
+    fresh_stmt = _product_days_stmt()
+    current_stmt = select(ProductDailyRevenue)
+    touched: Optional[list] = None
+    if not full and watermark.refreshed_at is not None:
+        new_items = select(OrderItem.order_id).where(OrderItem.id > watermark.last_id)
+        touched_stmt = (
+            select(func.coalesce(Customer.country, ""), _order_day())
+            .join(Customer, Order.customer_id == Customer.id)
+            .where(
+                or_(
+                    Order.id.in_(new_items),
+                    _changed_orders_filter(watermark, overlap_seconds),
+                )
+            )
+            .distinct()
+        )
+        touched = [tuple(row) for row in (await db.execute(touched_stmt)).all()]
+        fresh_stmt = fresh_stmt.where(
+            tuple_(func.coalesce(Customer.country, ""), _order_day()).in_(touched)
+        )
+        current_stmt = current_stmt.where(
+            tuple_(ProductDailyRevenue.country, ProductDailyRevenue.day).in_(touched)
+        )
+
+    if touched is None:
+        changes = await _rebuild(db, ProductDailyRevenue, fresh_stmt)
+    elif touched:
+        key_columns = (
+            ProductDailyRevenue.country,
+            ProductDailyRevenue.day,
+            ProductDailyRevenue.product_id,
+        )
+        changes = await _rewrite_changed(
+            db, ProductDailyRevenue, key_columns, fresh_stmt, current_stmt
+        )
+    else:
+        changes = 0
+
+    watermark.last_id = max(watermark.last_id, max_id)
+    watermark.refreshed_at = started_at
+    if changes or touched is None:
+        watermark.version += 1
+    await db.commit()
+    return changes
+
+
+def _customer_stats_stmt():
+    """Order aggregates per customer, over orders of any status"""
+    return select(
+        Order.customer_id.label("customer_id"),
+        func.count(Order.id).label("order_count"),
+        func.sum(Order.total_amount).label("total_spent"),
+        func.max(Order.total_amount).label("max_order"),
+        func.min(Order.created_at).label("first_order_at"),
+        func.max(Order.created_at).label("last_order_at"),
+    ).group_by(Order.customer_id)
+
+
+async def refresh_customer_order_stats(
+    db: AsyncSession, overlap_seconds: float, full: bool = False
+):
+    """
+    Brings customer_order_stats up to date and returns how many customers changed.
+
+    Only customers with orders above the id watermark, or created or updated
+    since the previous refresh started (minus overlap_seconds), are
+    recomputed. The first refresh, or full=True, rebuilds every customer.
+
+    The watermark's version is bumped only when a customer's stats changed
+    (always on a rebuild).
+    Commits the session's transaction.
+    """
+    watermark = await _lock_watermark(db, CUSTOMER_ORDER_STATS)
+    started_at = await db.scalar(select(func.now()))
+    # Read before looking for changes: later orders are picked up next time
+    max_id = await db.scalar(select(func.max(Order.id))) or 0
+
+    fresh_stmt = _customer_stats_stmt()
+    current_stmt = select(CustomerOrderStats)
+    touched: Optional[list] = None
+    if not full and watermark.refreshed_at is not None:
+        touched_stmt = (
+            select(Order.customer_id)
+            .where(
+                or_(
+                    Order.id > watermark.last_id,
+                    _changed_orders_filter(watermark, overlap_seconds),
+                )
+            )
+            .distinct()
+        )
+        touched = list(await db.scalars(touched_stmt))
+        fresh_stmt = fresh_stmt.where(Order.customer_id.in_(touched))
+        current_stmt = current_stmt.where(CustomerOrderStats.customer_id.in_(touched))
+
+    if touched is None:
+        changes = await _rebuild(db, CustomerOrderStats, fresh_stmt)
+    elif touched:
+        changes = await _rewrite_changed(
+            db,
+            CustomerOrderStats,
+            (CustomerOrderStats.customer_id,),
+            fresh_stmt,
+            current_stmt,
+        )
+    else:
+        changes = 0
+
+    watermark.last_id = max(watermark.last_id, max_id)
+    watermark.refreshed_at = started_at
+    if changes or touched is None:
+        watermark.version += 1
+    await db.commit()
+    return changes
@@ -2,6 +2,6 @@
 API routers
 """
 
-from app.routers import customers, orders, products, reviews
+from app.routers import admin, customers, orders, products, reviews
 
-__all__ = ["customers", "products", "orders", "reviews"]
+__all__ = ["customers", "products", "orders", "reviews", "admin"]
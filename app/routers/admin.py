@@ -0,0 +1,68 @@
+"""
+Admin router endpoints (operational metrics, only served in debug mode)
+"""
+
+from fastapi import APIRouter, Depends
+
+from app.database import async_engine, get_pool_status, replica_router
+from app.utils.data_versions import data_versions
+from app.utils.dependencies import require_debug
+from app.utils.order_snapshot import order_snapshot
+from app.utils.rate_limiter import limiter
+from app.utils.response_cache import response_cache
+from app.utils.rollup_refresher import rollup_refresher
+from app.utils.single_flight import single_flight
+
+router = APIRouter(dependencies=[Depends(require_debug)])
+
+
+@router.get("/pool")
+async def get_pool_stats():
+    """Get live connection pool statistics for this worker process"""
+    return {
+        "primary": get_pool_status(async_engine),
+        "replicas": [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "healthy": replica.healthy,
+                **get_pool_status(replica.engine),
+            }
+            for replica in replica_router.replicas
+        ],
+    }
+
+
+@router.get("/rate-limiter")
+async def get_rate_limiter_stats():
+    """Get tracked client count and eviction counters of the rate limiter"""
+    return limiter.stats()
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Get size and hit/miss/eviction counters of the analytics response cache"""
+    return response_cache.stats()
+
+
+@router.get("/single-flight")
+async def get_single_flight_stats():
+    """Get how many analytics queries ran versus joined one already in flight"""
+    return single_flight.stats()
+
+
+@router.get("/data-versions")
+async def get_data_version_stats():
+    """Get the per-table data versions behind ETags and cache invalidation"""
+    return data_versions.stats()
+
+
+@router.get("/rollups")
+async def get_rollup_stats():
+    """Get refresh counters of the rollup tables"""
+    return rollup_refresher.stats()
+
+
+@router.get("/order-snapshot")
+async def get_order_snapshot_stats():
+    """Get size and refresh counters of the in-process order snapshot"""
+    return order_snapshot.stats()
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories import customer_repository
 from app.schemas.base import BaseResponse
@@ -11,19 +11,26 @@ from app.schemas.customer import (
     HighValueCustomerResponse,
     MostFrequentCustomerResponse,
 )
-from app.utils.dependencies import get_db
+from app.utils.data_versions import data_tables
+from app.utils.dependencies import get_db, get_read_db
+from app.utils.order_snapshot import order_snapshot
+from app.utils.rate_limiter import rate_limit_cost
+from app.utils.response_cache import response_cache
+from app.utils.rollup_refresher import rollup_refresher
+from app.utils.single_flight import single_flight
 
 router = APIRouter()
 
 
 @router.get("/", response_model=BaseResponse[CustomerResponse])
+@data_tables("customers")
 async def get_customers(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, gt=0),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> BaseResponse[CustomerResponse]:
     """Get all customers"""
-    customers = customer_repository.get_all(db, skip=skip, limit=limit)
+    customers = await customer_repository.get_all(db, skip=skip, limit=limit)
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
@@ -35,66 +42,117 @@ async def get_customers(
 
 
 @router.get("/per-country", response_model=BaseResponse[CustomerCountPerCountry])
+@rate_limit_cost(5, cache_hit_cost=1)
+@data_tables("customers")
 async def get_customer_count_per_country(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
 ) -> BaseResponse[CustomerCountPerCountry]:
     """Get customer counts grouped by country"""
-    results, total_groups = customer_repository.get_customer_count_per_country(db)
+    applied_filters = {}
+
+    async def compute(db: AsyncSession):
+        results, total_groups = await single_flight.run(
+            db, customer_repository.get_customer_count_per_country
+        )
+        formatted_results = [
+            {"country": r.country, "customer_count": r.customer_count} for r in results
+        ]
+        return formatted_results, total_groups
+
+    results, total_groups = await response_cache.get_or_compute(
+        request, applied_filters, compute, db, ttl=300
+    )
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
             "total_groups": total_groups,
-            "applied_filters": {},
+            "applied_filters": applied_filters,
         },
-        results=[{"country": r.country, "customer_count": r.customer_count} for r in results],
+        results=results,
     )
 
 
 @router.get("/most-frequent", response_model=BaseResponse[MostFrequentCustomerResponse])
+@rate_limit_cost(10, cache_hit_cost=1)
+@data_tables("customer_order_stats", "customers", "order_snapshot")
 async def get_most_frequent_customers(
+    request: Request,
     limit: int = Query(5, gt=0, description="Number of top customers to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> BaseResponse[MostFrequentCustomerResponse]:
     """Get top N customers ordered by total number of purchases"""
-    results, total_groups = customer_repository.get_most_frequent(db, limit=limit)
+    applied_filters = {"limit": limit}
+
+    async def compute(db: AsyncSession):
+        if order_snapshot.ready:
+            return await order_snapshot.get_most_frequent(limit=limit)
+        get_most_frequent = (
+            customer_repository.get_most_frequent
+            if rollup_refresher.ready
+            else customer_repository.get_most_frequent_from_orders
+        )
+        return await single_flight.run(db, get_most_frequent, limit=limit)
+
+    results, total_groups = await response_cache.get_or_compute(
+        request, applied_filters, compute, db, ttl=60
+    )
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
             "total_groups": total_groups,
-            "applied_filters": {"limit": limit},
+            "applied_filters": applied_filters,
         },
         results=results,
     )
 
 
 @router.get("/high-value", response_model=BaseResponse[HighValueCustomerResponse])
+@rate_limit_cost(10, cache_hit_cost=1)
+@data_tables("customer_order_stats", "customers", "order_snapshot")
 async def get_high_value_customers(
+    request: Request,
     total: bool = Query(
         True,
         description="True: rank by total spending (SUM). False: rank by highest single order (MAX)",
     ),
     limit: int = Query(5, gt=0, description="Number of results to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> BaseResponse[HighValueCustomerResponse]:
     """Get customers ranked by monetary value"""
-    results, total_groups = customer_repository.get_high_value(db, total=total, limit=limit)
+    applied_filters = {"total": total, "limit": limit}
+
+    async def compute(db: AsyncSession):
+        if order_snapshot.ready:
+            return await order_snapshot.get_high_value(total=total, limit=limit)
+        get_high_value = (
+            customer_repository.get_high_value
+            if rollup_refresher.ready
+            else customer_repository.get_high_value_from_orders
+        )
+        return await single_flight.run(db, get_high_value, total=total, limit=limit)
+
+    results, total_groups = await response_cache.get_or_compute(
+        request, applied_filters, compute, db, ttl=60
+    )
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
             "currency": "USD",
             "total_groups": total_groups,
-            "applied_filters": {"total": total, "limit": limit},
+            "applied_filters": applied_filters,
         },
         results=results,
     )
 
 
 @router.get("/{customer_id}", response_model=BaseResponse[CustomerResponse])
+@data_tables("customers")
 async def get_customer(
-    customer_id: int, db: Session = Depends(get_db)
+    customer_id: int, db: AsyncSession = Depends(get_db)
 ) -> BaseResponse[CustomerResponse]:
     """Get a specific customer by ID"""
-    customer = customer_repository.get_by_id(db, customer_id=customer_id)
+    customer = await customer_repository.get_by_id(db, customer_id=customer_id)
     if not customer:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer not found")
     return BaseResponse(
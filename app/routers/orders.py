@@ -2,29 +2,40 @@
 Order router endpoints
 """
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.order import OrderStatus
 from app.repositories import order_repository
 from app.schemas.base import BaseResponse
-from app.schemas.order import OrderResponse, OrderStatusBase, SalesGroup
-from app.utils.dependencies import get_db
+from app.schemas.order import OrderResponse, OrderStatusBase, SalesBucket, SalesGroup
+from app.utils.data_versions import data_tables
+from app.utils.dependencies import get_db, get_read_db
+from app.utils.order_snapshot import order_snapshot
+from app.utils.rate_limiter import charge_cache_miss, rate_limit_cost
+from app.utils.response_cache import response_cache
+from app.utils.rollup_refresher import rollup_refresher
+from app.utils.single_flight import single_flight
 
 router = APIRouter()
 
+METRIC_CHOICES = "|".join(order_repository.SALES_METRICS)
+# Response key of metrics not reported under their own name
+METRIC_KEYS = {"avg": "average"}
+
 
 @router.get("/", response_model=BaseResponse[OrderResponse])
+@data_tables("orders")
 async def get_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, gt=0),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> BaseResponse[OrderResponse]:
     """Get all orders"""
-    orders = order_repository.get_all(db, skip=skip, limit=limit)
+    orders = await order_repository.get_all(db, skip=skip, limit=limit)
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
@@ -36,23 +47,25 @@ async def get_orders(
 
 
 @router.get("/statuses", response_model=BaseResponse[OrderStatusBase])
+@rate_limit_cost(5, cache_hit_cost=1)
+@data_tables("orders")
 async def get_order_status_counts(
+    request: Request,
     order_status: Optional[OrderStatus] = Query(None, description="Filter by order status"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> BaseResponse[OrderStatusBase]:
     """Get order counts grouped by status"""
-    try:
-        results, total_groups = order_repository.get_order_counts_by_status(db, order_status)
-        return BaseResponse(
-            metadata={
-                "requested_at": datetime.now(timezone.utc),
-                "total_groups": total_groups,
-                "applied_filters": {"order_status": order_status},
-            },
-            results=[{"status": r.status, "count": r.count} for r in results],
-        )
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    # Not cached, so anything but a 304 pays the full cost
+    await charge_cache_miss(request)
+    results, total_groups = await order_repository.get_order_counts_by_status(db, order_status)
+    return BaseResponse(
+        metadata={
+            "requested_at": datetime.now(timezone.utc),
+            "total_groups": total_groups,
+            "applied_filters": {"order_status": order_status},
+        },
+        results=[{"status": r.status, "count": r.count} for r in results],
+    )
 
 
 @router.get(
@@ -60,67 +73,194 @@ async def get_order_status_counts(
     response_model=BaseResponse[SalesGroup],
     response_model_exclude_none=True,
 )
+@rate_limit_cost(20, cache_hit_cost=1)
+@data_tables("sales_rollup", "order_snapshot")
 async def get_sales_summary(
+    request: Request,
     metric: Optional[str] = Query(
         None,
-        description="Filter by a specific metric",
-        pattern="^(sum|avg|median|max|count)$",
+        description=(
+            "Comma-separated metrics to compute: sum, avg, median, max, count, p90, p95, p99 "
+            "(default: sum, avg, median, max, count)"
+        ),
+        pattern=f"^({METRIC_CHOICES})(,({METRIC_CHOICES}))*$",
     ),
     country: Optional[str] = Query(None, description="Filter by country"),
     year: Optional[int] = Query(None, description="Filter by year"),
-    db: Session = Depends(get_db),
+    approx: bool = Query(
+        False,
+        description=(
+            "Percentiles from mergeable sketches, within 1% relative error of the exact value"
+        ),
+    ),
+    group_by: Optional[str] = Query(
+        None,
+        description="Merge groups into one per country or per year (default: country and year)",
+        pattern="^(country|year)$",
+    ),
+    db: AsyncSession = Depends(get_read_db),
 ) -> BaseResponse[SalesGroup]:
     """Get sales metrics grouped by country and year (delivered orders only)"""
-    results, total_groups = order_repository.get_sales_summary(
-        db, metric=metric, country=country, year=year
+    metrics = order_repository.normalize_sales_metrics(
+        metric.split(",") if metric else order_repository.DEFAULT_SALES_METRICS
     )
+    if group_by and not approx and any(m in order_repository.PERCENTILES for m in metrics):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Percentiles across merged groups require approx=true",
+        )
+    if (approx or group_by) and not rollup_refresher.ready:
+        # Sketches and merged groups only exist in the rollup tables
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sales rollups are still being built, retry shortly",
+            headers={"Retry-After": str(int(rollup_refresher.interval))},
+        )
+
+    applied_filters = {
+        # Normalized, so the same metrics in another order share a cache entry
+        "metric": ",".join(metrics) if metric else None,
+        "country": country,
+        "year": year,
+        "approx": approx,
+        "group_by": group_by,
+        "status": "delivered",
+    }
 
-    formatted_results = []
-    for r in results:
-        metrics = {"count": int(r.count)}
-        metric_map = {
-            "sum": ("sum", "sum"),
-            "avg": ("average", "average"),
-            "median": ("median", "median"),
-            "max": ("max", "max"),
-        }
-
-        if metric:
-            if metric in metric_map:
-                key, attr = metric_map[metric]
-                metrics[key] = float(getattr(r, attr)) if getattr(r, attr) is not None else 0.0
+    async def compute(db: AsyncSession):
+        if order_snapshot.ready and not approx and group_by is None:
+            results, total_groups = await order_snapshot.get_sales_summary(
+                metrics=metrics, country=country, year=year
+            )
+        elif rollup_refresher.ready:
+            results, total_groups = await single_flight.run(
+                db,
+                order_repository.get_sales_summary,
+                metrics=metrics,
+                country=country,
+                year=year,
+                approx=approx,
+                group_by=group_by,
+            )
         else:
-            for key, attr in metric_map.values():
-                metrics[key] = float(getattr(r, attr)) if getattr(r, attr) is not None else 0.0
-
-        formatted_results.append(
-            {
-                "country": r.country,
-                "year": int(r.year),
-                "metrics": metrics,
-            }
-        )
+            results, total_groups = await single_flight.run(
+                db,
+                order_repository.get_sales_summary_from_orders,
+                metrics=metrics,
+                country=country,
+                year=year,
+            )
+
+        formatted_results = []
+        for r in results:
+            metrics_values = {"count": int(r.count)}
+            for m in metrics:
+                if m == "count":
+                    continue
+                key = METRIC_KEYS.get(m, m)
+                value = getattr(r, key)
+                metrics_values[key] = float(value) if value is not None else 0.0
+
+            formatted_results.append(
+                {
+                    # A group merged across countries or years has no value for that key
+                    "country": getattr(r, "country", None),
+                    "year": int(r.year) if "year" in r._fields else None,
+                    "metrics": metrics_values,
+                }
+            )
+        return formatted_results, total_groups
+
+    formatted_results, total_groups = await response_cache.get_or_compute(
+        request, applied_filters, compute, db, ttl=60
+    )
 
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
             "currency": "USD",
             "total_groups": total_groups,
-            "applied_filters": {
-                "metric": metric,
-                "country": country,
-                "year": year,
-                "status": "delivered",
-            },
+            "applied_filters": applied_filters,
         },
         results=formatted_results,
     )
 
 
+@router.get("/sales-timeseries", response_model=BaseResponse[SalesBucket])
+@rate_limit_cost(10, cache_hit_cost=1)
+@data_tables("product_daily_revenue", "products")
+async def get_sales_timeseries(
+    request: Request,
+    interval: str = Query(
+        "month",
+        description="Bucket size: day, week, month or quarter",
+        pattern=f"^({'|'.join(order_repository.SALES_INTERVALS)})$",
+    ),
+    start_date: Optional[date] = Query(
+        None, description="First order day included (default: one year before end_date)"
+    ),
+    end_date: Optional[date] = Query(None, description="Last order day included (default: today)"),
+    country: Optional[str] = Query(None, description="Filter by customer country"),
+    category: Optional[str] = Query(None, description="Filter by product category"),
+    db: AsyncSession = Depends(get_read_db),
+) -> BaseResponse[SalesBucket]:
+    """Get delivered revenue and units per time bucket, with zeros for buckets without sales"""
+    end_date = end_date or datetime.now(timezone.utc).date()
+    start_date = start_date or end_date - timedelta(days=365)
+    if start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="start_date must not be after end_date",
+        )
+    try:
+        order_repository.sales_bucket_starts(interval, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    applied_filters = {
+        "interval": interval,
+        "start_date": start_date,
+        "end_date": end_date,
+        "country": country,
+        "category": category,
+        "status": "delivered",
+    }
+    results, total_groups = await response_cache.get_or_compute(
+        request,
+        applied_filters,
+        lambda db: single_flight.run(
+            db,
+            order_repository.get_sales_timeseries
+            if rollup_refresher.ready
+            else order_repository.get_sales_timeseries_from_orders,
+            start_date=start_date,
+            end_date=end_date,
+            interval=interval,
+            country=country,
+            category=category,
+        ),
+        db,
+        ttl=60,
+    )
+
+    return BaseResponse(
+        metadata={
+            "requested_at": datetime.now(timezone.utc),
+            "currency": "USD",
+            "total_groups": total_groups,
+            "applied_filters": applied_filters,
+        },
+        results=results,
+    )
+
+
 @router.get("/{order_id}", response_model=BaseResponse[OrderResponse])
-async def get_order(order_id: int, db: Session = Depends(get_db)) -> BaseResponse[OrderResponse]:
+@data_tables("orders")
+async def get_order(
+    order_id: int, db: AsyncSession = Depends(get_db)
+) -> BaseResponse[OrderResponse]:
     """Get a specific order by ID"""
-    order = order_repository.get_by_id(db, order_id=order_id)
+    order = await order_repository.get_by_id(db, order_id=order_id)
     if not order:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
     return BaseResponse(
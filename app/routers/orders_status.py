@@ -4,25 +4,25 @@ Order Status router endpoints
 
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.order import OrderStatus
 from app.repositories import order_status_repository
 from app.schemas.orders_status import OrderStatusBase
-from app.utils.dependencies import get_db
+from app.utils.dependencies import get_read_db
+from app.utils.rate_limiter import charge_cache_miss, rate_limit_cost
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[OrderStatusBase])
+@rate_limit_cost(5, cache_hit_cost=1)
 async def get_order_statuses(
+    request: Request,
     order_status: Optional[OrderStatus] = Query(None, description="Filter by order status"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ) -> List[OrderStatusBase]:
     """Get all order statuses"""
-    try:
-        order_statuses = order_status_repository.get_order_counts_by_status(db, order_status)
-        return order_statuses
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    await charge_cache_miss(request)
+    return await order_status_repository.get_order_counts_by_status(db, order_status)
@@ -1,30 +1,64 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories import product_repository
 from app.schemas.base import BaseResponse
 from app.schemas.product import ProductResponse, TopRevenueResultItem
-from app.utils.dependencies import get_db
+from app.utils.data_versions import data_tables
+from app.utils.dependencies import get_db, get_read_db
+from app.utils.order_snapshot import order_snapshot
+from app.utils.rate_limiter import rate_limit_cost
+from app.utils.response_cache import response_cache
+from app.utils.rollup_refresher import rollup_refresher
+from app.utils.single_flight import single_flight
 
 router = APIRouter()
 
 
 @router.get("/top-revenue", response_model=BaseResponse[TopRevenueResultItem])
+@rate_limit_cost(10, cache_hit_cost=1)
+@data_tables("product_daily_revenue", "products", "order_snapshot")
 async def get_top_products_by_revenue(
+    request: Request,
     limit: int = Query(5, gt=0, description="Number of top products to return"),
     country: Optional[str] = Query(None, description="Filter by country"),
     year: Optional[int] = Query(None, description="Filter by year"),
-    db: Session = Depends(get_db),
+    start_date: Optional[date] = Query(None, description="First order day included"),
+    end_date: Optional[date] = Query(None, description="Last order day included"),
+    db: AsyncSession = Depends(get_read_db),
 ) -> BaseResponse[TopRevenueResultItem]:
     """Get top products by revenue (delivered orders only)"""
-    try:
-        results, total_groups = product_repository.get_top_products_by_revenue(
-            db, limit=limit, country=country, year=year
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="start_date must not be after end_date",
         )
 
+    applied_filters = {
+        "limit": limit,
+        "country": country,
+        "year": year,
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+
+    async def compute(db: AsyncSession):
+        filters = {"country": country, "year": year, "start_date": start_date, "end_date": end_date}
+        if order_snapshot.ready:
+            results, total_groups = await order_snapshot.get_top_products_by_revenue(
+                limit=limit, **filters
+            )
+        else:
+            get_top = (
+                product_repository.get_top_products_by_revenue
+                if rollup_refresher.ready
+                else product_repository.get_top_products_by_revenue_from_orders
+            )
+            results, total_groups = await single_flight.run(db, get_top, limit=limit, **filters)
+
         formatted_results = [
             {
                 "product_id": r.id,
@@ -33,33 +67,33 @@ async def get_top_products_by_revenue(
             }
             for r in results
         ]
+        return formatted_results, total_groups
 
-        return BaseResponse(
-            metadata={
-                "requested_at": datetime.now(timezone.utc),
-                "currency": "USD",
-                "total_groups": total_groups,
-                "applied_filters": {
-                    "limit": limit,
-                    "country": country,
-                    "year": year,
-                },
-            },
-            results=formatted_results,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    formatted_results, total_groups = await response_cache.get_or_compute(
+        request, applied_filters, compute, db, ttl=60
+    )
+
+    return BaseResponse(
+        metadata={
+            "requested_at": datetime.now(timezone.utc),
+            "currency": "USD",
+            "total_groups": total_groups,
+            "applied_filters": applied_filters,
+        },
+        results=formatted_results,
+    )
 
 
 @router.get("/", response_model=BaseResponse[ProductResponse])
+@data_tables("products")
 async def get_products(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, gt=0),
     category: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ) -> BaseResponse[ProductResponse]:
     """Get all products"""
-    products = product_repository.get_all(db, skip=skip, limit=limit, category=category)
+    products = await product_repository.get_all(db, skip=skip, limit=limit, category=category)
     return BaseResponse(
         metadata={
             "requested_at": datetime.now(timezone.utc),
@@ -71,11 +105,12 @@ async def get_products(
 
 
 @router.get("/{product_id}", response_model=BaseResponse[ProductResponse])
+@data_tables("products")
 async def get_product(
-    product_id: int, db: Session = Depends(get_db)
+    product_id: int, db: AsyncSession = Depends(get_db)
 ) -> BaseResponse[ProductResponse]:
     """Get a specific product by ID"""
-    product = product_repository.get_by_id(db, product_id=product_id)
+    product = await product_repository.get_by_id(db, product_id=product_id)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     return BaseResponse(
@@ -2,7 +2,7 @@
 Order schemas for request/response validation
 """
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from pydantic import BaseModel, ConfigDict
@@ -42,13 +42,24 @@ class SalesMetrics(BaseModel):
     average: Optional[float] = None
     max: Optional[float] = None
     median: Optional[float] = None
+    p90: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
     sum: Optional[float] = None
     count: int
 
 
 class SalesGroup(BaseModel):
-    """Schema for a single (country, year) results group"""
+    """Schema for a single (country, year) results group, or a country or year when merged"""
 
-    country: str
-    year: int
+    country: Optional[str] = None
+    year: Optional[int] = None
     metrics: SalesMetrics
+
+
+class SalesBucket(BaseModel):
+    """Schema for one time bucket of a sales time series"""
+
+    bucket: date
+    revenue: float
+    units: int
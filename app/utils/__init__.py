@@ -2,6 +2,6 @@
 Utility functions and dependencies
 """
 
-from app.utils.dependencies import get_db  # , get_current_user
+from app.utils.dependencies import get_db, get_read_db  # , get_current_user
 
-__all__ = ["get_db"]  # , "get_current_user"
+__all__ = ["get_db", "get_read_db"]  # , "get_current_user"
@@ -0,0 +1,239 @@
+"""
+Per-table data versions, ETags and conditional (304) responses
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import __version__
+from app.config import settings
+from app.database import primary_session
+from app.models import Customer, Order, OrderItem, Product, Review, RollupWatermark
+from app.utils.order_snapshot import order_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Tables whose changes are tracked, and the columns their version is derived from
+VERSIONED_MODELS = {
+    "orders": Order,
+    "order_items": OrderItem,
+    "customers": Customer,
+    "products": Product,
+    "reviews": Review,
+}
+
+# Rollup tables, versioned by the counter their refresh bumps when totals change
+VERSIONED_ROLLUPS = ("sales_rollup", "product_daily_revenue", "customer_order_stats")
+
+# Tables a rollup's routes aggregate instead (the *_from_orders queries) until
+# the first rollup build finishes; meanwhile the rollup is versioned by them
+ROLLUP_SOURCES = {
+    "sales_rollup": ("orders", "customers"),
+    "product_daily_revenue": ("orders", "order_items", "customers"),
+    "customer_order_stats": ("orders",),
+}
+
+# In-process data, versioned per worker and read on every request: each worker
+# loads its order snapshot on its own schedule, so a worker still serving an
+# older snapshot must not hand out the ETag of the newer data
+PROCESS_VERSIONS: Dict[str, Callable[[], Optional[str]]] = {
+    "order_snapshot": lambda: order_snapshot.version,
+}
+
+
+def _version_query():
+    """
+    One statement reading max(id) (and max(updated_at) where the table has it)
+    of every tracked table, and the version of every rollup. max(id) is a
+    primary key index lookup.
+    """
+    columns = []
+    for table, model in VERSIONED_MODELS.items():
+        columns.append(select(func.max(model.id)).scalar_subquery().label(f"{table}_id"))
+        if hasattr(model, "updated_at"):
+            columns.append(
+                select(func.max(model.updated_at)).scalar_subquery().label(f"{table}_updated_at")
+            )
+    for rollup in VERSIONED_ROLLUPS:
+        version = select(RollupWatermark.version).where(RollupWatermark.name == rollup)
+        columns.append(version.scalar_subquery().label(rollup))
+    return select(*columns)
+
+
+class DataVersions:
+    """
+    Cheap change markers for the tables analytics results are built from.
+
+    A table's version is derived from its highest id (new rows) and, where the
+    table has one, its latest updated_at (ORM updates); a rollup table's is the
+    counter its refresh bumps when totals change. Versions are read from
+    the primary at most once per check_interval per process and shared by every
+    request in that window, so a burst of requests costs a single round-trip.
+
+    Deletes and updates that bypass the ORM's updated_at are not detected;
+    results depending on them still expire through the response cache TTL.
+    """
+
+    def __init__(self, check_interval: float):
+        """
+        check_interval: Seconds a read of the versions is reused before reading again.
+        """
+        self.check_interval = check_interval
+        self.versions: Dict[str, str] = {}
+        self.checked_at = float("-inf")
+        self.checks = 0
+        self.errors = 0
+        # Conditional requests answered with 304 Not Modified
+        self.not_modified = 0
+        self._refresh: Optional[asyncio.Task] = None
+
+    async def current(self) -> Dict[str, str]:
+        """Returns {table: version}, reading them again once check_interval has passed"""
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return self.versions
+
+        # Requests arriving while a read is running wait for it instead of starting another
+        refresh = self._refresh
+        if (
+            refresh is None
+            or refresh.done()
+            or refresh.get_loop() is not asyncio.get_running_loop()
+        ):
+            refresh = self._refresh = asyncio.create_task(self._read())
+        # Shielded so a cancelled request doesn't cancel the read for everyone
+        return await asyncio.shield(refresh)
+
+    async def _read(self) -> Dict[str, str]:
+        async with primary_session() as db:
+            row = (await db.execute(_version_query())).one()._mapping
+
+        versions = {}
+        for table, model in VERSIONED_MODELS.items():
+            version = str(row[f"{table}_id"])
+            if hasattr(model, "updated_at"):
+                updated_at = row[f"{table}_updated_at"]
+                version += f"@{updated_at.isoformat() if updated_at else None}"
+            versions[table] = version
+        for rollup in VERSIONED_ROLLUPS:
+            versions[rollup] = str(row[rollup])
+
+        self.versions = versions
+        self.checked_at = time.monotonic()
+        self.checks += 1
+        return versions
+
+    def reset(self) -> None:
+        """Forgets the last read so the next request reads the versions again"""
+        self.versions = {}
+        self.checked_at = float("-inf")
+
+    def stats(self) -> dict:
+        return {
+            "check_interval": self.check_interval,
+            "versions": self.versions,
+            "checks": self.checks,
+            "errors": self.errors,
+            "not_modified": self.not_modified,
+        }
+
+
+data_versions = DataVersions(check_interval=settings.DATA_VERSION_CHECK_INTERVAL)
+
+
+def data_tables(*tables: str) -> Callable:
+    """
+    Declares which tables (or in-process sources, see PROCESS_VERSIONS) a
+    route's response is built from, which gives it an ETag and conditional
+    request support. Put it below the router decorator:
+
+        @router.get("/high-value")
+        @data_tables("orders", "customers")
+        async def get_high_value_customers(...): ...
+    """
+    unknown = set(tables) - set(VERSIONED_MODELS) - set(VERSIONED_ROLLUPS) - set(PROCESS_VERSIONS)
+    if unknown:
+        raise ValueError(f"Untracked tables: {sorted(unknown)}")
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.data_tables = tables
+        return endpoint
+
+    return decorator
+
+
+def make_etag(request: Request, table_versions: Tuple[str, ...]) -> str:
+    """
+    Strong ETag for the response to this path and query at these data versions.
+    requested_at is per-request metadata and deliberately not part of it.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(
+        repr(
+            (
+                __version__,
+                request.url.path,
+                sorted(request.query_params.multi_items()),
+                table_versions,
+            )
+        ).encode()
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/"x" matches "x" too"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _table_version(table: str, versions: Dict[str, str]) -> str:
+    if table in PROCESS_VERSIONS:
+        return PROCESS_VERSIONS[table]()
+    if table in ROLLUP_SOURCES:
+        # Imported here because the refresher bumps the versions read above
+        from app.utils.rollup_refresher import rollup_refresher
+
+        if not rollup_refresher.ready:
+            return "+".join(versions[source] for source in ROLLUP_SOURCES[table])
+    return versions[table]
+
+
+async def data_version_dependency(request: Request, response: Response):
+    """
+    FastAPI dependency to be used globally.
+    For routes declared with @data_tables, sets the ETag header and answers a
+    matching If-None-Match with 304 before the route's session is opened.
+    """
+    tables = getattr(request.scope.get("endpoint"), "data_tables", None)
+    if not tables:
+        return
+
+    try:
+        versions = await data_versions.current()
+    except (SQLAlchemyError, OSError) as e:
+        # Serve the request without an ETag rather than failing it
+        data_versions.errors += 1
+        logger.warning("Could not read data versions: %s", e)
+        return
+
+    table_versions = tuple(_table_version(table, versions) for table in tables)
+    # Lets the response cache drop results computed from older data
+    request.state.data_versions = table_versions
+    etag = make_etag(request, table_versions)
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        data_versions.not_modified += 1
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
@@ -2,6 +2,80 @@
 Shared dependencies for FastAPI routes
 """
 
-from app.database import get_db
+import asyncio
 
-__all__ = ["get_db"]
+from fastapi import HTTPException, Request, status
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import cancel_backend_query, is_query_canceled, primary_session, read_session
+
+# Non-standard status (nginx convention) for requests abandoned by the client
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def _cancel_on_disconnect(request: Request, db: AsyncSession, disconnected: asyncio.Event):
+    """
+    Polls the ASGI connection and cancels the session's backend query
+    as soon as the client goes away.
+    """
+    while not await request.is_disconnected():
+        await asyncio.sleep(settings.DISCONNECT_POLL_INTERVAL)
+    disconnected.set()
+    await cancel_backend_query(db)
+
+
+def _raise_for_canceled_query(e: exc.DBAPIError, disconnected: bool = False) -> None:
+    """Maps a cancelled statement to 499 (client left) or 504 (statement timeout)"""
+    if not is_query_canceled(e):
+        return
+    if disconnected:
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected") from e
+    raise HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Query exceeded its statement timeout",
+    ) from e
+
+
+async def get_db():
+    """
+    Dependency function to get a primary session (lookup timeout class)
+    """
+    async with primary_session(settings.STATEMENT_TIMEOUT_MS) as db:
+        try:
+            yield db
+        except exc.DBAPIError as e:
+            _raise_for_canceled_query(e)
+            raise
+
+
+async def get_read_db(request: Request):
+    """
+    Dependency function to get a read-only session (analytics timeout class).
+    The backend query is cancelled if the client disconnects before it finishes.
+    """
+    async with read_session(settings.ANALYTICS_STATEMENT_TIMEOUT_MS) as db:
+        disconnected = asyncio.Event()
+        # Lets work done outside this session (single-flight) notice the disconnect too
+        db.info["disconnected"] = disconnected
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, db, disconnected))
+        try:
+            yield db
+        except exc.DBAPIError as e:
+            _raise_for_canceled_query(e, disconnected.is_set())
+            raise
+        finally:
+            watcher.cancel()
+
+
+def require_debug() -> None:
+    """
+    Dependency hiding operational endpoints (pool, cache and limiter internals)
+    unless the application runs in debug mode.
+    """
+    if not settings.DEBUG:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+__all__ = ["get_db", "get_read_db", "require_debug"]
@@ -0,0 +1,533 @@
+"""
+In-process columnar snapshot of orders and order items, queried with NumPy
+"""
+
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import cached_property, lru_cache
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Date, Integer, cast, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import read_session
+from app.models import Customer, Order, OrderItem, Product
+from app.repositories.order_repository import DEFAULT_SALES_METRICS, normalize_sales_metrics
+from app.repositories.rollup_repository import PERCENTILES
+
+logger = logging.getLogger(__name__)
+
+# Rows converted to one array at a time while streaming a table
+LOAD_CHUNK_ROWS = 100_000
+
+_EPOCH = date(1970, 1, 1)
+
+# Same fields as the rows of the SQL repositories, so routers format either the same way
+TopProduct = namedtuple("TopProduct", "id name revenue total_groups")
+MostFrequentCustomer = namedtuple(
+    "MostFrequentCustomer", "name email country city signup_date purchases_count total_groups"
+)
+HighValueCustomer = namedtuple("HighValueCustomer", "name email country city value total_groups")
+
+
+@lru_cache
+def _sales_row(fields: Tuple[str, ...]):
+    return namedtuple("SalesGroup", fields)
+
+
+def _orders_stmt():
+    return select(
+        Order.id,
+        Order.customer_id,
+        # Whole days since 1970-01-01, in the session time zone like the SQL queries
+        cast(Order.created_at, Date) - _EPOCH,
+        Order.total_amount,
+        cast(Order.status == "delivered", Integer),
+    )
+
+
+def _items_stmt():
+    return select(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity, OrderItem.price)
+
+
+def _days(day: date) -> int:
+    return (day - _EPOCH).days
+
+
+def _top(values: "np.ndarray", candidates: "np.ndarray", limit: int) -> "np.ndarray":
+    """The candidates with the highest values, highest first (ties by position)"""
+    if limit < len(candidates):
+        candidates = candidates[np.argpartition(-values[candidates], limit - 1)[:limit]]
+        candidates.sort()
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+@dataclass(frozen=True, eq=False)
+class SnapshotColumns:
+    """
+    One immutable version of the snapshot. A refresh builds a new one and
+    swaps it in, so a query running in a worker thread never sees a half
+    applied refresh.
+
+    Orders are sorted by id; an item points at its order by position
+    (item_order). Customers and product names are small and kept as dicts.
+    """
+
+    order_id: "np.ndarray"  # int64, ascending
+    order_customer: "np.ndarray"  # int32
+    order_day: "np.ndarray"  # int32, days since 1970-01-01
+    order_amount: "np.ndarray"  # float64
+    order_delivered: "np.ndarray"  # bool
+    item_order: "np.ndarray"  # int64, index into the order arrays
+    item_product: "np.ndarray"  # int32
+    item_quantity: "np.ndarray"  # int32
+    item_price: "np.ndarray"  # float64
+    # {customer_id: (name, email, country, city, signup_date)}
+    customers: Dict[int, tuple]
+    # {product_id: name}
+    product_names: Dict[int, str]
+    max_item_id: int
+    loaded_at: datetime
+
+    @classmethod
+    def build(
+        cls,
+        previous: Optional["SnapshotColumns"],
+        orders: "np.ndarray",
+        items: "np.ndarray",
+        max_item_id: int,
+        customers: Dict[int, tuple],
+        product_names: Dict[int, str],
+        loaded_at: datetime,
+    ) -> "SnapshotColumns":
+        """
+        Applies changed orders on top of previous (or starts empty).
+
+        orders: (id, customer_id, day, total_amount, delivered) rows of new and
+            changed orders; every item of these orders must be in items.
+        items: (order_id, product_id, quantity, price) rows.
+        """
+        if previous is None:
+            previous = cls.empty(loaded_at)
+        ids = orders[:, 0].astype(np.int64)
+        columns = {
+            "order_customer": (orders[:, 1], np.int32),
+            "order_day": (orders[:, 2], np.int32),
+            "order_amount": (orders[:, 3], np.float64),
+            "order_delivered": (orders[:, 4], np.bool_),
+        }
+
+        # Changed orders are overwritten in place (on copies), new ones appended
+        order_id = previous.order_id
+        pos = np.searchsorted(order_id, ids)
+        existing = pos < len(order_id)
+        existing[existing] = order_id[pos[existing]] == ids[existing]
+        fresh = ~existing
+        arrays = {}
+        for name, (values, dtype) in columns.items():
+            array = getattr(previous, name).copy()
+            array[pos[existing]] = values[existing]
+            arrays[name] = np.concatenate([array, values[fresh].astype(dtype)])
+        order_id = np.concatenate([order_id, ids[fresh]])
+
+        # Keep the items of untouched orders; the touched ones' were all reloaded
+        touched = np.zeros(len(order_id), dtype=np.bool_)
+        touched[pos[existing]] = True
+        touched[len(previous.order_id) :] = True
+        keep = ~touched[previous.item_order]
+        item_order = previous.item_order[keep]
+
+        if fresh.any() and (order_id[1:] < order_id[:-1]).any():
+            # Orders that committed out of id order: re-sort, and renumber item positions
+            permutation = np.argsort(order_id, kind="stable")
+            order_id = order_id[permutation]
+            arrays = {name: array[permutation] for name, array in arrays.items()}
+            position = np.empty_like(permutation)
+            position[permutation] = np.arange(len(permutation))
+            item_order = position[item_order]
+
+        new_order = np.searchsorted(order_id, items[:, 0].astype(np.int64))
+        found = new_order < len(order_id)
+        found[found] = order_id[new_order[found]] == items[found, 0]
+        return cls(
+            order_id=order_id,
+            **arrays,
+            item_order=np.concatenate([item_order, new_order[found]]),
+            item_product=np.concatenate(
+                [previous.item_product[keep], items[found, 1].astype(np.int32)]
+            ),
+            item_quantity=np.concatenate(
+                [previous.item_quantity[keep], items[found, 2].astype(np.int32)]
+            ),
+            item_price=np.concatenate([previous.item_price[keep], items[found, 3]]),
+            customers=customers,
+            product_names=product_names,
+            max_item_id=max(previous.max_item_id, max_item_id),
+            loaded_at=loaded_at,
+        )
+
+    @classmethod
+    def empty(cls, loaded_at: datetime) -> "SnapshotColumns":
+        return cls(
+            order_id=np.empty(0, dtype=np.int64),
+            order_customer=np.empty(0, dtype=np.int32),
+            order_day=np.empty(0, dtype=np.int32),
+            order_amount=np.empty(0, dtype=np.float64),
+            order_delivered=np.empty(0, dtype=np.bool_),
+            item_order=np.empty(0, dtype=np.int64),
+            item_product=np.empty(0, dtype=np.int32),
+            item_quantity=np.empty(0, dtype=np.int32),
+            item_price=np.empty(0, dtype=np.float64),
+            customers={},
+            product_names={},
+            max_item_id=0,
+            loaded_at=loaded_at,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray))
+
+    # Derived columns, computed on first use and dropped with this version
+
+    @cached_property
+    def countries(self) -> Tuple[str, ...]:
+        """Country names by code"""
+        return tuple(sorted({c[2] for c in self.customers.values() if c[2] is not None}))
+
+    @cached_property
+    def order_country(self) -> "np.ndarray":
+        """
+        Country code of each order's customer (-1 if the customer is unknown or
+        has no country, the rows the sales rollup leaves out)
+        """
+        codes = {country: code for code, country in enumerate(self.countries)}
+        size = max(max(self.customers, default=0), int(self.order_customer.max(initial=0))) + 1
+        by_customer = np.full(size, -1, dtype=np.int32)
+        for customer_id, customer in self.customers.items():
+            by_customer[customer_id] = codes.get(customer[2], -1)
+        return by_customer[self.order_customer]
+
+    @cached_property
+    def order_year(self) -> "np.ndarray":
+        return (
+            self.order_day.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int32) + 1970
+        )
+
+    @cached_property
+    def amount_order(self) -> "np.ndarray":
+        """Order positions sorted by total_amount"""
+        return np.argsort(self.order_amount, kind="stable")
+
+    @cached_property
+    def customer_stats(self) -> Dict[str, "np.ndarray"]:
+        """Per customer id: order count, total spent and largest order, over all orders"""
+        size = int(self.order_customer.max(initial=0)) + 1
+        largest = np.full(size, -np.inf)
+        np.maximum.at(largest, self.order_customer, self.order_amount)
+        counts = np.bincount(self.order_customer, minlength=size)
+        known = np.zeros(size, dtype=np.bool_)
+        ids = np.fromiter((c for c in self.customers if c < size), dtype=np.int64)
+        known[ids] = True
+        return {
+            "order_count": counts,
+            "total_spent": np.bincount(self.order_customer, self.order_amount, minlength=size),
+            "max_order": largest,
+            # Customers with at least one order, the rows the SQL join returns
+            "ranked": np.flatnonzero((counts > 0) & known),
+        }
+
+    # Queries
+
+    def sales_summary(
+        self,
+        metrics: Sequence[str] = DEFAULT_SALES_METRICS,
+        country: Optional[str] = None,
+        year: Optional[int] = None,
+    ):
+        """Same rows as order_repository.get_sales_summary (without approx or group_by)"""
+        metrics = normalize_sales_metrics(metrics)
+        fields = ("country", "year", "count") + tuple(
+            "average" if m == "avg" else m for m in metrics if m != "count"
+        )
+        Row = _sales_row(fields)
+
+        mask = self.order_delivered & (self.order_country >= 0)
+        if country is not None:
+            if country not in self.countries:
+                return [], 0
+            mask &= self.order_country == self.countries.index(country)
+        if year is not None:
+            mask &= self.order_year == year
+        if not mask.any():
+            return [], 0
+
+        # One integer key per (country, year) group, small enough to radix sort
+        first_year = int(self.order_year[mask].min())
+        span = int(self.order_year[mask].max()) - first_year + 1
+        key = self.order_country.astype(np.int64) * span + (self.order_year - first_year)
+        group_count = len(self.countries) * span
+        key = key.astype(np.uint16 if group_count <= np.iinfo(np.uint16).max else np.int64)
+
+        counts = np.bincount(key[mask], minlength=group_count)
+        groups = np.flatnonzero(counts)
+        counts = counts[groups]
+        sums = np.bincount(key[mask], self.order_amount[mask], minlength=group_count)[groups]
+        values = {"sum": sums, "average": sums / counts}
+
+        if any(m == "max" or m in PERCENTILES for m in metrics):
+            # Amount order within each group: amount-sorted positions, stably sorted by group
+            by_amount = self.amount_order[mask[self.amount_order]]
+            by_group = by_amount[np.argsort(key[by_amount], kind="stable")]
+            amounts = self.order_amount[by_group]
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            values["max"] = amounts[starts + counts - 1]
+            for metric, fraction in PERCENTILES.items():
+                # percentile_cont: linear interpolation between the neighbouring ranks
+                rank = fraction * (counts - 1)
+                low = np.floor(rank).astype(np.int64)
+                high = np.minimum(low + 1, counts - 1)
+                below, above = amounts[starts + low], amounts[starts + high]
+                values[metric] = below + (above - below) * (rank - low)
+
+        group_countries, group_years = np.divmod(groups, span)
+        group_years += first_year
+        ranked = np.lexsort((-sums, -group_years))
+        results = [
+            Row(
+                self.countries[group_countries[i]],
+                int(group_years[i]),
+                int(counts[i]),
+                *(float(values[field][i]) for field in fields[3:]),
+            )
+            for i in ranked
+        ]
+        return results, len(results)
+
+    def top_products_by_revenue(
+        self,
+        limit: int = 5,
+        country: Optional[str] = None,
+        year: Optional[int] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        """Same rows as product_repository.get_top_products_by_revenue"""
+        orders = self.order_delivered.copy()
+        if country is not None:
+            if country not in self.countries:
+                return [], 0
+            orders &= self.order_country == self.countries.index(country)
+        if year is not None:
+            orders &= self.order_year == year
+        if start_date is not None:
+            orders &= self.order_day >= _days(start_date)
+        if end_date is not None:
+            orders &= self.order_day <= _days(end_date)
+
+        items = orders[self.item_order]
+        products = self.item_product[items]
+        size = int(self.item_product.max(initial=0)) + 1
+        revenue = np.bincount(
+            products, self.item_quantity[items] * self.item_price[items], minlength=size
+        )
+        sold = np.bincount(products, minlength=size) > 0
+        known = np.fromiter((p for p in self.product_names if p < size), dtype=np.int64)
+        candidates = known[sold[known]]
+        candidates.sort()
+        results = [
+            TopProduct(int(p), self.product_names[p], float(revenue[p]), len(candidates))
+            for p in _top(revenue, candidates, limit).tolist()
+        ]
+        return results, len(candidates)
+
+    def most_frequent(self, limit: int = 5):
+        """Same rows as customer_repository.get_most_frequent"""
+        stats = self.customer_stats
+        ranked, counts = stats["ranked"], stats["order_count"]
+        results = [
+            MostFrequentCustomer(*self.customers[c], int(counts[c]), len(ranked))
+            for c in _top(counts, ranked, limit).tolist()
+        ]
+        return results, len(ranked)
+
+    def high_value(self, total: bool = True, limit: int = 5):
+        """Same rows as customer_repository.get_high_value"""
+        stats = self.customer_stats
+        ranked = stats["ranked"]
+        values = stats["total_spent" if total else "max_order"]
+        results = [
+            HighValueCustomer(*self.customers[c][:4], float(values[c]), len(ranked))
+            for c in _top(values, ranked, limit).tolist()
+        ]
+        return results, len(ranked)
+
+
+async def _fetch(db: AsyncSession, stmt, width: int) -> "np.ndarray":
+    """Streams stmt with a server-side cursor into a float64 (rows, width) array"""
+    chunks = [np.empty((0, width))]
+    result = await db.stream(stmt.execution_options(yield_per=LOAD_CHUNK_ROWS))
+    async for rows in result.partitions():
+        chunks.append(await asyncio.to_thread(np.array, [tuple(r) for r in rows], np.float64))
+    return np.concatenate(chunks)
+
+
+class OrderSnapshot:
+    """
+    Orders and order items held as NumPy columns in this process, answering
+    the sales summary, top products and customer rankings without a query.
+
+    The first load streams both tables; each refresh then reads only orders
+    above the id watermark or created or updated since the previous refresh
+    (minus the overlap, for late commits), and all items of those orders.
+    Every load reads from one REPEATABLE READ transaction, so orders and items
+    are consistent with each other. Results lag the database by at most one
+    refresh interval, like the rollup tables. Deleted orders are not detected;
+    the full reload every full_reload_interval seconds drops them.
+    """
+
+    def __init__(self, overlap: float, full_reload_interval: float = 3600.0):
+        """
+        overlap: Seconds the change window reaches back for late-committing writes.
+        full_reload_interval: Seconds after which a refresh reloads everything.
+        """
+        self.overlap = overlap
+        self.full_reload_interval = full_reload_interval
+        self.columns: Optional[SnapshotColumns] = None
+        self.refreshes = 0
+        self.errors = 0
+        self.last_changes = 0
+        self.last_duration_ms = 0.0
+        self._loaded_fully_at = float("-inf")
+        self._refreshing = False
+
+    @property
+    def ready(self) -> bool:
+        return self.columns is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        """Changes with every load (None before the first), for ETags and the response cache"""
+        return self.columns.loaded_at.isoformat() if self.columns is not None else None
+
+    async def refresh(self, full: bool = False) -> int:
+        """Brings the snapshot up to date and returns how many orders it read"""
+        if self._refreshing:
+            # A load is still running (the first one can take a while); it covers this one
+            return 0
+        self._refreshing = True
+        try:
+            return await self._refresh(full)
+        finally:
+            self._refreshing = False
+
+    async def _refresh(self, full: bool) -> int:
+        start = time.perf_counter()
+        previous = self.columns
+        full = full or previous is None
+        full = full or time.monotonic() - self._loaded_fully_at > self.full_reload_interval
+
+        async with read_session(timeout_ms=0) as db:
+            await db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            loaded_at = await db.scalar(select(func.now()))
+            orders_stmt = _orders_stmt().order_by(Order.id)
+            items_stmt = _items_stmt()
+            if not full:
+                since = previous.loaded_at - timedelta(seconds=self.overlap)
+                changed = or_(
+                    Order.id > int(previous.order_id[-1]) if len(previous.order_id) else True,
+                    Order.created_at >= since,
+                    Order.updated_at >= since,
+                )
+                orders_stmt = orders_stmt.where(changed)
+                items_stmt = items_stmt.where(
+                    or_(
+                        OrderItem.order_id.in_(select(Order.id).where(changed)),
+                        OrderItem.id > previous.max_item_id,
+                    )
+                )
+            orders = await _fetch(db, orders_stmt, 5)
+            items = await _fetch(db, items_stmt, 4)
+            max_item_id = await db.scalar(select(func.max(OrderItem.id))) or 0
+            customers = {
+                row.id: tuple(row)[1:]
+                for row in await db.execute(
+                    select(
+                        Customer.id,
+                        Customer.name,
+                        Customer.email,
+                        Customer.country,
+                        Customer.city,
+                        Customer.signup_date,
+                    )
+                )
+            }
+            product_names = dict((await db.execute(select(Product.id, Product.name))).all())
+
+        self.columns = await asyncio.to_thread(
+            SnapshotColumns.build,
+            None if full else previous,
+            orders,
+            items,
+            max_item_id,
+            customers,
+            product_names,
+            loaded_at,
+        )
+        if full:
+            self._loaded_fully_at = time.monotonic()
+        self.refreshes += 1
+        self.last_changes = len(orders)
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        return len(orders)
+
+    async def try_refresh(self, full: bool = False) -> bool:
+        """Refreshes the snapshot, logging instead of raising on failure"""
+        try:
+            await self.refresh(full)
+            return True
+        except Exception as e:
+            # Readers keep getting the last loaded snapshot (or SQL before the first)
+            self.errors += 1
+            logger.warning("Order snapshot refresh failed: %s", e)
+            return False
+
+    # Queries run in a worker thread so a scan over millions of rows doesn't stall the loop
+
+    async def get_sales_summary(self, **kwargs: Any):
+        return await asyncio.to_thread(self.columns.sales_summary, **kwargs)
+
+    async def get_top_products_by_revenue(self, **kwargs: Any):
+        return await asyncio.to_thread(self.columns.top_products_by_revenue, **kwargs)
+
+    async def get_most_frequent(self, **kwargs: Any):
+        return await asyncio.to_thread(self.columns.most_frequent, **kwargs)
+
+    async def get_high_value(self, **kwargs: Any):
+        return await asyncio.to_thread(self.columns.high_value, **kwargs)
+
+    def stats(self) -> dict:
+        columns = self.columns
+        return {
+            "ready": self.ready,
+            "orders": len(columns.order_id) if columns else 0,
+            "order_items": len(columns.item_order) if columns else 0,
+            "megabytes": round(columns.nbytes / 2**20, 1) if columns else 0,
+            "loaded_at": columns.loaded_at if columns else None,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "last_changes": self.last_changes,
+            "last_duration_ms": round(self.last_duration_ms, 2),
+        }
+
+
+order_snapshot = OrderSnapshot(
+    overlap=settings.ROLLUP_REFRESH_OVERLAP,
+    full_reload_interval=settings.ORDER_SNAPSHOT_FULL_RELOAD_INTERVAL,
+)
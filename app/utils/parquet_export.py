@@ -0,0 +1,266 @@
+"""
+Incremental export of the source tables to partitioned Parquet files
+"""
+
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import Date, DateTime, Float, Integer, cast, extract, func, or_, select
+from sqlalchemy.engine import Connection, Engine
+
+from app.models import Customer, Order, OrderItem, Product, Review
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor, converted and written at a time
+EXPORT_CHUNK_ROWS = 50_000
+
+MANIFEST = "_manifest.json"
+
+# Column added to every row: the export run that wrote it. A row changed after
+# it was exported appears again in a later run; the highest _batch is current.
+BATCH_COLUMN = "_batch"
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    """
+    model: Table exported with all its columns.
+    partition_by: Timestamp whose year names the row's partition directory (year=2025).
+    parent: Table joined for partition_by; a changed parent row re-exports its rows.
+    """
+
+    model: type
+    partition_by: Optional[object] = None
+    parent: Optional[type] = None
+
+
+EXPORT_TABLES: Dict[str, ExportTable] = {
+    "customers": ExportTable(Customer),
+    "products": ExportTable(Product),
+    "orders": ExportTable(Order, partition_by=Order.created_at),
+    # Partitioned by their order's year, so both tables' partitions line up
+    "order_items": ExportTable(OrderItem, partition_by=Order.created_at, parent=Order),
+    "reviews": ExportTable(Review, partition_by=Review.created_at),
+}
+
+
+@dataclass
+class ExportResult:
+    table: str
+    rows: int
+    files: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int32()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _schema(spec: ExportTable):
+    columns = spec.model.__table__.columns
+    return pa.schema(
+        [pa.field(c.name, _arrow_type(c), nullable=c.nullable) for c in columns]
+        + [pa.field(BATCH_COLUMN, pa.int32(), nullable=False)]
+    )
+
+
+def _export_stmt(spec: ExportTable, max_id: Optional[int], since: Optional[datetime]):
+    """All rows, or those above max_id or created or updated since (the table's or its parent's)"""
+    model = spec.model
+    stmt = select(*model.__table__.columns)
+    if spec.parent is not None:
+        stmt = stmt.join(spec.parent)
+    if spec.partition_by is not None:
+        stmt = stmt.add_columns(cast(extract("year", spec.partition_by), Integer).label("year"))
+    if since is not None:
+        changed = [model.id > max_id]
+        for table in (model, spec.parent):
+            for name in ("created_at", "updated_at"):
+                if table is not None and hasattr(table, name):
+                    changed.append(getattr(table, name) >= since)
+        stmt = stmt.where(or_(*changed))
+    return stmt
+
+
+class _PartitionWriters:
+    """
+    One ParquetWriter per partition of a run, opened on its first rows. Files
+    are written under a temporary name and only renamed by commit(), so an
+    interrupted run leaves nothing a reader picks up.
+    """
+
+    def __init__(self, directory: str, schema, batch: int):
+        self.directory = directory
+        self.schema = schema
+        self.batch = batch
+        self.writers: Dict[Optional[int], pq.ParquetWriter] = {}
+        self.paths: Dict[Optional[int], str] = {}
+
+    def write(self, partition: Optional[int], table) -> None:
+        writer = self.writers.get(partition)
+        if writer is None:
+            directory = self.directory
+            if partition is not None:
+                directory = os.path.join(directory, f"year={partition}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{self.batch:06d}.parquet")
+            writer = self.writers[partition] = pq.ParquetWriter(
+                path + ".tmp", self.schema, compression="zstd"
+            )
+            self.paths[partition] = path
+        writer.write_table(table)
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+
+    def commit(self) -> int:
+        self.close()
+        for path in self.paths.values():
+            os.replace(path + ".tmp", path)
+        return len(self.paths)
+
+    def abort(self) -> None:
+        self.close()
+        for path in self.paths.values():
+            if os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+
+def _export_table(
+    conn: Connection,
+    name: str,
+    spec: ExportTable,
+    writers: _PartitionWriters,
+    max_id: Optional[int],
+    since: Optional[datetime],
+) -> int:
+    schema = writers.schema
+    names = schema.names[:-1]
+    rows = 0
+    result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_ROWS).execute(
+        _export_stmt(spec, max_id, since)
+    )
+    for chunk in result.partitions():
+        columns = list(zip(*chunk))
+        arrays = [pa.array(columns[i], type=schema.field(n).type) for i, n in enumerate(names)]
+        arrays.append(pa.array([writers.batch] * len(chunk), type=pa.int32()))
+        table = pa.Table.from_arrays(arrays, schema=schema)
+        if spec.partition_by is None:
+            writers.write(None, table)
+        else:
+            years = pa.array(columns[-1], type=pa.int32())
+            for year in pc.unique(years).to_pylist():
+                writers.write(year, table.filter(pc.equal(years, year)))
+        rows += len(chunk)
+    logger.info("Exported %d rows of %s", rows, name)
+    return rows
+
+
+def _remove_other_batches(directory: str, batch: int) -> None:
+    keep = f"part-{batch:06d}.parquet"
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file != keep:
+                os.remove(os.path.join(root, file))
+
+
+def read_manifest(output: str) -> dict:
+    path = os.path.join(output, MANIFEST)
+    if not os.path.exists(path):
+        return {"batch": 0, "tables": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(output: str, manifest: dict) -> None:
+    path = os.path.join(output, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def export(
+    engine: Engine,
+    output: str,
+    tables: Optional[List[str]] = None,
+    full: bool = False,
+    overlap_seconds: float = 300.0,
+) -> List[ExportResult]:
+    """
+    Exports each table to output/<table>/[year=YYYY/]part-<batch>.parquet.
+
+    The first run (or full=True) writes every row; later runs only rows above
+    the table's id watermark or created or updated since the previous run
+    minus overlap_seconds (for writes that committed late). Watermarks are
+    kept in output/_manifest.json and only advance once a run's files are in
+    place. All tables are read from one REPEATABLE READ transaction, so a
+    run is a consistent snapshot. Deleted rows are only dropped by a full export.
+    """
+    tables = tables or list(EXPORT_TABLES)
+    unknown = set(tables) - set(EXPORT_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown tables: {sorted(unknown)}")
+
+    os.makedirs(output, exist_ok=True)
+    manifest = read_manifest(output)
+    batch = manifest["batch"] + 1
+    results = []
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+        with conn.begin():
+            exported_at = conn.scalar(select(func.now()))
+            for name in tables:
+                spec = EXPORT_TABLES[name]
+                state = None if full else manifest["tables"].get(name)
+                directory = os.path.join(output, name)
+
+                start = time.perf_counter()
+                max_id = conn.scalar(select(func.max(spec.model.id))) or 0
+                since = None
+                if state is not None:
+                    since = datetime.fromisoformat(state["exported_at"])
+                    since -= timedelta(seconds=overlap_seconds)
+                writers = _PartitionWriters(directory, _schema(spec), batch)
+                try:
+                    rows = _export_table(
+                        conn, name, spec, writers, state and state["max_id"], since
+                    )
+                    files = writers.commit()
+                except BaseException:
+                    writers.abort()
+                    raise
+                if state is None:
+                    # A full export replaces what earlier runs wrote, once its own files are in
+                    _remove_other_batches(directory, batch)
+
+                manifest["tables"][name] = {
+                    "max_id": max_id,
+                    "exported_at": exported_at.isoformat(),
+                    "last_batch": batch,
+                    "last_rows": rows,
+                }
+                manifest["batch"] = batch
+                _write_manifest(output, manifest)
+                results.append(ExportResult(name, rows, files, time.perf_counter() - start))
+    return results
@@ -0,0 +1,358 @@
+"""
+Rate limit backends that share counters between uvicorn workers.
+
+Both use the same sliding window estimate as the in-memory RateLimiter:
+- SharedMemoryRateLimiter: an mmap-backed hash table in a file, for all
+  workers on one host.
+- RedisRateLimiter: a Lua script on a Redis-protocol server, for many hosts.
+"""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+import redis.asyncio
+from redis.exceptions import RedisError
+
+from app.utils.rate_limiter import (
+    RateLimitBackend,
+    TokenBudget,
+    admit,
+    new_counters,
+    take_tokens,
+)
+
+logger = logging.getLogger(__name__)
+
+# File header: magic, slot count, stripe count, then the slot format and windows
+_MAGIC = b"RLSHM001"
+_HEADER = struct.Struct("<8sII")
+_LAYOUT_SIZE = 256
+# Per stripe: slots in use, idle evictions, capacity evictions
+_STRIPE_STATS = struct.Struct("<QQQ")
+# Slots looked at before the least recently admitted one is overwritten
+PROBE_LIMIT = 16
+
+
+class SharedMemoryRateLimiter(RateLimitBackend):
+    """
+    Rate limiter whose counters live in a memory-mapped file shared by every
+    worker process on the host (put it on /dev/shm so it never touches disk).
+
+    The file is an open-addressing hash table split into stripes. Each stripe
+    is guarded by an fcntl byte-range lock for other processes and a
+    threading.Lock for threads of this process. A client key is a 64-bit
+    blake2b fingerprint, stable across processes unlike hash().
+
+    Each slot stores the fingerprint followed by the same counters as the
+    in-memory limiter (see new_counters). Idle slots (no admission for two longest windows) are
+    reused in place. When all PROBE_LIMIT slots a key may use are live, the
+    least recently admitted one is overwritten.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[int, int],
+        path: str,
+        slots: int,
+        stripes: int = 16,
+        budget: Optional[TokenBudget] = None,
+    ):
+        super().__init__(limits, budget)
+        self.path = path
+        self.stripes = stripes
+        self.slots_per_stripe = max(slots // stripes, PROBE_LIMIT)
+        self.slots = self.slots_per_stripe * stripes
+        self._slot = struct.Struct("<Qd" + "qII" * len(self.windows) + "dd")
+        self._stats_offset = _HEADER.size + _LAYOUT_SIZE
+        self._slots_offset = self._stats_offset + _STRIPE_STATS.size * stripes
+        self._size = self._slots_offset + self._slot.size * self.slots
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._initialize()
+        self._mm = mmap.mmap(self._fd, self._size)
+
+    def _layout(self) -> bytes:
+        layout = repr((self._slot.format, self.windows)).encode()
+        if len(layout) > _LAYOUT_SIZE:
+            raise ValueError("Too many rate limit windows for the shared table header")
+        return _HEADER.pack(_MAGIC, self.slots, self.stripes) + layout.ljust(_LAYOUT_SIZE, b"\0")
+
+    def _initialize(self) -> None:
+        """Formats the file unless another worker already did with the same layout"""
+        expected = self._layout()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            current = os.pread(self._fd, len(expected), 0)
+            if current != expected or os.fstat(self._fd).st_size != self._size:
+                # Truncating first zero-fills every slot and counter
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self._size)
+                os.pwrite(self._fd, expected, 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _fingerprint(ip: str) -> int:
+        # 0 marks an empty slot, so it is never a valid fingerprint
+        digest = hashlib.blake2b(ip.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1
+
+    async def is_rate_limited(self, ip: str, cost: float = 1.0) -> bool:
+        now = time.time()
+        key = self._fingerprint(ip)
+        stripe = key % self.stripes
+        stats_offset = self._stats_offset + stripe * _STRIPE_STATS.size
+
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _STRIPE_STATS.size, stats_offset)
+            try:
+                offset, counters = self._find_slot(key, stripe, stats_offset, now)
+                limited = admit(self.windows, self.budget, counters, cost, now)
+                self._slot.pack_into(self._mm, offset, key, *counters)
+                return limited
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _STRIPE_STATS.size, stats_offset)
+
+    async def spend(self, ip: str, tokens: float) -> bool:
+        if self.budget is None:
+            return True
+        now = time.time()
+        key = self._fingerprint(ip)
+        stripe = key % self.stripes
+        stats_offset = self._stats_offset + stripe * _STRIPE_STATS.size
+
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _STRIPE_STATS.size, stats_offset)
+            try:
+                found = self._find_slot(key, stripe, stats_offset, now, claim=False)
+                if found is None:
+                    return True
+                offset, counters = found
+                enough = take_tokens(self.budget, counters, tokens, now)
+                self._slot.pack_into(self._mm, offset, key, *counters)
+                return enough
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _STRIPE_STATS.size, stats_offset)
+
+    def _find_slot(self, key: int, stripe: int, stats_offset: int, now: float, claim=True):
+        """
+        Returns (offset, counters) of the key's slot, claiming one if needed
+        (or None when claim is False and the key has no slot).
+        Slots are never emptied again once used, so probing can stop at the
+        first empty slot.
+        """
+        cutoff = now - 2 * self.longest_window
+        first = self._slots_offset + stripe * self.slots_per_stripe * self._slot.size
+        home = (key // self.stripes) % self.slots_per_stripe
+        empty = idle = oldest = None
+        oldest_admitted = float("inf")
+
+        for probe in range(PROBE_LIMIT):
+            offset = first + (home + probe) % self.slots_per_stripe * self._slot.size
+            fields = self._slot.unpack_from(self._mm, offset)
+            if fields[0] == key:
+                return offset, list(fields[1:])
+            if fields[0] == 0:
+                empty = offset
+                break
+            if fields[1] < cutoff:
+                idle = offset if idle is None else idle
+            elif fields[1] < oldest_admitted:
+                oldest, oldest_admitted = offset, fields[1]
+
+        if not claim:
+            return None
+        used, evictions, capacity_evictions = _STRIPE_STATS.unpack_from(self._mm, stats_offset)
+        if idle is not None:
+            offset, evictions = idle, evictions + 1
+        elif empty is not None:
+            offset, used = empty, used + 1
+        else:
+            offset, capacity_evictions = oldest, capacity_evictions + 1
+        _STRIPE_STATS.pack_into(self._mm, stats_offset, used, evictions, capacity_evictions)
+        return offset, new_counters(self.windows, self.budget, now)
+
+    def stats(self) -> dict:
+        totals = [0, 0, 0]
+        for stripe in range(self.stripes):
+            offset = self._stats_offset + stripe * _STRIPE_STATS.size
+            for i, value in enumerate(_STRIPE_STATS.unpack_from(self._mm, offset)):
+                totals[i] += value
+        return {
+            "backend": "shared",
+            "path": self.path,
+            "stripes": self.stripes,
+            "slots": self.slots,
+            # Includes idle clients whose slots have not been reused yet
+            "clients": totals[0],
+            "evictions": totals[1],
+            "capacity_evictions": totals[2],
+        }
+
+    def close(self) -> None:
+        self._mm.close()
+        os.close(self._fd)
+
+
+# KEYS: current and previous bucket key per window, then the token bucket key
+# ARGV: now, cost, capacity (negative: no budget), refill per second,
+#       then window and limit per window
+_SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local refill = tonumber(ARGV[4])
+local windows = (#KEYS - 1) / 2
+for i = 1, windows do
+    local window = tonumber(ARGV[3 + 2 * i])
+    local limit = tonumber(ARGV[4 + 2 * i])
+    local position = now / window
+    local overlap = 1 - (position - math.floor(position))
+    local current = tonumber(redis.call('GET', KEYS[2 * i - 1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2 * i]) or '0')
+    if previous * overlap + current >= limit then
+        return 1
+    end
+end
+if capacity >= 0 then
+    local bucket = redis.call('HMGET', KEYS[#KEYS], 'tokens', 'refilled_at')
+    local tokens = capacity
+    if bucket[1] then
+        tokens = math.min(capacity, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * refill)
+    end
+    local enough = tokens >= cost
+    if enough then
+        tokens = tokens - cost
+    end
+    redis.call('HSET', KEYS[#KEYS], 'tokens', tokens, 'refilled_at', now)
+    -- Kept until it would be full again; without refill, forgotten like an
+    -- idle client of the in-memory limiter (two longest windows)
+    local ttl = 0
+    if refill > 0 then
+        ttl = math.ceil(capacity / refill) + 1
+    else
+        for i = 1, windows do
+            ttl = math.max(ttl, 2 * tonumber(ARGV[3 + 2 * i]))
+        end
+    end
+    if ttl > 0 then
+        redis.call('EXPIRE', KEYS[#KEYS], ttl)
+    end
+    if not enough then
+        return 1
+    end
+end
+for i = 1, windows do
+    redis.call('INCR', KEYS[2 * i - 1])
+    redis.call('EXPIRE', KEYS[2 * i - 1], 2 * tonumber(ARGV[3 + 2 * i]))
+end
+return 0
+"""
+
+# KEYS: token bucket key; ARGV: now, tokens to spend, capacity, refill per second
+_SPEND_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'refilled_at')
+if not bucket[1] then
+    return 0
+end
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local tokens = math.min(
+    tonumber(ARGV[3]), tonumber(bucket[1]) + (now - tonumber(bucket[2])) * tonumber(ARGV[4])
+)
+local enough = tokens >= cost
+if enough then
+    tokens = tokens - cost
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'refilled_at', now)
+if enough then
+    return 0
+end
+return 1
+"""
+
+
+class RedisRateLimiter(RateLimitBackend):
+    """
+    Rate limiter backed by a Redis-protocol server (Redis, Valkey, KeyDB...).
+
+    Each bucket is a counter key expiring after two windows, so Redis does
+    the idle eviction; the token bucket is a hash expiring once it would be
+    full again. A Lua script reads the estimate, spends tokens and increments
+    the counters atomically in one round trip. The client key is in a hash
+    tag so all of a client's keys land on the same cluster slot. The client
+    is a redis.asyncio one, so waiting on the server never blocks the event loop.
+
+    If the server is unreachable the request is admitted (fail open) and
+    counted in stats, so an outage of the limiter does not take the API down.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[int, int],
+        client,
+        prefix: str = "rate-limit",
+        budget: Optional[TokenBudget] = None,
+    ):
+        """
+        client: a redis.asyncio.Redis (or compatible) client.
+        """
+        super().__init__(limits, budget)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_SLIDING_WINDOW_SCRIPT)
+        self._spend_script = client.register_script(_SPEND_SCRIPT)
+        capacity, refill = budget if budget is not None else (-1, 0)
+        self._budget_args = [capacity, refill]
+        self._window_args: List[int] = [n for window in self.windows for n in window]
+        self.errors = 0
+
+    @classmethod
+    def from_url(
+        cls, limits: Dict[int, int], url: str, budget: Optional[TokenBudget] = None
+    ) -> "RedisRateLimiter":
+        return cls(limits, redis.asyncio.Redis.from_url(url, socket_timeout=0.05), budget=budget)
+
+    def _keys(self, ip: str, now: float) -> List[str]:
+        keys = []
+        for window_seconds, _ in self.windows:
+            bucket = int(now / window_seconds)
+            keys.append(f"{self.prefix}:{{{ip}}}:{window_seconds}:{bucket}")
+            keys.append(f"{self.prefix}:{{{ip}}}:{window_seconds}:{bucket - 1}")
+        keys.append(self._bucket_key(ip))
+        return keys
+
+    def _bucket_key(self, ip: str) -> str:
+        return f"{self.prefix}:{{{ip}}}:tokens"
+
+    async def is_rate_limited(self, ip: str, cost: float = 1.0) -> bool:
+        now = time.time()
+        args = [now, cost, *self._budget_args, *self._window_args]
+        try:
+            return await self._script(keys=self._keys(ip, now), args=args) == 1
+        except (RedisError, OSError):
+            self.errors += 1
+            logger.warning("Rate limit backend unavailable, admitting request", exc_info=True)
+            return False
+
+    async def spend(self, ip: str, tokens: float) -> bool:
+        if self.budget is None:
+            return True
+        args = [time.time(), tokens, *self._budget_args]
+        try:
+            return await self._spend_script(keys=[self._bucket_key(ip)], args=args) == 0
+        except (RedisError, OSError):
+            self.errors += 1
+            logger.warning("Rate limit backend unavailable, admitting request", exc_info=True)
+            return True
+
+    def stats(self) -> dict:
+        return {"backend": "redis", "prefix": self.prefix, "errors": self.errors}
@@ -1,67 +1,336 @@
 import threading
 import time
-from collections import deque
-from typing import Dict
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 
 from fastapi import HTTPException, Request, status
 
+from app.config import settings
 
-class RateLimiter:
+# Upper bound on idle clients dropped while handling a single request
+EVICTIONS_PER_CALL = 100
+
+# ASGI scope key marking requests the app sends itself (cache prewarming),
+# which are not charged to any client
+RATE_LIMIT_EXEMPT = "rate_limit_exempt"
+
+
+class TokenBudget(NamedTuple):
     """
-    In-memory rate limiter with rolling window logic.
-    Supports multiple windows (e.g., minute and hour).
+    Token bucket every client spends route costs from.
+    Idle clients are forgotten after two longest windows and come back with a
+    full bucket, so capacity / refill_per_second should be shorter than that.
+    """
+
+    capacity: float
+    refill_per_second: float
+
+
+class RouteCost(NamedTuple):
+    """Tokens a route charges; cache hits are charged cache_hit_cost instead"""
+
+    cost: float
+    cache_hit_cost: float
+
+
+# Charged by routes that don't declare a cost
+DEFAULT_ROUTE_COST = RouteCost(1.0, 1.0)
+
+
+def new_counters(windows: Sequence[Tuple[int, int]], budget: Optional[TokenBudget], now: float):
+    """
+    Fresh per-client state shared by all backends:
+    [last_admitted, then bucket, current, previous for each window, tokens, refilled_at]
+    """
+    return [now] + [0, 0, 0] * len(windows) + [budget.capacity if budget else 0.0, now]
+
+
+def sliding_window_limited(
+    windows: Sequence[Tuple[int, int]], counters: List[float], now: float
+) -> bool:
+    """
+    Checks each window's sliding estimate against its limit.
+    Buckets in counters (see new_counters) are rolled forward in place.
     """
+    for i, (window_seconds, max_requests) in enumerate(windows):
+        slot = 3 * i + 1
+        position = now / window_seconds
+        bucket = int(position)
+
+        # Roll buckets forward; a gap of more than one bucket clears both
+        if bucket != counters[slot]:
+            adjacent = bucket == counters[slot] + 1
+            counters[slot + 2] = counters[slot + 1] if adjacent else 0
+            counters[slot + 1] = 0
+            counters[slot] = bucket
+
+        # Weight the previous bucket by its overlap with the rolling window
+        overlap = 1.0 - (position - bucket)
+        if counters[slot + 2] * overlap + counters[slot + 1] >= max_requests:
+            return True
+    return False
 
-    def __init__(self, limits: Dict[int, int]):
+
+def take_tokens(budget: TokenBudget, counters: List[float], cost: float, now: float) -> bool:
+    """Refills the client's bucket and spends cost from it if there is enough"""
+    tokens = min(budget.capacity, counters[-2] + (now - counters[-1]) * budget.refill_per_second)
+    counters[-1] = now
+    if tokens < cost:
+        counters[-2] = tokens
+        return False
+    counters[-2] = tokens - cost
+    return True
+
+
+def admit(
+    windows: Sequence[Tuple[int, int]],
+    budget: Optional[TokenBudget],
+    counters: List[float],
+    cost: float,
+    now: float,
+) -> bool:
+    """
+    Decides one request against every window and the token budget.
+    Returns True if it must be rejected; otherwise it is counted everywhere.
+    """
+    if sliding_window_limited(windows, counters, now):
+        return True
+    if budget is not None and not take_tokens(budget, counters, cost, now):
+        return True
+    for i in range(len(windows)):
+        counters[3 * i + 2] += 1
+    counters[0] = now
+    return False
+
+
+class RateLimitBackend(ABC):
+    """
+    Where rate limit state lives. The in-memory RateLimiter is per process;
+    the backends in app/utils/rate_limit_backends.py share state between workers.
+
+    Decisions are awaited on the event loop by rate_limit_dependency, so a
+    backend that goes over the network must do so without blocking it.
+    """
+
+    def __init__(self, limits: Dict[int, int], budget: Optional[TokenBudget] = None):
         """
         limits: Dict mapping window size (seconds) to max requests.
         Example: {60: 30, 3600: 300}
+        budget: Optional token bucket that route costs are charged against.
         """
         self.limits = limits
-        # Using a lock for thread safety since counters are in-memory
+        self.windows = list(limits.items())
+        self.longest_window = max(limits)
+        self.budget = budget
+
+    @abstractmethod
+    async def is_rate_limited(self, ip: str, cost: float = 1.0) -> bool:
+        """Records a request from ip and returns True if it must be rejected"""
+
+    @abstractmethod
+    async def spend(self, ip: str, tokens: float) -> bool:
+        """
+        Takes more tokens from ip's budget for a request already admitted, e.g.
+        once it turns out expensive. Returns False if there aren't enough.
+        """
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Returns counters for the admin endpoint"""
+
+
+class _Stripe:
+    """One independently locked shard of the limiter's client state"""
+
+    def __init__(self, max_clients: Optional[int]):
+        self.max_clients = max_clients
         self.lock = threading.Lock()
-        # Storage: {ip: {window_seconds: deque([timestamps])}}
-        self.history: Dict[str, Dict[int, deque]] = {}
+        # Storage: {ip: counters (see new_counters)}
+        # ordered from least to most recently admitted
+        self.history: OrderedDict[str, List[float]] = OrderedDict()
+        # Clients dropped after two longest windows without admitted requests
+        self.evictions = 0
+        # Clients dropped early because max_clients was reached
+        self.capacity_evictions = 0
 
-    def is_rate_limited(self, ip: str) -> bool:
+
+class RateLimiter(RateLimitBackend):
+    """
+    In-memory rate limiter using sliding window counters.
+    Supports multiple windows (e.g., minute and hour).
+
+    Each window keeps only the request counts of the current and the previous
+    fixed bucket (bucket = window-sized slice of time). The rolling count is
+    estimated as `previous * (1 - elapsed_fraction) + current`, so memory is
+    constant per client and window instead of one timestamp per request.
+
+    With a TokenBudget, each admitted request also spends its route's cost
+    from a per-client token bucket, so expensive routes run out first.
+
+    Client state is sharded by key across `stripes` independently locked maps,
+    so concurrent admissions of different clients rarely wait on each other.
+
+    Idle clients are evicted once their counters can no longer affect a decision
+    (two longest windows), and optionally when more than max_clients are tracked.
+
+    Error bound: the estimate assumes requests in the previous bucket were evenly
+    spread. It is exact for uniform traffic; in the worst case (previous bucket's
+    requests all bunched at its end) a client can get up to `limit * (1 + f)`
+    requests through in one rolling window, where f < 1 is how far the current
+    bucket has progressed. It never admits more than twice the limit.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[int, int],
+        max_clients: Optional[int] = None,
+        stripes: int = 1,
+        budget: Optional[TokenBudget] = None,
+    ):
+        """
+        limits: Dict mapping window size (seconds) to max requests.
+        Example: {60: 30, 3600: 300}
+        max_clients: Optional cap on tracked clients; least recently admitted go first.
+        stripes: Number of independently locked shards of client state.
+        budget: Optional token bucket that route costs are charged against.
+        """
+        super().__init__(limits, budget)
+        self.max_clients = max_clients
+        # The cap is enforced per stripe, rounded up so the total is never below it
+        stripe_cap = -(-max_clients // stripes) if max_clients is not None else None
+        self.stripes = [_Stripe(stripe_cap) for _ in range(stripes)]
+
+    async def is_rate_limited(self, ip: str, cost: float = 1.0) -> bool:
         """
         Main logic to check if an IP has exceeded any of the defined limits.
         """
         now = time.time()
+        stripe = self._stripe(ip)
+
+        with stripe.lock:
+            self._evict_idle(stripe, now)
+            history = stripe.history
+            counters = history.get(ip)
+            if counters is None:
+                counters = history[ip] = new_counters(self.windows, self.budget, now)
+                if stripe.max_clients is not None and len(history) > stripe.max_clients:
+                    history.popitem(last=False)
+                    stripe.capacity_evictions += 1
+
+            limited = admit(self.windows, self.budget, counters, cost, now)
+            if not limited:
+                history.move_to_end(ip)
+            return limited
+
+    async def spend(self, ip: str, tokens: float) -> bool:
+        if self.budget is None:
+            return True
+        stripe = self._stripe(ip)
+        with stripe.lock:
+            counters = stripe.history.get(ip)
+            if counters is None:
+                # Evicted since its request was admitted
+                return True
+            return take_tokens(self.budget, counters, tokens, time.time())
+
+    def _stripe(self, ip: str) -> _Stripe:
+        return self.stripes[hash(ip) % len(self.stripes)]
 
-        with self.lock:
-            if ip not in self.history:
-                self.history[ip] = {window: deque() for window in self.limits}
+    def _evict_idle(self, stripe: _Stripe, now: float) -> None:
+        """
+        Drops clients with no admitted request in the last two longest windows.
+        By then both buckets of every window have rolled over, so the client's
+        counters are all zero and forgetting it changes no decision.
+        The oldest entries sit at the front, so this is amortized O(1) per call.
+        """
+        cutoff = now - 2 * self.longest_window
+        history = stripe.history
+        for _ in range(EVICTIONS_PER_CALL):
+            if not history:
+                return
+            ip, counters = next(iter(history.items()))
+            if counters[0] >= cutoff:
+                return
+            del history[ip]
+            stripe.evictions += 1
 
-            client_history = self.history[ip]
+    def stats(self) -> dict:
+        """Returns live client count and eviction counters summed over stripes"""
+        totals = {"clients": 0, "evictions": 0, "capacity_evictions": 0}
+        for stripe in self.stripes:
+            with stripe.lock:
+                totals["clients"] += len(stripe.history)
+                totals["evictions"] += stripe.evictions
+                totals["capacity_evictions"] += stripe.capacity_evictions
+        return {
+            "backend": "memory",
+            "stripes": len(self.stripes),
+            "max_clients": self.max_clients,
+            **totals,
+        }
 
-            # Check each window
-            for window_seconds, max_requests in self.limits.items():
-                timestamps = client_history[window_seconds]
 
-                # Cleanup old timestamps
-                while timestamps and timestamps[0] < now - window_seconds:
-                    timestamps.popleft()
+def create_limiter(limits: Dict[int, int]) -> RateLimitBackend:
+    """Builds the backend selected by RATE_LIMIT_BACKEND"""
+    budget = None
+    if settings.RATE_LIMIT_BUDGET > 0:
+        budget = TokenBudget(settings.RATE_LIMIT_BUDGET, settings.RATE_LIMIT_REFILL_PER_SECOND)
 
-                # Check if limited
-                if len(timestamps) >= max_requests:
-                    return True
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return RateLimiter(
+            limits,
+            max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+            stripes=settings.RATE_LIMIT_STRIPES,
+            budget=budget,
+        )
 
-            # If not limited in any window, record this request in all windows
-            for window_seconds in self.limits:
-                client_history[window_seconds].append(now)
+    # Imported here because the backends build on the helpers above
+    from app.utils.rate_limit_backends import RedisRateLimiter, SharedMemoryRateLimiter
 
-            return False
+    if settings.RATE_LIMIT_BACKEND == "shared":
+        return SharedMemoryRateLimiter(
+            limits,
+            path=settings.RATE_LIMIT_SHARED_PATH,
+            slots=settings.RATE_LIMIT_SHARED_SLOTS,
+            stripes=settings.RATE_LIMIT_STRIPES,
+            budget=budget,
+        )
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimiter.from_url(limits, settings.RATE_LIMIT_REDIS_URL, budget=budget)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
 
 
 # Limits: 30 per 60s, 300 per 3600s
-limiter = RateLimiter(limits={60: 30, 3600: 300})
+limiter = create_limiter(limits={60: 30, 3600: 300})
+
+
+def rate_limit_cost(cost: float, cache_hit_cost: Optional[float] = None) -> Callable:
+    """
+    Declares what a route charges against the client's token budget.
+    Put it below the router decorator:
+
+        @router.get("/sales-summary")
+        @rate_limit_cost(20, cache_hit_cost=1)
+        async def get_sales_summary(...): ...
+    """
+
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.rate_limit_cost = RouteCost(
+            cost, cost if cache_hit_cost is None else cache_hit_cost
+        )
+        return endpoint
+
+    return decorator
 
 
 async def rate_limit_dependency(request: Request):
     """
     FastAPI dependency to be used globally.
+    Charges the matched route's declared cost (1 token by default).
     """
+    if request.scope.get(RATE_LIMIT_EXEMPT):
+        return
     # Try to get IP from X-Forwarded-For (proxies like Render/Nginx)
     forwarded = request.headers.get("X-Forwarded-For")
     if forwarded:
@@ -70,8 +339,28 @@ async def rate_limit_dependency(request: Request):
         # Fallback to direct client host
         client_ip = request.client.host if request.client else "unknown"
 
-    if limiter.is_rate_limited(client_ip):
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Please try again later.",
-        )
+    route_cost = getattr(request.scope.get("endpoint"), "rate_limit_cost", DEFAULT_ROUTE_COST)
+    if await limiter.is_rate_limited(client_ip, route_cost.cache_hit_cost):
+        raise _rate_limit_exceeded()
+    # Only the cache hit cost is charged up front, so clients low on tokens
+    # still get cached results and 304s; a miss pays the rest before computing
+    request.state.rate_limit_miss_cost = (client_ip, route_cost.cost - route_cost.cache_hit_cost)
+
+
+async def charge_cache_miss(request: Request) -> None:
+    """
+    Charges the current request the rest of its route's full cost, once it
+    turns out to need computing. Raises 429 if the client can't afford it.
+    """
+    client_ip, tokens = getattr(request.state, "rate_limit_miss_cost", (None, 0.0))
+    if tokens > 0:
+        request.state.rate_limit_miss_cost = (client_ip, 0.0)
+        if not await limiter.spend(client_ip, tokens):
+            raise _rate_limit_exceeded()
+
+
+def _rate_limit_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Rate limit exceeded. Please try again later.",
+    )
@@ -0,0 +1,276 @@
+"""
+In-process TTL + LRU cache for analytics results
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import read_session
+from app.utils.rate_limiter import RATE_LIMIT_EXEMPT, charge_cache_miss
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Computes a route's result on the given read session
+Compute = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class ResponseCache:
+    """
+    Bounded LRU of analytics results with a TTL chosen per route.
+
+    Entries are keyed by the request path and the applied_filters the router
+    reports in its metadata, so each distinct filter combination is cached
+    separately. Only the computed results are stored; metadata such as
+    requested_at is still built per request.
+
+    When the route declares its tables with @data_tables, each entry also
+    records the data versions it was computed at, and a lookup made at newer
+    versions drops the entry instead of serving it.
+
+    Stale-while-revalidate: while the refresher task runs (started from the
+    app lifespan), an entry past its TTL is still served for stale_ttl more
+    seconds and queued for a background recompute, so the request that
+    crosses the TTL boundary doesn't pay for the query. Without the
+    refresher, expired entries are simply recomputed by the request.
+
+    Clients can skip the lookup with `Cache-Control: no-cache` (the fresh
+    result is still stored) or bypass the cache entirely with `no-store`.
+    A hit only costs the route's cache_hit_cost; a miss is charged the rest of
+    its full rate limit cost before computing.
+
+    Every cache operation is synchronous on the event loop, so no lock is
+    needed; concurrent misses on the same key each compute the result.
+    """
+
+    def __init__(self, max_entries: int, stale_ttl: float = 0.0):
+        """
+        max_entries: Entries kept before the least recently used is dropped (0 disables).
+        stale_ttl: Seconds an expired entry may still be served while it is refreshed.
+        """
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        # Storage: {(path, filters): (expires_at, data_versions, value)}, least recently used first
+        self.entries: OrderedDict[Hashable, Tuple[float, Any, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        # Entries dropped because the cache was full
+        self.evictions = 0
+        # Entries found past their TTL (and stale window)
+        self.expirations = 0
+        # Entries dropped because the data they were computed from changed
+        self.invalidations = 0
+        # Hits served past the TTL while a refresh was queued
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        # Keys queued or being recomputed by the refresher
+        self.refreshing: Set[Hashable] = set()
+        self._refresh_queue: Optional[asyncio.Queue] = None
+
+    @staticmethod
+    def make_key(path: str, applied_filters: Dict[str, Any]) -> Hashable:
+        return (path, tuple(sorted(applied_filters.items())))
+
+    def lookup(self, key: Hashable, data_versions: Any = None, allow_stale: bool = False):
+        """
+        Returns (value, stale). value is _MISSING if absent, computed at other
+        versions, or expired (past the stale window too when allow_stale).
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return _MISSING, False
+        expires_at, entry_versions, value = entry
+        if entry_versions != data_versions:
+            del self.entries[key]
+            self.invalidations += 1
+            return _MISSING, False
+
+        now = time.monotonic()
+        stale = expires_at <= now
+        if stale and not (allow_stale and now < expires_at + self.stale_ttl):
+            del self.entries[key]
+            self.expirations += 1
+            return _MISSING, False
+        self.entries.move_to_end(key)
+        return value, stale
+
+    def get(self, key: Hashable, data_versions: Any = None) -> Any:
+        """Returns the cached value, or _MISSING if absent, expired or computed at other versions"""
+        return self.lookup(key, data_versions)[0]
+
+    def set(self, key: Hashable, value: Any, ttl: float, data_versions: Any = None) -> None:
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (time.monotonic() + ttl, data_versions, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        request: Request,
+        applied_filters: Dict[str, Any],
+        compute: Compute,
+        db: AsyncSession,
+        ttl: float,
+    ) -> Any:
+        """
+        Returns the cached result for this route and filters, or awaits
+        compute(db) and caches what it returns for ttl seconds. compute must
+        only use the session it is given, since a background refresh calls it
+        with its own. Exceptions are not cached.
+        """
+        key = self.make_key(request.url.path, applied_filters)
+        # Set by data_version_dependency for routes declared with @data_tables
+        versions = getattr(request.state, "data_versions", None)
+        cache_control = request.headers.get("cache-control", "").lower()
+
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            self.bypasses += 1
+            await charge_cache_miss(request)
+            value = await compute(db)
+            if "no-store" not in cache_control:
+                self.set(key, value, ttl, versions)
+            return value
+
+        refresher_running = self._refresh_queue is not None
+        value, stale = self.lookup(key, versions, allow_stale=refresher_running)
+        if value is not _MISSING:
+            self.hits += 1
+            if stale:
+                self.stale_hits += 1
+                self._queue_refresh(key, compute, ttl, versions)
+            return value
+
+        self.misses += 1
+        await charge_cache_miss(request)
+        value = await compute(db)
+        self.set(key, value, ttl, versions)
+        return value
+
+    def _queue_refresh(self, key: Hashable, compute: Compute, ttl: float, versions: Any) -> None:
+        if key in self.refreshing:
+            return
+        try:
+            self._refresh_queue.put_nowait((key, compute, ttl, versions))
+        except asyncio.QueueFull:
+            # Served stale again until the refresher catches up or the entry expires
+            return
+        self.refreshing.add(key)
+
+    async def run_refresher(self) -> None:
+        """
+        Recomputes queued stale entries one at a time, each on its own read
+        session. Runs until cancelled; meant to be started from the app lifespan.
+        """
+        self._refresh_queue = asyncio.Queue(maxsize=max(self.max_entries, 1))
+        try:
+            while True:
+                key, compute, ttl, versions = await self._refresh_queue.get()
+                try:
+                    async with read_session() as db:
+                        value = await compute(db)
+                    self.set(key, value, ttl, versions)
+                    self.refreshes += 1
+                except Exception as e:
+                    # The stale entry keeps being served until it leaves the stale window
+                    self.refresh_errors += 1
+                    logger.warning("Background refresh of %s failed: %s", key[0], e)
+                finally:
+                    self.refreshing.discard(key)
+        finally:
+            self._refresh_queue = None
+            self.refreshing.clear()
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counters"""
+        self.entries.clear()
+        self.hits = self.misses = self.bypasses = 0
+        self.evictions = self.expirations = self.invalidations = 0
+        self.stale_hits = self.refreshes = self.refresh_errors = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bypasses": self.bypasses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "refreshing": len(self.refreshing),
+        }
+
+
+async def prewarm(app: Callable, paths: Iterable[str]) -> int:
+    """
+    Fills the cache by sending GET requests for paths (with query strings)
+    through the ASGI app, so entries get exactly the keys, versions and TTLs
+    real requests produce. They are exempt from rate limiting, so no budget
+    caps how many paths get warmed. Returns how many paths answered 200.
+    """
+
+    async def receive():
+        if not received:
+            received.append(True)
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Never disconnects; the disconnect watcher polls with an immediate cancel
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    warmed = 0
+    for target in paths:
+        path, _, query = target.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"prewarm")],
+            "client": ("prewarm", 0),
+            "server": ("prewarm", 80),
+            RATE_LIMIT_EXEMPT: True,
+        }
+        received, statuses = [], []
+        try:
+            await app(scope, receive, send)
+        except Exception as e:
+            logger.warning("Prewarming %s failed: %s", target, e)
+            continue
+        if statuses == [200]:
+            warmed += 1
+        else:
+            logger.warning("Prewarming %s answered %s", target, statuses)
+    return warmed
+
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    stale_ttl=settings.RESPONSE_CACHE_STALE_TTL,
+)
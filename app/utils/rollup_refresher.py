@@ -0,0 +1,125 @@
+"""
+Background refresh of the pre-aggregated analytics tables
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import primary_session
+from app.models import RollupWatermark
+from app.repositories import rollup_repository
+from app.utils.data_versions import data_versions
+from app.utils.order_snapshot import order_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Refresh function of each rollup table: (db, overlap_seconds, full) -> groups changed
+ROLLUPS: Dict[str, Callable[[AsyncSession, float, bool], Awaitable[int]]] = {
+    rollup_repository.SALES_ROLLUP: rollup_repository.refresh_sales_rollup,
+    rollup_repository.PRODUCT_DAILY_REVENUE: rollup_repository.refresh_product_daily_revenue,
+    rollup_repository.CUSTOMER_ORDER_STATS: rollup_repository.refresh_customer_order_stats,
+}
+
+
+class RollupRefresher:
+    """
+    Keeps every rollup table current by refreshing it from its source tables
+    every interval seconds, followed by the order snapshot once it is loaded.
+    Meant to be run from the app lifespan; each worker runs one, and the
+    watermark row lock makes concurrent refreshes take turns.
+
+    ready is False until every rollup has been built once (a first build scans
+    all orders); routes aggregate from orders instead until then.
+    """
+
+    def __init__(self, interval: float, overlap: float):
+        """
+        interval: Seconds between refreshes.
+        overlap: Seconds the change window reaches back for late-committing writes.
+        """
+        self.interval = interval
+        self.overlap = overlap
+        self.refreshes = 0
+        self.errors = 0
+        # {rollup: groups changed by its last refresh}
+        self.last_changes: Dict[str, int] = {}
+        self.last_duration_ms = 0.0
+        self.ready = False
+
+    async def refresh(self, full: bool = False) -> Dict[str, int]:
+        """Refreshes every rollup once and returns how many groups each one changed"""
+        start = time.perf_counter()
+        changes = {}
+        for name, refresh in ROLLUPS.items():
+            # No statement timeout: a first build scans the whole source table
+            async with primary_session(timeout_ms=0) as db:
+                changes[name] = await refresh(db, self.overlap, full)
+        if any(changes.values()):
+            # Responses computed from now on are tagged with the new rollup versions
+            data_versions.reset()
+        if order_snapshot.ready:
+            # Right after the rollups, so both serve the same data
+            await order_snapshot.try_refresh()
+        self.refreshes += 1
+        self.ready = True
+        self.last_changes = changes
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        return changes
+
+    async def try_refresh(self) -> bool:
+        """Refreshes every rollup, logging instead of raising on failure"""
+        try:
+            await self.refresh()
+            return True
+        except Exception as e:
+            # Readers keep getting the last refreshed totals
+            self.errors += 1
+            logger.warning("Rollup refresh failed: %s", e)
+            return False
+
+    async def check_built(self) -> bool:
+        """Marks the refresher ready if every rollup was built before, e.g. by another worker"""
+        try:
+            async with primary_session() as db:
+                built = await db.scalar(
+                    select(func.count()).where(
+                        RollupWatermark.name.in_(ROLLUPS),
+                        RollupWatermark.refreshed_at.is_not(None),
+                    )
+                )
+        except (SQLAlchemyError, OSError) as e:
+            # Not ready until the first refresh succeeds
+            self.errors += 1
+            logger.warning("Could not check the rollup tables: %s", e)
+            return self.ready
+        self.ready = self.ready or built == len(ROLLUPS)
+        return self.ready
+
+    async def run(self) -> None:
+        """Refreshes right away, then every interval seconds until cancelled"""
+        while True:
+            await self.try_refresh()
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "ready": self.ready,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "last_changes": self.last_changes,
+            "last_duration_ms": round(self.last_duration_ms, 2),
+        }
+
+
+rollup_refresher = RollupRefresher(
+    interval=settings.ROLLUP_REFRESH_INTERVAL,
+    overlap=settings.ROLLUP_REFRESH_OVERLAP,
+)
@@ -0,0 +1,126 @@
+"""
+Single-flight coalescing of identical concurrent analytics queries
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import cancel_backend_query, read_session
+from app.utils.dependencies import CLIENT_CLOSED_REQUEST
+
+
+class _Flight:
+    """One shared in-flight execution and the requests waiting on it"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        # Session the shared query runs on, once it has started
+        self.db: Optional[AsyncSession] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Lets concurrent identical repository calls share one database execution.
+
+    Calls are keyed by the repository function and its keyword arguments. The
+    first caller starts the query as a separate task on its own read session
+    (same statement timeout class as the caller's session); later callers
+    with the same key await that task instead of querying again.
+
+    A caller whose client disconnects stops waiting with 499 right away; the
+    shared query is cancelled only once no caller is left waiting for it.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.flights: Dict[Hashable, _Flight] = {}
+        # Queries actually sent to the database
+        self.executions = 0
+        # Calls that joined an execution already in flight
+        self.coalesced = 0
+
+    async def run(self, db: AsyncSession, fn: Callable[..., Awaitable[Any]], **kwargs) -> Any:
+        """
+        Returns `await fn(db, **kwargs)`, sharing the execution with identical
+        calls already in flight. db is the caller's session from get_read_db.
+        """
+        if not self.enabled:
+            self.executions += 1
+            return await fn(db, **kwargs)
+
+        key = (fn, tuple(sorted(kwargs.items())))
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self._start(key, db.info["statement_timeout_ms"], fn, kwargs)
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await self._wait(flight, db.info.get("disconnected"))
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                await self._abandon(key, flight)
+
+    def _start(self, key: Hashable, timeout_ms: int, fn: Callable, kwargs: dict) -> _Flight:
+        flight = _Flight()
+
+        async def execute():
+            async with read_session(timeout_ms) as db:
+                flight.db = db
+                return await fn(db, **kwargs)
+
+        flight.task = asyncio.create_task(execute())
+        flight.task.add_done_callback(lambda task: self._finish(key, flight))
+        self.flights[key] = flight
+        self.executions += 1
+        return flight
+
+    async def _wait(self, flight: _Flight, disconnected: Optional[asyncio.Event]) -> Any:
+        """Waits for the shared result, or until this caller's client disconnects"""
+        if disconnected is None:
+            # Shielded so a cancelled caller doesn't cancel everyone's query
+            return await asyncio.shield(flight.task)
+
+        watcher = asyncio.create_task(disconnected.wait())
+        try:
+            await asyncio.wait({flight.task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+        if flight.task.done():
+            return flight.task.result()
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+
+    async def _abandon(self, key: Hashable, flight: _Flight) -> None:
+        """Cancels a shared query nobody waits for anymore"""
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if flight.db is not None and "backend_pid" in flight.db.info:
+            await cancel_backend_query(flight.db)
+        else:
+            # Nothing sent to the database yet
+            flight.task.cancel()
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        # Mark the outcome as retrieved even if every waiter left early
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self.flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+        }
+
+
+single_flight = SingleFlight(enabled=settings.ANALYTICS_SINGLE_FLIGHT)
@@ -0,0 +1,35 @@
+"""
+Per-request SQL instrumentation middleware
+"""
+
+from app.config import settings
+from app.database import QueryStats, current_query_stats
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that collects SQL stats for each HTTP request.
+    In debug mode the numbers and the slowest statement are returned as
+    X-DB-* response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope.get("path", ""))
+        token = current_query_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start" and settings.DEBUG:
+                message["headers"] = [*message.get("headers", []), *stats.as_headers()]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_query_stats.reset(token)
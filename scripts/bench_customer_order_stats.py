@@ -0,0 +1,72 @@
+"""
+Customer order stats benchmark.
+
+Times the customer rankings read from the customer_order_stats table against
+the same rankings grouped from orders on every call, and one incremental refresh.
+
+Usage:
+    python scripts/bench_customer_order_stats.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import customer_repository, rollup_repository  # noqa: E402
+
+
+async def timed(fn, rounds: int, **kwargs) -> list[float]:
+    """Latency (ms) of each call of fn on one session"""
+    latencies = []
+    async with primary_session(timeout_ms=0) as db:
+        await fn(db, **kwargs)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await fn(db, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(rounds: int) -> None:
+    refresh = await timed(rollup_repository.refresh_customer_order_stats, 5, overlap_seconds=300)
+    print(f"incremental refresh (no changes): median {statistics.median(refresh):.2f} ms")
+
+    print(f"{'ranking':>28}{'orders p50':>12}{'stats p50':>12}")
+    for name, raw_fn, stats_fn, kwargs in (
+        (
+            "most frequent",
+            customer_repository.get_most_frequent_from_orders,
+            customer_repository.get_most_frequent,
+            {},
+        ),
+        (
+            "high value (sum)",
+            customer_repository.get_high_value_from_orders,
+            customer_repository.get_high_value,
+            {"total": True},
+        ),
+        (
+            "high value (max)",
+            customer_repository.get_high_value_from_orders,
+            customer_repository.get_high_value,
+            {"total": False},
+        ),
+    ):
+        raw = await timed(raw_fn, rounds, **kwargs)
+        stats = await timed(stats_fn, rounds, **kwargs)
+        print(f"{name:>28}{statistics.median(raw):>12.2f}{statistics.median(stats):>12.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,107 @@
+"""
+Mixed-traffic latency benchmark.
+
+Fires concurrent requests against a running API (cheap lookups interleaved with
+heavy analytics aggregates) and reports p50/p95/p99 latency per traffic class.
+
+Usage:
+    uvicorn app.main:app --port 8000 &
+    python scripts/bench_latency.py --base-url http://127.0.0.1:8000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+
+CHEAP_PATHS = [
+    "/customers/?limit=10",
+    "/products/?limit=10",
+    "/orders/?limit=10",
+    "/reviews/?limit=10",
+]
+
+HEAVY_PATHS = [
+    "/orders/sales-summary",
+    "/products/top-revenue?limit=10",
+    "/customers/high-value?limit=10",
+    "/customers/most-frequent?limit=10",
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def worker(
+    client: httpx.AsyncClient,
+    requests_per_worker: int,
+    heavy_ratio: float,
+    latencies: dict[str, list[float]],
+    errors: list[int],
+) -> None:
+    """Sends a stream of mixed requests and records their latencies"""
+    for _ in range(requests_per_worker):
+        kind = "heavy" if random.random() < heavy_ratio else "cheap"
+        path = random.choice(HEAVY_PATHS if kind == "heavy" else CHEAP_PATHS)
+        # Spread requests across client IPs so the rate limiter stays out of the way
+        headers = {"X-Forwarded-For": f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.1"}
+
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if response.status_code != 200:
+            errors.append(response.status_code)
+        latencies[kind].append(elapsed_ms)
+
+
+async def run(base_url: str, concurrency: int, requests_per_worker: int, heavy_ratio: float):
+    """Runs the benchmark and prints a latency report"""
+    latencies: dict[str, list[float]] = {"cheap": [], "heavy": []}
+    errors: list[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Warm up connections and server-side caches of compiled statements
+        await asyncio.gather(*(client.get(path) for path in CHEAP_PATHS + HEAVY_PATHS))
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                worker(client, requests_per_worker, heavy_ratio, latencies, errors)
+                for _ in range(concurrency)
+            )
+        )
+        wall = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"\nconcurrency={concurrency} requests={total} wall={wall:.2f}s rps={total / wall:.1f}")
+    print(f"non-200 responses: {len(errors)}")
+    print(f"{'class':<8}{'count':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for kind, values in [*latencies.items(), ("all", latencies["cheap"] + latencies["heavy"])]:
+        if not values:
+            continue
+        print(
+            f"{kind:<8}{len(values):>8}{statistics.mean(values):>10.1f}"
+            f"{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+            f"{percentile(values, 99):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50, help="Requests per worker")
+    parser.add_argument("--heavy-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    random.seed(42)
+    asyncio.run(run(args.base_url, args.concurrency, args.requests, args.heavy_ratio))
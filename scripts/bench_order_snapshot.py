@@ -0,0 +1,179 @@
+"""
+Order snapshot benchmark.
+
+Builds a synthetic snapshot (10M order items over 2.5M orders by default) and
+times each analytics query on it. With --sql, the same rows are generated
+into temporary tables and the same aggregations are timed in Postgres.
+
+Usage:
+    python scripts/bench_order_snapshot.py [--items 10000000] [--rounds 20] [--sql]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import sys
+import time
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.utils.order_snapshot import SnapshotColumns  # noqa: E402
+
+ITEMS_PER_ORDER = 4
+CUSTOMERS = 200_000
+PRODUCTS = 5_000
+COUNTRIES = ("Brazil", "Canada", "France", "Germany", "India", "Japan", "Spain", "USA")
+FIRST_DAY = (date(2021, 1, 1) - date(1970, 1, 1)).days
+DAYS = 5 * 365
+
+SQL_SETUP = (
+    "CREATE TEMP TABLE bench_customers AS SELECT i AS id, "
+    f"(ARRAY{list(COUNTRIES)})[1 + i % {len(COUNTRIES)}] AS country "
+    f"FROM generate_series(0, {CUSTOMERS - 1}) i",
+    "CREATE TEMP TABLE bench_orders AS SELECT i AS id, "
+    f"(hashint4(i) & 2147483647) % {CUSTOMERS} AS customer_id, "
+    f"date '2021-01-01' + (hashint4(i + 1) & 2147483647) % {DAYS} AS day, "
+    "round((random() * 1000)::numeric, 2)::float8 AS total_amount, "
+    "random() < 0.6 AS delivered FROM generate_series(0, :orders - 1) i",
+    "CREATE TEMP TABLE bench_items AS SELECT i / 4 AS order_id, "
+    f"(hashint4(i) & 2147483647) % {PRODUCTS} AS product_id, "
+    "1 + i % 3 AS quantity, round((random() * 250)::numeric, 2)::float8 AS price "
+    "FROM generate_series(0, :items - 1) i",
+    "ANALYZE bench_customers, bench_orders, bench_items",
+)
+
+SQL_QUERIES = {
+    "sales summary": (
+        "SELECT c.country, extract(year FROM o.day) AS year, count(*), sum(total_amount), "
+        "avg(total_amount), max(total_amount), "
+        "percentile_cont(0.5) WITHIN GROUP (ORDER BY total_amount), "
+        "percentile_cont(0.99) WITHIN GROUP (ORDER BY total_amount) "
+        "FROM bench_orders o JOIN bench_customers c ON c.id = o.customer_id "
+        "WHERE delivered GROUP BY 1, 2 ORDER BY 2 DESC, 4 DESC"
+    ),
+    "top products": (
+        "SELECT product_id, sum(quantity * price) AS revenue, count(*) OVER () "
+        "FROM bench_items i JOIN bench_orders o ON o.id = i.order_id WHERE o.delivered "
+        "GROUP BY product_id ORDER BY revenue DESC LIMIT 10"
+    ),
+    "top products, one year": (
+        "SELECT product_id, sum(quantity * price) AS revenue, count(*) OVER () "
+        "FROM bench_items i JOIN bench_orders o ON o.id = i.order_id "
+        "WHERE o.delivered AND o.day >= date '2024-01-01' AND o.day < date '2025-01-01' "
+        "GROUP BY product_id ORDER BY revenue DESC LIMIT 10"
+    ),
+    "high value": (
+        "SELECT customer_id, sum(total_amount) AS value, count(*) OVER () "
+        "FROM bench_orders GROUP BY customer_id ORDER BY value DESC LIMIT 10"
+    ),
+}
+
+
+def synthetic_columns(items: int) -> SnapshotColumns:
+    rng = np.random.default_rng(0)
+    orders = items // ITEMS_PER_ORDER
+    order_rows = np.column_stack(
+        [
+            np.arange(1, orders + 1),
+            rng.integers(1, CUSTOMERS + 1, orders),
+            FIRST_DAY + rng.integers(0, DAYS, orders),
+            np.round(rng.gamma(2.0, 250.0, orders), 2),
+            rng.random(orders) < 0.6,
+        ]
+    ).astype(np.float64)
+    item_rows = np.column_stack(
+        [
+            np.repeat(np.arange(1, orders + 1), ITEMS_PER_ORDER),
+            rng.integers(1, PRODUCTS + 1, items),
+            rng.integers(1, 4, items),
+            np.round(rng.uniform(1, 250, items), 2),
+        ]
+    ).astype(np.float64)
+    customers = {
+        c: (f"Customer {c}", f"c{c}@example.com", COUNTRIES[c % len(COUNTRIES)], "City", None)
+        for c in range(1, CUSTOMERS + 1)
+    }
+    products = {p: f"Product {p}" for p in range(1, PRODUCTS + 1)}
+    return SnapshotColumns.build(
+        None, order_rows, item_rows, items, customers, products, datetime.now(timezone.utc)
+    )
+
+
+def timed(fn, rounds: int) -> list[float]:
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def time_sql(items: int, rounds: int) -> dict:
+    latencies = {}
+    async with primary_session(timeout_ms=0) as db:
+        start = time.perf_counter()
+        for statement in SQL_SETUP:
+            await db.execute(text(statement), {"orders": items // ITEMS_PER_ORDER, "items": items})
+        print(f"generated temp tables in {time.perf_counter() - start:.1f} s")
+        for name, query in SQL_QUERIES.items():
+            times = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                (await db.execute(text(query))).all()
+                times.append((time.perf_counter() - start) * 1000)
+            latencies[name] = times
+        await db.rollback()
+    await dispose_engines()
+    return latencies
+
+
+def main(items: int, rounds: int, sql: bool) -> None:
+    start = time.perf_counter()
+    columns = synthetic_columns(items)
+    print(
+        f"built snapshot: {len(columns.order_id):,} orders, {len(columns.item_order):,} items, "
+        f"{columns.nbytes / 2**20:.0f} MB of columns in {time.perf_counter() - start:.1f} s"
+    )
+    # Derived columns are computed once per snapshot version, on first use
+    start = time.perf_counter()
+    for name in ("order_country", "order_year", "amount_order", "customer_stats"):
+        getattr(columns, name)
+    print(f"derived columns in {time.perf_counter() - start:.2f} s")
+
+    queries = {
+        "sales summary": lambda: columns.sales_summary(
+            metrics=("count", "sum", "avg", "max", "median", "p99")
+        ),
+        "top products": lambda: columns.top_products_by_revenue(limit=10),
+        "top products, one year": lambda: columns.top_products_by_revenue(limit=10, year=2024),
+        "high value": lambda: columns.high_value(limit=10),
+    }
+    snapshot = {name: timed(fn, rounds) for name, fn in queries.items()}
+    sql_latencies = asyncio.run(time_sql(items, max(rounds // 4, 3))) if sql else {}
+
+    print(f"{'query':>24}{'snapshot p50 ms':>17}{'max ms':>10}{'sql p50 ms':>12}")
+    for name, latencies in snapshot.items():
+        sql_p50 = (
+            f"{statistics.median(sql_latencies[name]):>12.1f}" if name in sql_latencies else ""
+        )
+        print(f"{name:>24}{statistics.median(latencies):>17.2f}{max(latencies):>10.2f}{sql_p50}")
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000_000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--sql", action="store_true")
+    args = parser.parse_args()
+
+    main(args.items, args.rounds, args.sql)
@@ -0,0 +1,62 @@
+"""
+Product daily revenue benchmark.
+
+Times the top-revenue ranking read from the product_daily_revenue table against
+the same ranking aggregated from orders and order items on every call, for each
+filter shape, and one incremental refresh.
+
+Usage:
+    python scripts/bench_product_daily_revenue.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import product_repository, rollup_repository  # noqa: E402
+
+
+async def timed(fn, rounds: int, **kwargs) -> list[float]:
+    """Latency (ms) of each call of fn on one session"""
+    latencies = []
+    async with primary_session(timeout_ms=0) as db:
+        await fn(db, **kwargs)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await fn(db, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(rounds: int) -> None:
+    refresh = await timed(rollup_repository.refresh_product_daily_revenue, 5, overlap_seconds=300)
+    print(f"incremental refresh (no changes): median {statistics.median(refresh):.2f} ms")
+
+    year = date.today().year
+    print(f"{'filters':>28}{'orders p50':>12}{'rollup p50':>12}")
+    for name, filters in (
+        ("none", {}),
+        ("year", {"year": year}),
+        ("one month", {"start_date": date(year, 1, 1), "end_date": date(year, 1, 31)}),
+    ):
+        raw = await timed(
+            product_repository.get_top_products_by_revenue_from_orders, rounds, **filters
+        )
+        rollup = await timed(product_repository.get_top_products_by_revenue, rounds, **filters)
+        print(f"{name:>28}{statistics.median(raw):>12.2f}{statistics.median(rollup):>12.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
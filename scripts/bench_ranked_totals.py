@@ -0,0 +1,97 @@
+"""
+Ranked query total benchmark.
+
+Compares the previous two-statement way of answering a ranked analytics query
+(a count over the grouped subquery, then the limited ranking) with the single
+statement that returns the ranking and COUNT(*) OVER () together. Reports the
+server-side execution time (EXPLAIN ANALYZE) and the wall time per call.
+
+Usage:
+    python scripts/bench_ranked_totals.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text  # noqa: E402
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import customer_repository, product_repository  # noqa: E402
+
+YEAR = date.today().year
+
+# (label, single statement, params)
+CASES = [
+    ("most frequent (orders)", customer_repository._most_frequent_from_orders_stmt(), {}),
+    ("high value (orders)", customer_repository._high_value_from_orders_stmt(True), {}),
+    (
+        "top revenue (orders)",
+        product_repository._top_revenue_from_orders_stmt(False, False, False, False),
+        {},
+    ),
+    (
+        "top revenue (rollup, year)",
+        product_repository._top_revenue_stmt(False, True, False, False),
+        {"year_start": date(YEAR, 1, 1), "year_end": date(YEAR + 1, 1, 1)},
+    ),
+]
+
+
+def two_statements(stmt):
+    """The previous shape: count the groups of the unlimited query, then rank"""
+    total_stmt = select(func.count()).select_from(stmt.limit(None).order_by(None).subquery())
+    return [total_stmt, stmt]
+
+
+async def execution_ms(db, statements) -> float:
+    """Server-side execution time of the statements, from EXPLAIN ANALYZE"""
+    total = 0.0
+    for stmt in statements:
+        # EXPLAIN needs the bound values inlined
+        sql = str(stmt.compile(db.bind, compile_kwargs={"literal_binds": True}))
+        plan = "\n".join(await db.scalars(text(f"EXPLAIN (ANALYZE, SUMMARY) {sql}")))
+        total += float(re.search(r"Execution Time: ([\d.]+) ms", plan).group(1))
+    return total
+
+
+async def wall_ms(db, statements) -> float:
+    start = time.perf_counter()
+    for stmt in statements:
+        (await db.execute(stmt)).all()
+    return (time.perf_counter() - start) * 1000
+
+
+async def main(rounds: int) -> None:
+    print(
+        f"{'query':<28}{'server ms 2 stmts':>19}{'1 stmt':>9}{'wall ms 2 stmts':>17}{'1 stmt':>9}"
+    )
+    async with primary_session(timeout_ms=0) as db:
+        for label, stmt, params in CASES:
+            bound = stmt.params({**params, "limit": 5})
+            results = {}
+            for name, statements in (("two", two_statements(bound)), ("one", [bound])):
+                await wall_ms(db, statements)  # warm
+                server = [await execution_ms(db, statements) for _ in range(rounds // 10)]
+                wall = [await wall_ms(db, statements) for _ in range(rounds)]
+                results[name] = (statistics.median(server), statistics.median(wall))
+            print(
+                f"{label:<28}{results['two'][0]:>19.3f}{results['one'][0]:>9.3f}"
+                f"{results['two'][1]:>17.2f}{results['one'][1]:>9.2f}"
+            )
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,78 @@
+"""
+Rate limit backend latency benchmark.
+
+Measures the time of one admission decision (p50/p99) for each backend in
+app/utils/rate_limiter.py and app/utils/rate_limit_backends.py:
+  - memory: per-process striped dict
+  - shared: mmap hash table shared by all workers on the host
+  - redis:  Lua script on --redis-url, or an in-process fakeredis server
+            when no URL is given (no network, so only the script cost)
+
+Usage:
+    python scripts/bench_rate_limit_backends.py [--decisions 50000] [--clients 10000]
+        [--redis-url redis://localhost:6379/0]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.rate_limit_backends import (  # noqa: E402
+    RedisRateLimiter,
+    SharedMemoryRateLimiter,
+)
+from app.utils.rate_limiter import RateLimiter  # noqa: E402
+
+LIMITS = {60: 30, 3600: 300}
+
+
+async def latencies_us(limiter, clients: int, decisions: int) -> list[float]:
+    ips = [f"10.0.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    stream = [random.choice(ips) for _ in range(decisions)]
+    samples = []
+    for ip in stream:
+        began = time.perf_counter()
+        await limiter.is_rate_limited(ip)
+        samples.append((time.perf_counter() - began) * 1e6)
+    return sorted(samples)
+
+
+def redis_limiter(url):
+    if url:
+        return "redis", RedisRateLimiter.from_url(LIMITS, url)
+    import fakeredis
+
+    return "redis (fakeredis)", RedisRateLimiter(LIMITS, fakeredis.FakeAsyncRedis())
+
+
+async def main(decisions: int, clients: int, redis_url) -> None:
+    random.seed(7)
+    shared_path = os.path.join(tempfile.mkdtemp(), "rate-limit")
+    backends = [
+        ("memory", RateLimiter(LIMITS, stripes=16)),
+        ("shared", SharedMemoryRateLimiter(LIMITS, shared_path, slots=131_072)),
+        redis_limiter(redis_url),
+    ]
+
+    print(f"clients={clients} decisions={decisions} limits={LIMITS}")
+    print(f"{'backend':<20}{'p50 us':>10}{'p99 us':>10}{'max us':>10}")
+    for name, limiter in backends:
+        samples = await latencies_us(limiter, clients, decisions)
+        p50, p99 = samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+        print(f"{name:<20}{p50:>10.1f}{p99:>10.1f}{samples[-1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--decisions", type=int, default=50_000)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.decisions, args.clients, args.redis_url))
@@ -0,0 +1,171 @@
+"""
+Rate limiter benchmark.
+
+Compares the sliding-window-counter limiter in app/utils/rate_limiter.py with the
+previous timestamp-log (deque) implementation:
+  - memory per client with 100k distinct IPs
+  - decisions per second with 100k distinct IPs
+  - how their allow/deny decisions and admitted volume differ on simulated traffic
+
+Usage:
+    python scripts/bench_rate_limiter.py [--clients 100000] [--decisions 1000000]
+"""
+
+import argparse
+import asyncio
+import bisect
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import rate_limiter  # noqa: E402
+from app.utils.rate_limiter import RateLimiter  # noqa: E402
+
+LIMITS = {60: 30, 3600: 300}
+
+
+class DequeRateLimiter:
+    """The previous implementation: one timestamp per request per window"""
+
+    def __init__(self, limits: Dict[int, int]):
+        self.limits = limits
+        self.lock = threading.Lock()
+        self.history: Dict[str, Dict[int, deque]] = {}
+
+    async def is_rate_limited(self, ip: str) -> bool:
+        now = rate_limiter.time.time()
+        with self.lock:
+            if ip not in self.history:
+                self.history[ip] = {window: deque() for window in self.limits}
+            client_history = self.history[ip]
+            for window_seconds, max_requests in self.limits.items():
+                timestamps = client_history[window_seconds]
+                while timestamps and timestamps[0] < now - window_seconds:
+                    timestamps.popleft()
+                if len(timestamps) >= max_requests:
+                    return True
+            for window_seconds in self.limits:
+                client_history[window_seconds].append(now)
+            return False
+
+
+class SimulatedClock:
+    """Stands in for the time module so simulations don't have to sleep"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+async def memory_per_client(factory, clients: int, requests_per_client: int) -> float:
+    """Bytes allocated per client after each client made some requests"""
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    limiter = factory(LIMITS)
+    for _ in range(requests_per_client):
+        for ip in ips:
+            await limiter.is_rate_limited(ip)
+    used = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+    tracemalloc.stop()
+    # The IP strings belong to the caller, not to the limiter
+    return used / clients
+
+
+async def decisions_per_second(factory, clients: int, decisions: int) -> float:
+    """Throughput of is_rate_limited with keys spread over many clients"""
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(clients)]
+    stream = [random.choice(ips) for _ in range(decisions)]
+    limiter = factory(LIMITS)
+    start = time.perf_counter()
+    for ip in stream:
+        await limiter.is_rate_limited(ip)
+    return decisions / (time.perf_counter() - start)
+
+
+def max_in_rolling_window(timestamps: list[float], window: float) -> int:
+    """Most timestamps that fall inside any rolling window of the given size"""
+    best = 0
+    for i, t in enumerate(timestamps):
+        best = max(best, bisect.bisect_right(timestamps, t + window) - i)
+    return best
+
+
+async def decision_agreement(clients: int, duration: float) -> dict:
+    """Replays bursty random traffic through both limiters and compares outcomes"""
+    clock = rate_limiter.time
+    exact, approx = DequeRateLimiter(LIMITS), RateLimiter(LIMITS)
+    # Each client alternates between quiet periods and bursts; the fast ones
+    # run well above the per-minute limit for minutes at a time
+    events = []
+    for c in range(clients):
+        t = random.uniform(0, 60)
+        while t < duration:
+            rate = random.choice([0.02, 0.1, 0.5, 1.0])
+            for _ in range(random.randint(1, 60)):
+                t += random.expovariate(rate)
+                events.append((t, f"client-{c}"))
+    events.sort()
+
+    mismatches, admitted_exact = 0, 0
+    admitted_approx: Dict[str, list[float]] = {}
+    for t, ip in events:
+        clock.now = 1_000_000.0 + t
+        denied_exact = await exact.is_rate_limited(ip)
+        denied_approx = await approx.is_rate_limited(ip)
+        mismatches += denied_exact != denied_approx
+        admitted_exact += not denied_exact
+        if not denied_approx:
+            admitted_approx.setdefault(ip, []).append(t)
+
+    overshoot = {
+        window: max(max_in_rolling_window(ts, window) for ts in admitted_approx.values()) / limit
+        for window, limit in LIMITS.items()
+    }
+    return {
+        "events": len(events),
+        "mismatches": mismatches,
+        "admitted_exact": admitted_exact,
+        "admitted_approx": sum(len(ts) for ts in admitted_approx.values()),
+        "overshoot": overshoot,
+    }
+
+
+async def main(clients: int, decisions: int) -> None:
+    rate_limiter.time = SimulatedClock()
+    random.seed(7)
+
+    print(f"clients={clients} limits={LIMITS}")
+    print(f"{'limiter':<18}{'bytes/client':>14}{'decisions/s':>14}")
+    for name, factory in [("deque (before)", DequeRateLimiter), ("counter (after)", RateLimiter)]:
+        memory = await memory_per_client(factory, clients, requests_per_client=10)
+        throughput = await decisions_per_second(factory, clients, decisions)
+        print(f"{name:<18}{memory:>14.0f}{throughput:>14,.0f}")
+
+    result = await decision_agreement(clients=200, duration=4 * 3600)
+    print(f"\nsimulated bursty traffic: {result['events']} requests, 200 clients, 4h")
+    print(
+        f"decisions differing from exact log: {result['mismatches']} "
+        f"({result['mismatches'] / result['events']:.2%}), mostly at the limit boundary"
+    )
+    print(f"admitted: exact={result['admitted_exact']} counter={result['admitted_approx']}")
+    for window, ratio in result["overshoot"].items():
+        print(f"worst rolling {window}s window: {ratio:.2f}x the limit (bound: < 2x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100_000)
+    parser.add_argument("--decisions", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.clients, args.decisions))
@@ -0,0 +1,91 @@
+"""
+Rate limiter lock contention benchmark.
+
+Runs admission decisions from many threads at once, each on its own event
+loop, all sharing one limiter, and compares a single lock (stripes=1) with
+lock-striped client state.
+
+Each thread loops over: an admission decision for a random client, then
+--work-us microseconds of GIL-releasing work standing in for the rest of the
+request (database I/O). Reports admissions per second and the p99 time spent
+inside is_rate_limited, which includes waiting for the stripe lock.
+
+Usage:
+    python scripts/bench_rate_limiter_contention.py [--threads 1 2 4 8 16 32]
+        [--stripes 1 16] [--seconds 2] [--work-us 200]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.rate_limiter import RateLimiter  # noqa: E402
+
+# High enough that nothing gets denied; the benchmark is about admission cost
+LIMITS = {60: 1_000_000, 3600: 10_000_000}
+CLIENTS = 10_000
+
+
+def run(threads: int, stripes: int, seconds: float, work_us: float) -> tuple[float, float]:
+    """Returns (admissions per second, p99 decision latency in microseconds)"""
+    limiter = RateLimiter(LIMITS, stripes=stripes)
+    ips = [f"10.0.{i >> 8}.{i & 255}" for i in range(CLIENTS)]
+    start_barrier = threading.Barrier(threads + 1)
+    stop = threading.Event()
+    latencies: list[list[float]] = [[] for _ in range(threads)]
+    work = work_us / 1e6
+
+    async def worker(samples: list[float]) -> None:
+        rng = random.Random()
+        start_barrier.wait()
+        while not stop.is_set():
+            ip = ips[rng.randrange(CLIENTS)]
+            began = time.perf_counter()
+            await limiter.is_rate_limited(ip)
+            samples.append(time.perf_counter() - began)
+            if work:
+                time.sleep(work)
+
+    pool = [
+        threading.Thread(target=asyncio.run, args=(worker(latencies[i]),)) for i in range(threads)
+    ]
+    for thread in pool:
+        thread.start()
+    start_barrier.wait()
+    time.sleep(seconds)
+    stop.set()
+    for thread in pool:
+        thread.join()
+
+    samples = sorted(s for per_thread in latencies for s in per_thread)
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    return len(samples) / seconds, p99
+
+
+def main(thread_counts: list[int], stripe_counts: list[int], seconds: float, work_us: float):
+    print(f"work between decisions: {work_us:.0f}us, {seconds:.0f}s per run")
+    header = "".join(f"{f'stripes={n} adm/s':>20}{'p99 us':>10}" for n in stripe_counts)
+    print(f"{'threads':>8}{header}")
+    for threads in thread_counts:
+        row = ""
+        for stripes in stripe_counts:
+            throughput, p99 = run(threads, stripes, seconds, work_us)
+            row += f"{throughput:>20,.0f}{p99:>10.1f}"
+        print(f"{threads:>8}{row}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--stripes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--work-us", type=float, default=200.0)
+    args = parser.parse_args()
+
+    main(args.threads, args.stripes, args.seconds, args.work_us)
@@ -0,0 +1,58 @@
+"""
+Sales summary metric benchmark.
+
+Times the sales summary for single metrics against the previous behaviour of
+computing every default metric and discarding the rest, both aggregated from
+orders and read from the sales_rollup table.
+
+Usage:
+    python scripts/bench_sales_metrics.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import order_repository  # noqa: E402
+
+METRIC_SETS = [
+    ("all defaults (before)", order_repository.DEFAULT_SALES_METRICS),
+    ("sum", ("sum",)),
+    ("count", ("count",)),
+    ("p50,p90,p95,p99", ("median", "p90", "p95", "p99")),
+]
+
+
+async def timed(fn, rounds: int, **kwargs) -> list[float]:
+    """Latency (ms) of each call of fn on one session"""
+    latencies = []
+    async with primary_session(timeout_ms=0) as db:
+        await fn(db, **kwargs)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await fn(db, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(rounds: int) -> None:
+    print(f"{'metrics':<24}{'orders p50 ms':>15}{'rollup p50 ms':>15}")
+    for label, metrics in METRIC_SETS:
+        raw = await timed(order_repository.get_sales_summary_from_orders, rounds, metrics=metrics)
+        rollup = await timed(order_repository.get_sales_summary, rounds, metrics=metrics)
+        print(f"{label:<24}{statistics.median(raw):>15.2f}{statistics.median(rollup):>15.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
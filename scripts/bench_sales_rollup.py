@@ -0,0 +1,55 @@
+"""
+Sales rollup benchmark.
+
+Times the sales summary read from the sales_rollup table against the same
+summary aggregated from orders on every call, and one incremental refresh.
+
+Usage:
+    python scripts/bench_sales_rollup.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import order_repository, rollup_repository  # noqa: E402
+
+
+async def timed(fn, rounds: int, **kwargs) -> list[float]:
+    """Latency (ms) of each call of fn on one session"""
+    latencies = []
+    async with primary_session(timeout_ms=0) as db:
+        await fn(db, **kwargs)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await fn(db, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(rounds: int) -> None:
+    refresh = await timed(rollup_repository.refresh_sales_rollup, 5, overlap_seconds=300)
+    print(f"incremental refresh (no changes): median {statistics.median(refresh):.2f} ms")
+
+    print(f"{'query':>28}{'p50 ms':>10}{'max ms':>10}")
+    for name, fn in (
+        ("aggregate orders", order_repository.get_sales_summary_from_orders),
+        ("read sales_rollup", order_repository.get_sales_summary),
+    ):
+        latencies = await timed(fn, rounds)
+        print(f"{name:>28}{statistics.median(latencies):>10.2f}{max(latencies):>10.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,79 @@
+"""
+Sales sketch benchmark.
+
+Times p50/p95 per country and per year merged from the stored value sketches
+against computing them exactly by rescanning orders, and reports the largest
+relative error of the sketch values.
+
+Usage:
+    python scripts/bench_sales_sketch.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import order_repository  # noqa: E402
+
+KEYS = {"country": "c.country", "year": "extract(year FROM o.created_at)::int"}
+
+
+def exact_query(key: str):
+    return text(
+        f"SELECT {KEYS[key]} AS {key}, "
+        "percentile_cont(0.5) WITHIN GROUP (ORDER BY o.total_amount) AS median, "
+        "percentile_cont(0.95) WITHIN GROUP (ORDER BY o.total_amount) AS p95 "
+        "FROM orders o JOIN customers c ON c.id = o.customer_id "
+        "WHERE o.status = 'delivered' AND c.country IS NOT NULL GROUP BY 1"
+    )
+
+
+async def timed(fn, rounds: int) -> list[float]:
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(rounds: int) -> None:
+    print(f"{'group_by':<10}{'orders p50 ms':>15}{'sketch p50 ms':>15}{'max rel err':>13}")
+    async with primary_session(timeout_ms=0) as db:
+        for key in KEYS:
+
+            async def exact():
+                return (await db.execute(exact_query(key))).all()
+
+            async def approx():
+                rows, _ = await order_repository.get_sales_summary(
+                    db, metrics=("median", "p95"), approx=True, group_by=key
+                )
+                return rows
+
+            exact_rows = {getattr(r, key): r for r in await exact()}
+            error = max(
+                abs(getattr(row, m) / getattr(exact_rows[getattr(row, key)], m) - 1)
+                for row in await approx()
+                for m in ("median", "p95")
+            )
+            exact_ms = statistics.median(await timed(exact, rounds))
+            approx_ms = statistics.median(await timed(approx, rounds))
+            print(f"{key:<10}{exact_ms:>15.2f}{approx_ms:>15.2f}{error:>12.2%}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
@@ -0,0 +1,57 @@
+"""
+Sales time series benchmark.
+
+Times monthly and weekly series over the whole order history read from the
+product_daily_revenue rollup against the same series aggregated from orders
+and order items on every call.
+
+Usage:
+    python scripts/bench_sales_timeseries.py [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import dispose_engines, primary_session  # noqa: E402
+from app.repositories import order_repository  # noqa: E402
+
+
+async def timed(fn, rounds: int, **kwargs) -> list[float]:
+    """Latency (ms) of each call of fn on one session"""
+    latencies = []
+    async with primary_session(timeout_ms=0) as db:
+        await fn(db, **kwargs)
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await fn(db, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main(rounds: int) -> None:
+    history = {"start_date": date(2015, 1, 1), "end_date": date.today()}
+    print(f"{'query':>36}{'p50 ms':>10}{'max ms':>10}")
+    for interval in ("month", "week"):
+        for name, fn in (
+            ("aggregate orders", order_repository.get_sales_timeseries_from_orders),
+            ("read product_daily_revenue", order_repository.get_sales_timeseries),
+        ):
+            latencies = await timed(fn, rounds, interval=interval, **history)
+            label = f"{interval}: {name}"
+            print(f"{label:>36}{statistics.median(latencies):>10.2f}{max(latencies):>10.2f}")
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rounds))
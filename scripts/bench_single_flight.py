@@ -0,0 +1,71 @@
+"""
+Single-flight load test.
+
+Sends bursts of identical concurrent requests (a dashboard refresh) to one
+analytics endpoint and reports how many SQL statements the server ran per
+burst. With single-flight coalescing the count stays flat as concurrency
+rises; without it, it grows linearly.
+
+Requests carry `Cache-Control: no-store` so the response cache does not hide
+the database work. The server must run with DEBUG=True so it reports
+X-DB-Query-Count; compare runs with ANALYTICS_SINGLE_FLIGHT=True and False.
+
+Usage:
+    DEBUG=True uvicorn app.main:app --port 8000 &
+    python scripts/bench_single_flight.py --base-url http://127.0.0.1:8000 \
+        [--path "/orders/sales-summary?year=2025"] [--concurrency 1 8 32 128]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+
+async def burst(client: httpx.AsyncClient, path: str, concurrency: int) -> tuple[int, float]:
+    """Returns (SQL statements run by the server, wall time) for one burst"""
+
+    async def one():
+        # Spread requests across client IPs so the rate limiter stays out of the way
+        ip = f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        response = await client.get(
+            path, headers={"Cache-Control": "no-store", "X-Forwarded-For": ip}
+        )
+        response.raise_for_status()
+        return int(response.headers["x-db-query-count"])
+
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(one() for _ in range(concurrency)))
+    return sum(counts), time.perf_counter() - start
+
+
+async def main(base_url: str, path: str, levels: list[int], rounds: int) -> None:
+    limits = httpx.Limits(max_connections=max(levels))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        coalescing = (await client.get("/admin/single-flight")).json()["enabled"]
+        print(f"{path}  single-flight={'on' if coalescing else 'off'}")
+        print(f"{'concurrency':>12}{'SQL/burst':>12}{'SQL/request':>14}{'burst ms':>12}")
+        for concurrency in levels:
+            statements, elapsed = 0, 0.0
+            for _ in range(rounds):
+                count, seconds = await burst(client, path, concurrency)
+                statements += count
+                elapsed += seconds
+            per_burst = statements / rounds
+            print(
+                f"{concurrency:>12}{per_burst:>12.1f}{per_burst / concurrency:>14.2f}"
+                f"{elapsed / rounds * 1000:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/orders/sales-summary?year=2025")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.base_url, args.path, args.concurrency, args.rounds))
@@ -0,0 +1,81 @@
+"""
+Stale-while-revalidate benchmark.
+
+Measures the latency of the request that arrives just after a cached analytics
+result expired, with and without the background refresher. Runs the app
+in-process (httpx ASGI transport) against the configured database, expiring
+the entry before every measured request.
+
+Usage:
+    python scripts/bench_stale_while_revalidate.py [--path /orders/sales-summary] [--rounds 200]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.main import app  # noqa: E402
+from app.utils.rate_limiter import rate_limit_dependency  # noqa: E402
+from app.utils.response_cache import response_cache  # noqa: E402
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def measure(client: httpx.AsyncClient, path: str, rounds: int) -> list[float]:
+    """Latency (ms) of the first request after the entry expires, once per round"""
+    response_cache.clear()
+    (await client.get(path)).raise_for_status()
+    latencies = []
+    for _ in range(rounds):
+        for key, (_, versions, value) in list(response_cache.entries.items()):
+            response_cache.entries[key] = (time.monotonic() - 1, versions, value)
+        start = time.perf_counter()
+        (await client.get(path)).raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        # Let a queued refresh finish so the next round starts from a fresh entry
+        while response_cache.refreshing:
+            await asyncio.sleep(0.001)
+    return latencies
+
+
+async def main(path: str, rounds: int) -> None:
+    app.dependency_overrides[rate_limit_dependency] = lambda: None
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{path}, {rounds} requests crossing the TTL")
+        print(f"{'mode':>22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+        modes = [("recompute on expiry", False), ("stale-while-revalidate", True)]
+        for name, with_refresher in modes:
+            refresher = (
+                asyncio.create_task(response_cache.run_refresher()) if with_refresher else None
+            )
+            await asyncio.sleep(0)
+            latencies = await measure(client, path, rounds)
+            if refresher:
+                refresher.cancel()
+                await asyncio.gather(refresher, return_exceptions=True)
+            print(
+                f"{name:>22}{percentile(latencies, 50):>10.2f}"
+                f"{percentile(latencies, 95):>10.2f}{percentile(latencies, 99):>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--path", default="/orders/sales-summary")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.path, args.rounds))
@@ -0,0 +1,121 @@
+"""
+Statement construction micro-benchmark.
+
+Compares the per-call Python overhead of building a repository statement from
+scratch (the previous behaviour) with reusing the cached, parameterized statement
+from the repository's `_*_stmt` registry. Both variants also produce the cache key
+SQLAlchemy needs to look up the compiled SQL, since that traversal is part of the
+per-call cost and is memoized only on a reused statement instance.
+
+Usage:
+    python scripts/bench_statement_cache.py [--iterations 2000] [--execute]
+
+--execute additionally runs each statement against DATABASE_URL (sync engine)
+to show the end-to-end per-call difference including the database round-trip.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine  # noqa: E402
+from app.repositories import (  # noqa: E402
+    customer_repository,
+    order_repository,
+    product_repository,
+)
+
+# (label, builder, shape args, params used when executing)
+CASES = [
+    (
+        "customers.get_most_frequent",
+        customer_repository._most_frequent_from_orders_stmt,
+        (),
+        {"limit": 5},
+    ),
+    (
+        "customers.get_high_value",
+        customer_repository._high_value_from_orders_stmt,
+        (True,),
+        {"limit": 5},
+    ),
+    (
+        "orders.get_sales_summary",
+        order_repository._sales_summary_stmt,
+        (order_repository.DEFAULT_SALES_METRICS, True, True),
+        {"country": "Mexico", "year": 2025},
+    ),
+    (
+        "products.get_top_products_by_revenue",
+        product_repository._top_revenue_from_orders_stmt,
+        (True, True, False, False),
+        {"country": "Mexico", "year": 2025, "start_date": None, "end_date": None, "limit": 5},
+    ),
+]
+
+
+def as_statements(built) -> tuple:
+    """Builders return either one statement or a (total, ranked) pair"""
+    return built if isinstance(built, tuple) else (built,)
+
+
+def per_call_us(fn, iterations: int) -> float:
+    """Mean wall time of fn() in microseconds"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def build_uncached(builder, shape):
+    for stmt in as_statements(builder.__wrapped__(*shape)):
+        stmt._generate_cache_key()
+
+
+def build_cached(builder, shape):
+    for stmt in as_statements(builder(*shape)):
+        stmt._generate_cache_key()
+
+
+def execute(statements, params):
+    with engine.connect() as conn:
+        for stmt in statements:
+            conn.execute(stmt, params).all()
+
+
+def main(iterations: int, run_queries: bool) -> None:
+    print(f"{'statement':<40}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for label, builder, shape, _ in CASES:
+        build_cached(builder, shape)  # warm the registry
+        before = per_call_us(lambda: build_uncached(builder, shape), iterations)
+        after = per_call_us(lambda: build_cached(builder, shape), iterations)
+        print(f"{label:<40}{before:>14.1f}{after:>14.1f}{before / after:>9.0f}x")
+
+    if not run_queries:
+        return
+
+    print(f"\nend-to-end per call incl. DB round-trip, {engine.url.database}")
+    print(f"{'statement':<40}{'before (us)':>14}{'after (us)':>14}")
+    query_iterations = max(1, iterations // 20)
+    for label, builder, shape, params in CASES:
+        execute(as_statements(builder(*shape)), params)  # warm pool and compiled cache
+        before = per_call_us(
+            lambda: execute(as_statements(builder.__wrapped__(*shape)), params),
+            query_iterations,
+        )
+        after = per_call_us(
+            lambda: execute(as_statements(builder(*shape)), params), query_iterations
+        )
+        print(f"{label:<40}{before:>14.1f}{after:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--execute", action="store_true", help="Also run against the database")
+    args = parser.parse_args()
+
+    main(args.iterations, args.execute)
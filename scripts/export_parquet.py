@@ -0,0 +1,71 @@
+"""
+Parquet export of the source tables.
+
+Streams customers, products, orders, order_items and reviews with
+server-side cursors into partitioned Parquet files (orders, order items and
+reviews by year) under the output directory. After the first run only rows
+added or changed since the previous run are written, as a new part file per
+partition; the row with the highest _batch is the current one. Reports
+rows/sec per table and the peak RSS of the run.
+
+Usage:
+    python scripts/export_parquet.py [--output exports] [--table orders ...] [--full]
+        [--overlap SECONDS]
+
+Run it from cron, or keep it running with --every:
+    python scripts/export_parquet.py --every 3600
+"""
+
+import argparse
+import logging
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.database import engine  # noqa: E402
+from app.utils.parquet_export import EXPORT_TABLES, export  # noqa: E402
+
+
+def run(output: str, tables: list[str], full: bool, overlap: float) -> None:
+    start = time.perf_counter()
+    results = export(engine, output, tables, full=full, overlap_seconds=overlap)
+    print(f"{'table':<14}{'rows':>12}{'files':>7}{'seconds':>10}{'rows/sec':>12}")
+    for r in results:
+        print(
+            f"{r.table:<14}{r.rows:>12,}{r.files:>7}{r.seconds:>10.2f}{r.rows_per_second:>12,.0f}"
+        )
+    rows = sum(r.rows for r in results)
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"total {rows:,} rows in {seconds:.2f} s ({rows / seconds:,.0f} rows/sec), peak RSS {peak_mb:.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default="exports")
+    parser.add_argument("--table", action="append", choices=list(EXPORT_TABLES), dest="tables")
+    parser.add_argument("--full", action="store_true", help="Rewrite every row, not just changes")
+    parser.add_argument("--every", type=float, help="Export again every this many seconds")
+    parser.add_argument(
+        "--overlap",
+        type=float,
+        default=settings.PARQUET_EXPORT_OVERLAP,
+        help="Seconds an incremental run reaches back for writes that committed late",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    run(args.output, args.tables, args.full, args.overlap)
+    while args.every:
+        time.sleep(args.every)
+        try:
+            run(args.output, args.tables, full=False, overlap=args.overlap)
+        except Exception as e:
+            # The watermarks didn't advance; the next run exports the same changes
+            logging.getLogger("export_parquet").warning("Export failed: %s", e)
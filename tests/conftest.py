@@ -1,7 +1,12 @@
 import pytest
+import pytest_asyncio
 
+from app.config import settings
+from app.database import dispose_engines
 from app.main import app
 from app.utils.rate_limiter import rate_limit_dependency
+from app.utils.response_cache import response_cache
+from app.utils.rollup_refresher import rollup_refresher
 
 
 @pytest.fixture(autouse=True)
@@ -12,3 +17,37 @@ def disable_rate_limiter():
     app.dependency_overrides[rate_limit_dependency] = lambda: None
     yield
     app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache(monkeypatch):
+    """
+    Starts every test with an empty analytics response cache (and no prewarming).
+    """
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_PREWARM", False)
+    response_cache.clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def no_background_rollup_refresh(monkeypatch):
+    """
+    Keeps the app's rollup refresh loop from running alongside tests: a refresh
+    that picks up another test's writes bumps the data versions mid-test.
+    Tests refresh the rollups themselves where they need to.
+    """
+
+    async def no_refresh():
+        pass
+
+    monkeypatch.setattr(rollup_refresher, "run", no_refresh)
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def release_connections():
+    """
+    Pooled asyncpg connections are bound to the event loop of the test that
+    opened them, so every test closes them on the way out.
+    """
+    yield
+    await dispose_engines()
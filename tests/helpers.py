@@ -0,0 +1,27 @@
+"""
+Helpers shared by test modules
+"""
+
+from sqlalchemy import text
+
+from app.database import engine
+
+
+def rounded(value):
+    """Floats rounded, so sums added up in another order compare equal"""
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, list):
+        return [rounded(v) for v in value]
+    if isinstance(value, dict):
+        return {k: rounded(v) for k, v in value.items()}
+    return value
+
+
+def bump_rollup_version(name: str):
+    """Bumps a rollup's version, as a refresh that changed its totals would"""
+    with engine.begin() as conn:
+        conn.execute(
+            text("UPDATE rollup_watermarks SET version = version + 1 WHERE name = :name"),
+            {"name": name},
+        )
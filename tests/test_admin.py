@@ -0,0 +1,53 @@
+"""
+Tests for admin (operational metrics) endpoints
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+
+
+@pytest.fixture(autouse=True)
+def debug_mode(monkeypatch):
+    """Admin endpoints are only served in debug mode"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+
+def test_pool_stats():
+    """Test pool stats reflect the configured pool and record checkouts"""
+    with TestClient(app) as client:
+        # Make sure at least one connection has been checked out
+        client.get("/health")
+
+        response = client.get("/admin/pool")
+        assert response.status_code == 200
+        primary = response.json()["primary"]
+
+        assert primary["size"] == settings.DB_POOL_SIZE
+        assert primary["max_overflow"] == settings.DB_MAX_OVERFLOW
+        assert primary["checked_out"] == 0
+        assert primary["idle"] >= 1
+        assert primary["checkouts"] >= 1
+        assert primary["max_wait_ms"] >= primary["avg_wait_ms"] >= 0
+
+
+def test_rate_limiter_stats():
+    """Test rate limiter stats expose live clients and eviction counters"""
+    with TestClient(app) as client:
+        response = client.get("/admin/rate-limiter")
+        assert response.status_code == 200
+        stats = response.json()
+
+        assert stats["max_clients"] == settings.RATE_LIMIT_MAX_CLIENTS
+        assert stats["clients"] >= 0
+        assert stats["evictions"] >= 0
+
+
+def test_admin_hidden_outside_debug_mode(monkeypatch):
+    """Test admin endpoints answer 404 unless DEBUG is set"""
+    monkeypatch.setattr(settings, "DEBUG", False)
+    with TestClient(app) as client:
+        for path in ("/admin/pool", "/admin/cache", "/admin/rate-limiter"):
+            assert client.get(path).status_code == 404
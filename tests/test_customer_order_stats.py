@@ -0,0 +1,111 @@
+"""
+Tests for the incrementally maintained customer order stats
+"""
+
+import pytest
+from sqlalchemy import select, text
+
+from app.database import primary_session
+from app.models import CustomerOrderStats, RollupWatermark
+from app.repositories import customer_repository, rollup_repository
+
+
+async def refresh(full: bool = False) -> int:
+    async with primary_session(timeout_ms=0) as db:
+        return await rollup_repository.refresh_customer_order_stats(
+            db, overlap_seconds=300, full=full
+        )
+
+
+async def rollup_version() -> int:
+    async with primary_session() as db:
+        return await db.scalar(
+            select(RollupWatermark.version).where(
+                RollupWatermark.name == rollup_repository.CUSTOMER_ORDER_STATS
+            )
+        )
+
+
+def assert_same_ranking(rollup_rows, raw_rows, value: str):
+    # Ties may be ordered differently, so compare the ranked values and the customers per value
+    assert len(rollup_rows) == len(raw_rows) > 0
+    assert [getattr(r, value) for r in rollup_rows] == pytest.approx(
+        [getattr(r, value) for r in raw_rows]
+    )
+    top = getattr(raw_rows[0], value)
+    assert {r.email for r in rollup_rows if getattr(r, value) == top} == {
+        r.email for r in raw_rows if getattr(r, value) == top
+    }
+
+
+@pytest.mark.asyncio
+async def test_rankings_match_raw_queries():
+    """Test both rankings and their totals match grouping orders by customer"""
+    await refresh(full=True)
+    async with primary_session() as db:
+        rollup_rows, rollup_total = await customer_repository.get_most_frequent(db, limit=10)
+        raw_rows, raw_total = await customer_repository.get_most_frequent_from_orders(db, limit=10)
+        assert rollup_total == raw_total
+        assert_same_ranking(rollup_rows, raw_rows, "purchases_count")
+
+        for total in (True, False):
+            rollup_rows, rollup_total = await customer_repository.get_high_value(
+                db, total=total, limit=10
+            )
+            raw_rows, raw_total = await customer_repository.get_high_value_from_orders(
+                db, total=total, limit=10
+            )
+            assert rollup_total == raw_total
+            assert_same_ranking(rollup_rows, raw_rows, "value")
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_picks_up_changed_order():
+    """Test only a changed order's customer is rewritten, and only then is the version bumped"""
+    await refresh()
+    version = await rollup_version()
+    assert await refresh() == 0
+    assert await rollup_version() == version
+
+    async with primary_session() as db:
+        order_id, customer_id = (
+            await db.execute(text("SELECT id, customer_id FROM orders ORDER BY id DESC LIMIT 1"))
+        ).one()
+        bump = text(
+            "UPDATE orders SET total_amount = total_amount + :delta, updated_at = now() "
+            "WHERE id = :id"
+        )
+        await db.execute(bump, {"delta": 1, "id": order_id})
+        await db.commit()
+    try:
+        assert await refresh() == 1
+        assert await rollup_version() == version + 1
+        async with primary_session() as db:
+            stats = await db.get(CustomerOrderStats, customer_id)
+            spent = await db.scalar(
+                text("SELECT sum(total_amount) FROM orders WHERE customer_id = :id"),
+                {"id": customer_id},
+            )
+        assert stats.total_spent == pytest.approx(spent)
+    finally:
+        async with primary_session() as db:
+            await db.execute(bump, {"delta": -1, "id": order_id})
+            await db.commit()
+        await refresh()
+
+
+@pytest.mark.asyncio
+async def test_rankings_are_index_ordered_top_n_reads():
+    """Test the ranking query walks the ranking column's index instead of sorting"""
+    async with primary_session() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join(
+            await db.scalars(
+                text(
+                    "EXPLAIN SELECT customer_id FROM customer_order_stats "
+                    "ORDER BY total_spent DESC LIMIT 5"
+                )
+            )
+        )
+    assert "Index Scan Backward using ix_customer_order_stats_total_spent" in plan
+    assert "Sort" not in plan
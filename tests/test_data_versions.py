@@ -0,0 +1,82 @@
+"""
+Tests for per-table data versions, ETags and 304 responses
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.utils.data_versions import data_versions, etag_matches
+from app.utils.response_cache import response_cache
+from tests.helpers import bump_rollup_version
+
+
+@pytest.fixture(autouse=True)
+def fresh_versions(monkeypatch):
+    """Reads the versions once per test and keeps them for its duration"""
+    monkeypatch.setattr(data_versions, "check_interval", 3600)
+    monkeypatch.setattr(data_versions, "not_modified", 0)
+    data_versions.reset()
+    yield
+    data_versions.reset()
+
+
+def test_etag_is_stable_and_depends_on_the_query():
+    """Test identical requests share an ETag and different filters get another"""
+    with TestClient(app) as client:
+        first = client.get("/customers/high-value?limit=3")
+        second = client.get("/customers/high-value?limit=3")
+        other = client.get("/customers/high-value?limit=5")
+
+    assert first.headers["etag"].startswith('"')
+    assert first.headers["etag"] == second.headers["etag"]
+    assert other.headers["etag"] != first.headers["etag"]
+
+
+@pytest.mark.parametrize("path", ["/orders/sales-summary?year=2025", "/products/?limit=5"])
+def test_if_none_match_returns_304_without_querying(monkeypatch, path):
+    """Test a matching If-None-Match skips the query and sends no body"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    with TestClient(app) as client:
+        etag = client.get(path).headers["etag"]
+        response = client.get(path, headers={"If-None-Match": f'"other", W/{etag}'})
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["x-db-query-count"] == "0"
+    assert data_versions.not_modified == 1
+
+
+def test_data_change_gives_new_etag_and_invalidates_cache():
+    """Test a refreshed rollup changes the ETag and evicts results cached from it"""
+    path = "/customers/high-value?limit=3"
+    with TestClient(app) as client:
+        before = client.get(path)
+        bump_rollup_version("customer_order_stats")
+        data_versions.reset()
+        stale = client.get(path, headers={"If-None-Match": before.headers["etag"]})
+
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != before.headers["etag"]
+    assert stale.json()["results"] == before.json()["results"]
+    stats = response_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (0, 2, 1)
+
+
+def test_routes_without_declared_tables_have_no_etag():
+    """Test only BaseResponse routes carry ETags"""
+    with TestClient(app) as client:
+        response = client.get("/health")
+
+    assert "etag" not in response.headers
+
+
+def test_etag_matches():
+    """Test If-None-Match parsing uses weak comparison and accepts *"""
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
@@ -0,0 +1,245 @@
+"""
+Tests for the in-process order snapshot
+"""
+
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.database import primary_session
+from app.main import app
+from app.repositories import customer_repository, order_repository, product_repository
+from app.utils.data_versions import data_versions
+from app.utils.order_snapshot import OrderSnapshot, SnapshotColumns, order_snapshot
+from app.utils.response_cache import response_cache
+from tests.helpers import bump_rollup_version, rounded
+
+
+async def loaded_snapshot(overlap: float = 300) -> OrderSnapshot:
+    snapshot = OrderSnapshot(overlap=overlap)
+    await snapshot.refresh()
+    return snapshot
+
+
+def assert_same_rows(snapshot_rows, sql_rows, value: str):
+    """Same ranked values; ties may come back in either order"""
+    assert len(snapshot_rows) == len(sql_rows) > 0
+    assert [getattr(r, value) for r in snapshot_rows] == pytest.approx(
+        [float(getattr(r, value)) for r in sql_rows]
+    )
+
+
+async def assert_matches_sql(snapshot: OrderSnapshot) -> None:
+    async with primary_session() as db:
+        everything, _ = await order_repository.get_sales_summary_from_orders(db)
+        sample = everything[0]
+        year = int(sample.year)
+
+        metrics = order_repository.SALES_METRICS
+        for filters in ({}, {"country": sample.country}, {"year": year}, {"country": "Atlantis"}):
+            rows, total = await snapshot.get_sales_summary(metrics=metrics, **filters)
+            sql_rows, sql_total = await order_repository.get_sales_summary_from_orders(
+                db, metrics=metrics, **filters
+            )
+            assert total == sql_total
+            for row, sql_row in zip(rows, sql_rows, strict=True):
+                assert (row.country, row.year, row.count) == (
+                    sql_row.country,
+                    int(sql_row.year),
+                    sql_row.count,
+                )
+                for metric in row._fields[3:]:
+                    assert getattr(row, metric) == pytest.approx(getattr(sql_row, metric))
+
+        for filters in (
+            {},
+            {"country": sample.country},
+            {"year": year},
+            {"start_date": date(year, 3, 1), "end_date": date(year, 3, 31)},
+            {"country": sample.country, "year": year, "start_date": date(year, 2, 15)},
+        ):
+            rows, total = await snapshot.get_top_products_by_revenue(limit=20, **filters)
+            sql_rows, sql_total = await product_repository.get_top_products_by_revenue_from_orders(
+                db, limit=20, **filters
+            )
+            assert total == sql_total
+            assert_same_rows(rows, sql_rows, "revenue")
+
+        for total in (True, False):
+            rows, groups = await snapshot.get_high_value(total=total, limit=20)
+            sql_rows, sql_groups = await customer_repository.get_high_value_from_orders(
+                db, total=total, limit=20
+            )
+            assert groups == sql_groups
+            assert_same_rows(rows, sql_rows, "value")
+
+        rows, groups = await snapshot.get_most_frequent(limit=20)
+        sql_rows, sql_groups = await customer_repository.get_most_frequent_from_orders(db, limit=20)
+        assert groups == sql_groups
+        assert_same_rows(rows, sql_rows, "purchases_count")
+
+
+@pytest.mark.asyncio
+async def test_snapshot_matches_sql():
+    """Test every query returns the same results as aggregating orders in SQL"""
+    # A customer without a country: left out of the sales summary, ranked everywhere else
+    async with primary_session() as db:
+        customer_id = await db.scalar(
+            text(
+                "INSERT INTO customers (email, name) "
+                "VALUES ('stateless@example.com', 'No Country') RETURNING id"
+            )
+        )
+        order_id = await db.scalar(
+            text(
+                "INSERT INTO orders (customer_id, total_amount, status, shipping_address) "
+                "VALUES (:customer_id, 99999.5, 'delivered', 'Nowhere') RETURNING id"
+            ),
+            {"customer_id": customer_id},
+        )
+        await db.execute(
+            text(
+                "INSERT INTO order_items (order_id, product_id, quantity, price) "
+                "SELECT :order_id, min(id), 1, 99999.5 FROM products"
+            ),
+            {"order_id": order_id},
+        )
+        await db.commit()
+    try:
+        await assert_matches_sql(await loaded_snapshot())
+    finally:
+        async with primary_session() as db:
+            await db.execute(text("DELETE FROM order_items WHERE order_id = :id"), {"id": order_id})
+            await db.execute(text("DELETE FROM orders WHERE id = :id"), {"id": order_id})
+            await db.execute(text("DELETE FROM customers WHERE id = :id"), {"id": customer_id})
+            await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_refresh_picks_up_changed_and_new_orders():
+    """Test an incremental refresh applies changed orders, new orders and their items"""
+    # No overlap, so orders other tests just touched aren't read again
+    snapshot = await loaded_snapshot(overlap=0)
+    assert await snapshot.refresh() == 0
+
+    async with primary_session() as db:
+        order_id, item_id = (
+            await db.execute(
+                text(
+                    "SELECT o.id, max(i.id) FROM orders o JOIN order_items i ON i.order_id = o.id "
+                    "WHERE o.status = 'delivered' GROUP BY o.id ORDER BY o.id DESC LIMIT 1"
+                )
+            )
+        ).one()
+        customer_id = await db.scalar(text("SELECT min(id) FROM customers"))
+        product_id = await db.scalar(text("SELECT min(id) FROM products"))
+        await db.execute(
+            text("UPDATE order_items SET quantity = quantity + 1 WHERE id = :id"), {"id": item_id}
+        )
+        await db.execute(
+            text(
+                "UPDATE orders SET total_amount = total_amount + 1, updated_at = now() "
+                "WHERE id = :id"
+            ),
+            {"id": order_id},
+        )
+        new_order_id = await db.scalar(
+            text(
+                "INSERT INTO orders (customer_id, total_amount, status, shipping_address) "
+                "VALUES (:customer_id, 1234.5, 'delivered', 'Nowhere') RETURNING id"
+            ),
+            {"customer_id": customer_id},
+        )
+        await db.execute(
+            text(
+                "INSERT INTO order_items (order_id, product_id, quantity, price) "
+                "VALUES (:order_id, :product_id, 3, 411.5)"
+            ),
+            {"order_id": new_order_id, "product_id": product_id},
+        )
+        await db.commit()
+    try:
+        # The changed order, and the new one with its item
+        assert await snapshot.refresh() == 2
+        await assert_matches_sql(snapshot)
+    finally:
+        async with primary_session() as db:
+            await db.execute(
+                text("DELETE FROM order_items WHERE order_id = :id"), {"id": new_order_id}
+            )
+            await db.execute(text("DELETE FROM orders WHERE id = :id"), {"id": new_order_id})
+            await db.execute(
+                text("UPDATE order_items SET quantity = quantity - 1 WHERE id = :id"),
+                {"id": item_id},
+            )
+            await db.execute(
+                text(
+                    "UPDATE orders SET total_amount = total_amount - 1, updated_at = now() "
+                    "WHERE id = :id"
+                ),
+                {"id": order_id},
+            )
+            await db.commit()
+
+
+def test_late_committed_order_keeps_items_attached():
+    """Test an order appended below the highest id is sorted in, items following it"""
+    now = datetime.now(timezone.utc)
+    customers = {1: ("Ann", "ann@example.com", "Chile", "Santiago", None)}
+    orders = np.array([[10, 1, 100, 5.0, 1], [30, 1, 100, 7.0, 1]], dtype=np.float64)
+    items = np.array([[10, 1, 1, 5.0], [30, 2, 1, 7.0]], dtype=np.float64)
+    columns = SnapshotColumns.build(None, orders, items, 2, customers, {1: "a", 2: "b"}, now)
+
+    late = np.array([[20, 1, 100, 11.0, 1]], dtype=np.float64)
+    late_items = np.array([[20, 1, 1, 11.0]], dtype=np.float64)
+    columns = SnapshotColumns.build(columns, late, late_items, 3, customers, {1: "a", 2: "b"}, now)
+
+    assert columns.order_id.tolist() == [10, 20, 30]
+    assert columns.order_id[columns.item_order].tolist() == [10, 30, 20]
+    rows, total = columns.top_products_by_revenue()
+    assert [(r.id, r.revenue) for r in rows] == [(1, 16.0), (2, 7.0)]
+    assert total == 2
+
+
+def test_routes_serve_from_snapshot(monkeypatch):
+    """Test the analytics routes return the same responses from the snapshot as from SQL"""
+    paths = (
+        "/orders/sales-summary?metric=sum,max,p99",
+        "/products/top-revenue?limit=10",
+        "/customers/high-value?total=false&limit=10",
+    )
+    with TestClient(app) as client:
+        response_cache.clear()
+        from_sql = [client.get(path).json()["results"] for path in paths]
+
+        # Unloaded again when the test ends
+        monkeypatch.setattr(order_snapshot, "columns", None)
+        client.portal.call(order_snapshot.refresh)
+        response_cache.clear()
+        from_snapshot = [client.get(path).json()["results"] for path in paths]
+    response_cache.clear()
+
+    assert rounded(from_snapshot) == rounded(from_sql)
+
+
+def test_stale_snapshot_never_gets_the_new_etag(monkeypatch):
+    """Test an ETag handed out for an older snapshot is not honoured once it reloads"""
+    path = "/customers/high-value?limit=3"
+    monkeypatch.setattr(data_versions, "check_interval", 3600)
+    with TestClient(app) as client:
+        monkeypatch.setattr(order_snapshot, "columns", None)
+        client.portal.call(order_snapshot.refresh)
+        # Another worker's refresh moved the versions on; this one still serves its snapshot
+        bump_rollup_version("customer_order_stats")
+        data_versions.reset()
+        stale = client.get(path)
+
+        client.portal.call(order_snapshot.refresh)
+        fresh = client.get(path, headers={"If-None-Match": stale.headers["etag"]})
+    response_cache.clear()
+
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != stale.headers["etag"]
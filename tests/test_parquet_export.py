@@ -0,0 +1,89 @@
+"""
+Tests for the incremental Parquet export
+"""
+
+import os
+
+import pyarrow.dataset as ds
+import pytest
+from sqlalchemy import text
+
+from app.database import engine
+from app.utils import parquet_export
+
+
+def read(output, table: str):
+    return ds.dataset(os.path.join(output, table), partitioning="hive").to_table()
+
+
+def current_rows(output, table: str) -> dict:
+    """{id: row} keeping each id's row from the latest batch"""
+    rows = {}
+    for row in sorted(read(output, table).to_pylist(), key=lambda r: r["_batch"]):
+        rows[row["id"]] = row
+    return rows
+
+
+def test_full_export_matches_tables(tmp_path):
+    """Test every row is exported once, partitioned by year, and a rerun exports nothing"""
+    results = parquet_export.export(engine, tmp_path)
+    assert [r.table for r in results] == list(parquet_export.EXPORT_TABLES)
+
+    with engine.connect() as conn:
+        for result in results:
+            count = conn.scalar(text(f"SELECT count(*) FROM {result.table}"))
+            assert result.rows == count == read(tmp_path, result.table).num_rows
+        years = dict(
+            conn.execute(text("SELECT id, extract(year FROM created_at)::int FROM orders")).all()
+        )
+    orders = read(tmp_path, "orders")
+    assert dict(zip(orders["id"].to_pylist(), orders["year"].to_pylist())) == years
+
+    again = parquet_export.export(engine, tmp_path, overlap_seconds=0)
+    assert sum(r.rows for r in again) == 0
+    assert parquet_export.read_manifest(tmp_path)["batch"] == 2
+
+
+def test_changed_order_is_exported_again_with_its_items(tmp_path):
+    """Test an incremental run writes a changed order and its items as a new batch"""
+    parquet_export.export(engine, tmp_path, tables=["orders", "order_items"])
+    with engine.begin() as conn:
+        order_id = conn.scalar(text("SELECT max(id) FROM orders"))
+        status = conn.scalar(text("SELECT status FROM orders WHERE id = :id"), {"id": order_id})
+        item_count = conn.scalar(
+            text("SELECT count(*) FROM order_items WHERE order_id = :id"), {"id": order_id}
+        )
+        update = text("UPDATE orders SET status = :status, updated_at = now() WHERE id = :id")
+        conn.execute(update, {"status": "returned", "id": order_id})
+    try:
+        results = parquet_export.export(
+            engine, tmp_path, tables=["orders", "order_items"], overlap_seconds=0
+        )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(update, {"status": status, "id": order_id})
+
+    assert [(r.table, r.rows) for r in results] == [("orders", 1), ("order_items", item_count)]
+    assert current_rows(tmp_path, "orders")[order_id]["status"] == "returned"
+    assert current_rows(tmp_path, "orders")[order_id]["_batch"] == 2
+
+
+def test_failed_run_leaves_no_files_and_keeps_watermark(tmp_path, monkeypatch):
+    """Test an interrupted full export removes its own files only and doesn't advance"""
+    (result,) = parquet_export.export(engine, tmp_path, tables=["orders"])
+    manifest = parquet_export.read_manifest(tmp_path)
+    export_table = parquet_export._export_table
+
+    def fail_after_writing(*args, **kwargs):
+        export_table(*args, **kwargs)
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(parquet_export, "_export_table", fail_after_writing)
+    with pytest.raises(RuntimeError):
+        parquet_export.export(engine, tmp_path, tables=["orders"], full=True)
+
+    assert parquet_export.read_manifest(tmp_path) == manifest
+    # The earlier export is still complete
+    assert read(tmp_path, "orders").num_rows == result.rows
+    leftovers = [f for _, _, files in os.walk(tmp_path) for f in files if f.endswith(".tmp")]
+    assert leftovers == []
@@ -0,0 +1,107 @@
+"""
+Tests for the incrementally maintained product daily revenue rollup
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import select, text
+
+from app.database import primary_session
+from app.models import RollupWatermark
+from app.repositories import product_repository, rollup_repository
+
+
+async def refresh(full: bool = False) -> int:
+    async with primary_session(timeout_ms=0) as db:
+        return await rollup_repository.refresh_product_daily_revenue(
+            db, overlap_seconds=300, full=full
+        )
+
+
+async def rollup_version() -> int:
+    async with primary_session() as db:
+        return await db.scalar(
+            select(RollupWatermark.version).where(
+                RollupWatermark.name == rollup_repository.PRODUCT_DAILY_REVENUE
+            )
+        )
+
+
+def assert_same_ranking(rollup_rows, raw_rows):
+    assert len(rollup_rows) == len(raw_rows) > 0
+    rollup = {row.id: row.revenue for row in rollup_rows}
+    raw = {row.id: float(row.revenue) for row in raw_rows}
+    assert rollup.keys() == raw.keys()
+    for product_id, revenue in raw.items():
+        assert rollup[product_id] == pytest.approx(revenue)
+
+
+@pytest.mark.asyncio
+async def test_rollup_matches_raw_query():
+    """Test every filter combination ranks the same products as aggregating orders"""
+    await refresh(full=True)
+    async with primary_session() as db:
+        country = await db.scalar(text("SELECT country FROM customers LIMIT 1"))
+        year = int(
+            await db.scalar(
+                text(
+                    "SELECT extract(year FROM max(created_at)) FROM orders WHERE status = 'delivered'"
+                )
+            )
+        )
+        for filters in (
+            {},
+            {"country": country},
+            {"year": year},
+            {"start_date": date(year, 3, 1), "end_date": date(year, 3, 31)},
+            {"country": country, "year": year, "start_date": date(year, 2, 15)},
+        ):
+            rollup_rows, rollup_total = await product_repository.get_top_products_by_revenue(
+                db, limit=20, **filters
+            )
+            raw_rows, raw_total = await product_repository.get_top_products_by_revenue_from_orders(
+                db, limit=20, **filters
+            )
+            assert rollup_total == raw_total
+            assert_same_ranking(rollup_rows, raw_rows)
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_picks_up_changed_item():
+    """Test a changed order item's rows are rewritten, and only then is the version bumped"""
+    await refresh()
+    version = await rollup_version()
+    assert await refresh() == 0
+    assert await rollup_version() == version
+
+    async with primary_session() as db:
+        order_id, item_id = (
+            await db.execute(
+                text(
+                    "SELECT o.id, max(i.id) FROM orders o JOIN order_items i ON i.order_id = o.id "
+                    "WHERE o.status = 'delivered' GROUP BY o.id ORDER BY o.id DESC LIMIT 1"
+                )
+            )
+        ).one()
+        bump = text("UPDATE order_items SET quantity = quantity + :delta WHERE id = :id")
+        # Item edits don't touch the order's updated_at themselves; the app's writers do
+        touch = text("UPDATE orders SET updated_at = now() WHERE id = :id")
+        await db.execute(bump, {"delta": 1, "id": item_id})
+        await db.execute(touch, {"id": order_id})
+        await db.commit()
+    try:
+        assert await refresh() == 1
+        assert await rollup_version() == version + 1
+        async with primary_session() as db:
+            rollup_rows, _ = await product_repository.get_top_products_by_revenue(db, limit=50)
+            raw_rows, _ = await product_repository.get_top_products_by_revenue_from_orders(
+                db, limit=50
+            )
+        assert_same_ranking(rollup_rows, raw_rows)
+    finally:
+        async with primary_session() as db:
+            await db.execute(bump, {"delta": -1, "id": item_id})
+            await db.execute(touch, {"id": order_id})
+            await db.commit()
+        await refresh()
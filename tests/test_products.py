@@ -55,7 +55,13 @@ def test_top_revenue_products():
         assert "requested_at" in metadata
         assert metadata["currency"] == "USD"
         assert "total_groups" in metadata
-        assert metadata["applied_filters"] == {"limit": 5, "country": None, "year": None}
+        assert metadata["applied_filters"] == {
+            "limit": 5,
+            "country": None,
+            "year": None,
+            "start_date": None,
+            "end_date": None,
+        }
 
         results = data["results"]
         assert len(results) <= 5
@@ -74,3 +80,19 @@ def test_top_revenue_with_filters():
         # Test with invalid limit
         response = client.get("/products/top-revenue?limit=0")
         assert response.status_code == 422
+
+        # Test with a date range
+        response = client.get("/products/top-revenue?start_date=2024-01-01&end_date=2024-06-30")
+        assert response.status_code == 200
+        filters = response.json()["metadata"]["applied_filters"]
+        assert (filters["start_date"], filters["end_date"]) == ("2024-01-01", "2024-06-30")
+
+        # Test a range without orders reports zero groups
+        response = client.get("/products/top-revenue?start_date=2100-01-01")
+        assert response.status_code == 200
+        assert response.json()["results"] == []
+        assert response.json()["metadata"]["total_groups"] == 0
+
+        # Test with a reversed date range
+        response = client.get("/products/top-revenue?start_date=2024-06-30&end_date=2024-01-01")
+        assert response.status_code == 422
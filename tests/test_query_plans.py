@@ -0,0 +1,93 @@
+"""
+EXPLAIN-based tests that the analytics queries can use the orders indexes
+"""
+
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import select, text
+
+from app.database import primary_session
+from app.models import Order, RollupWatermark
+from app.repositories import order_repository, product_repository, rollup_repository
+from app.utils.data_versions import _version_query
+
+
+async def explain(stmt, params: dict) -> str:
+    """
+    The statement's plan with sequential scans priced out, so the test data's
+    size doesn't decide the plan: a seq scan remains only where no index applies.
+    """
+    async with primary_session() as db:
+        await db.execute(text("SET LOCAL enable_seqscan = off"))
+        sql = stmt.params(params).compile(db.bind, compile_kwargs={"literal_binds": True})
+        return "\n".join(await db.scalars(text(f"EXPLAIN {sql}")))
+
+
+def range_scanned(plan: str, column: str) -> bool:
+    """The column is bounded by an index condition, not filtered after reading every entry"""
+    return any("Cond:" in line and f"{column} >=" in line for line in plan.splitlines())
+
+
+@pytest.mark.asyncio
+async def test_sales_summary_year_filter_uses_delivered_index():
+    """Test the year filter is a range the delivered created_at index can serve"""
+    plan = await explain(
+        order_repository._sales_summary_stmt(order_repository.SALES_METRICS, False, True),
+        {"year": 2025},
+    )
+    assert "ix_orders_delivered_created_at" in plan
+    assert range_scanned(plan, "created_at")
+    assert "Seq Scan on orders" not in plan
+
+
+@pytest.mark.asyncio
+async def test_sales_summary_country_and_year_use_indexes():
+    """Test a country and year filter reads neither table sequentially"""
+    stmt = order_repository._sales_summary_stmt(order_repository.SALES_METRICS, True, True)
+    plan = await explain(stmt, {"country": "Mexico", "year": 2025})
+    assert "Seq Scan" not in plan
+
+
+@pytest.mark.asyncio
+async def test_top_revenue_year_filter_uses_created_at_index():
+    """Test the raw top-revenue year filter reaches orders through an index"""
+    stmt = product_repository._top_revenue_from_orders_stmt(False, True, False, False)
+    plan = await explain(stmt, {"year": 2025, "limit": 5})
+    assert range_scanned(plan, "created_at")
+    assert "Seq Scan on orders" not in plan
+
+
+@pytest.mark.asyncio
+async def test_sales_timeseries_range_uses_rollup_indexes():
+    """Test the time series reads only the rollup rows of its date range"""
+    for by_country in (False, True):
+        stmt = order_repository._sales_timeseries_stmt("month", by_country, False)
+        plan = await explain(
+            stmt,
+            {"start_date": date(2024, 1, 1), "end_date": date(2025, 12, 31), "country": "Mexico"},
+        )
+        assert range_scanned(plan, "day")
+        assert "Seq Scan on product_daily_revenue" not in plan
+
+
+@pytest.mark.asyncio
+async def test_data_versions_read_updated_at_from_indexes():
+    """Test max(updated_at) is a backward index scan rather than a table scan"""
+    plan = await explain(_version_query(), {})
+    for table in ("orders", "products", "reviews"):
+        assert f"ix_{table}_updated_at" in plan
+    assert "Seq Scan" not in plan
+
+
+@pytest.mark.asyncio
+async def test_rollup_change_window_uses_indexes():
+    """Test the refresh's changed-orders lookup combines the created_at and updated_at indexes"""
+    watermark = RollupWatermark(last_id=0, refreshed_at=datetime.now(timezone.utc))
+    stmt = select(Order.customer_id).where(
+        rollup_repository._changed_orders_filter(watermark, overlap_seconds=300)
+    )
+    plan = await explain(stmt, {})
+    assert "ix_orders_created_at" in plan
+    assert "ix_orders_updated_at" in plan
+    assert "Seq Scan on orders" not in plan
@@ -0,0 +1,235 @@
+"""
+Tests for the rate limit backends shared between workers
+"""
+
+import asyncio
+import multiprocessing
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from app.config import settings
+from app.utils import rate_limiter
+from app.utils.rate_limit_backends import RedisRateLimiter, SharedMemoryRateLimiter
+from app.utils.rate_limiter import (
+    RateLimiter,
+    TokenBudget,
+    create_limiter,
+    rate_limit_dependency,
+)
+
+
+class FakeClock:
+    """Controllable replacement for time.time"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def shared_path(tmp_path):
+    return str(tmp_path / "rate-limit")
+
+
+def _admit_many(path: str, requests: int, results) -> None:
+    limiter = SharedMemoryRateLimiter({60: 50, 3600: 500}, path, slots=256, stripes=4)
+
+    async def admit_all() -> int:
+        return sum([not await limiter.is_rate_limited("10.0.0.1") for _ in range(requests)])
+
+    results.put(asyncio.run(admit_all()))
+    limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_limit_spans_instances(clock, shared_path):
+    """Test two limiters on the same file (two workers) share one budget"""
+    first = SharedMemoryRateLimiter({60: 3}, shared_path, slots=256, stripes=4)
+    second = SharedMemoryRateLimiter({60: 3}, shared_path, slots=256, stripes=4)
+
+    decisions = [await limiter.is_rate_limited("ip") for limiter in (first, second, first, second)]
+    assert decisions == [False, False, False, True]
+    assert second.stats()["clients"] == 1
+
+
+def test_shared_limit_spans_processes(shared_path):
+    """Test worker processes hammering one client admit exactly the limit in total"""
+    SharedMemoryRateLimiter({60: 50, 3600: 500}, shared_path, slots=256, stripes=4).close()
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_admit_many, args=(shared_path, 40, results)) for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    assert sum(results.get(timeout=5) for _ in workers) == 50
+
+
+@pytest.mark.asyncio
+async def test_shared_decisions_match_in_memory(clock, shared_path):
+    """Test the shared table makes the same decisions as the in-memory limiter"""
+    limits, budget = {60: 3, 600: 8}, TokenBudget(capacity=12, refill_per_second=0.1)
+    shared = SharedMemoryRateLimiter(limits, shared_path, slots=256, stripes=4, budget=budget)
+    memory = RateLimiter(limits, budget=budget)
+    for step in range(400):
+        clock.now += (step * 37) % 700 / 10
+        ip, cost = f"ip-{step % 7}", step % 5
+        assert await shared.is_rate_limited(ip, cost) == await memory.is_rate_limited(ip, cost)
+        if step % 3 == 0:
+            assert await shared.spend(ip, 2) == await memory.spend(ip, 2)
+
+
+@pytest.mark.asyncio
+async def test_shared_reuses_idle_slots_and_evicts_at_capacity(clock, shared_path):
+    """Test idle slots are reclaimed and a full probe window drops the oldest client"""
+    shared = SharedMemoryRateLimiter({60: 5}, shared_path, slots=16, stripes=1)
+    for i in range(16):
+        await shared.is_rate_limited(f"ip-{i}")
+        clock.now += 1
+    assert shared.stats()["clients"] == 16
+
+    await shared.is_rate_limited("newcomer")
+    assert shared.stats()["capacity_evictions"] == 1
+
+    clock.now += 121
+    await shared.is_rate_limited("latecomer")
+    assert shared.stats()["evictions"] == 1
+    assert shared.stats()["clients"] == 16
+
+
+@pytest.mark.asyncio
+async def test_shared_file_is_reformatted_for_new_limits(clock, shared_path):
+    """Test a file laid out for other limits is reset instead of misread"""
+    old = SharedMemoryRateLimiter({60: 1}, shared_path, slots=256, stripes=4)
+    await old.is_rate_limited("ip")
+    old.close()
+
+    new = SharedMemoryRateLimiter({60: 1, 3600: 10}, shared_path, slots=256, stripes=4)
+    assert await new.is_rate_limited("ip") is False
+    assert new.stats()["clients"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_limit_spans_instances(clock):
+    """Test two limiters on one Redis server share one budget and keys expire"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    first = RedisRateLimiter({60: 3, 3600: 5}, fakeredis.FakeAsyncRedis(server=server))
+    second = RedisRateLimiter({60: 3, 3600: 5}, fakeredis.FakeAsyncRedis(server=server))
+
+    decisions = [await limiter.is_rate_limited("ip") for limiter in (first, second, first, second)]
+    assert decisions == [False, False, False, True]
+
+    keys = await first.client.keys()
+    ttls = [await first.client.ttl(key) for key in keys if b"tokens" not in key]
+    assert sorted(ttls) == [120, 7200]
+
+
+@pytest.mark.asyncio
+async def test_redis_decisions_match_in_memory(clock):
+    """Test the Lua script implements the same estimate as the in-memory limiter"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    limits, budget = {60: 3, 600: 8}, TokenBudget(capacity=12, refill_per_second=0.1)
+    redis_limiter = RedisRateLimiter(limits, fakeredis.FakeAsyncRedis(), budget=budget)
+    memory = RateLimiter(limits, budget=budget)
+    for step in range(200):
+        clock.now += (step * 37) % 700 / 10
+        ip, cost = f"ip-{step % 7}", step % 5
+        assert await redis_limiter.is_rate_limited(ip, cost) == await memory.is_rate_limited(
+            ip, cost
+        )
+        if step % 3 == 0:
+            assert await redis_limiter.spend(ip, 2) == await memory.spend(ip, 2)
+
+
+@pytest.mark.asyncio
+async def test_redis_budget_without_refill(clock):
+    """Test a budget that never refills is spent down and expires like an idle client"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    limiter = RedisRateLimiter(
+        {60: 100, 600: 100}, fakeredis.FakeAsyncRedis(), budget=TokenBudget(5, 0)
+    )
+    decisions = [await limiter.is_rate_limited("1.2.3.4", 2) for _ in range(3)]
+    clock.now += 500
+    decisions.append(await limiter.is_rate_limited("1.2.3.4", 1))
+
+    assert decisions == [False, False, True, False]
+    assert await limiter.client.ttl(limiter._bucket_key("1.2.3.4")) == 1200
+
+
+@pytest.mark.asyncio
+async def test_redis_outage_fails_open(clock):
+    """Test requests are admitted and counted when the server is unreachable"""
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    limiter = RedisRateLimiter({60: 1}, fakeredis.FakeAsyncRedis(server=server))
+    server.connected = False
+
+    assert [await limiter.is_rate_limited("ip") for _ in range(3)] == [False, False, False]
+    assert limiter.stats()["errors"] == 3
+
+
+@pytest.mark.asyncio
+async def test_slow_redis_does_not_stall_other_requests(monkeypatch):
+    """Test a request waiting on a slow Redis doesn't hold up a concurrent one"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+    class SlowRedis(fakeredis.FakeAsyncRedis):
+        async def evalsha(self, sha, numkeys, *keys_and_args):
+            if any("{slow-client}" in key for key in keys_and_args[:numkeys]):
+                await asyncio.sleep(0.5)
+            return await super().evalsha(sha, numkeys, *keys_and_args)
+
+    monkeypatch.setattr(rate_limiter, "limiter", RedisRateLimiter({60: 100}, SlowRedis()))
+    app = FastAPI(dependencies=[Depends(rate_limit_dependency)])
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        slow = asyncio.create_task(client.get("/", headers={"X-Forwarded-For": "slow-client"}))
+        # Let the slow request get as far as waiting on Redis
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        fast = await client.get("/", headers={"X-Forwarded-For": "fast-client"})
+        elapsed = time.perf_counter() - start
+        assert not slow.done()
+        assert (await slow).status_code == 200
+
+    assert fast.status_code == 200
+    assert elapsed < 0.25
+
+
+def test_create_limiter_uses_configured_backend(monkeypatch, shared_path):
+    """Test RATE_LIMIT_BACKEND selects the implementation"""
+    monkeypatch.setattr(settings, "RATE_LIMIT_SHARED_PATH", shared_path)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "shared")
+    assert isinstance(create_limiter({60: 30}), SharedMemoryRateLimiter)
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "memory")
+    assert isinstance(create_limiter({60: 30}), RateLimiter)
+
+    monkeypatch.setattr(settings, "RATE_LIMIT_BACKEND", "carrier-pigeon")
+    with pytest.raises(ValueError):
+        create_limiter({60: 30})
@@ -0,0 +1,197 @@
+"""
+Tests for the in-memory rate limiter
+"""
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils import rate_limiter
+from app.utils.rate_limiter import (
+    RateLimiter,
+    TokenBudget,
+    charge_cache_miss,
+    rate_limit_cost,
+    rate_limit_dependency,
+)
+
+
+class FakeClock:
+    """Controllable replacement for time.time"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "time", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_limits_within_window(clock):
+    """Test requests over the limit are rejected and clients are isolated"""
+    limiter = RateLimiter(limits={60: 3})
+
+    assert [await limiter.is_rate_limited("1.1.1.1") for _ in range(4)] == [
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert await limiter.is_rate_limited("2.2.2.2") is False
+
+
+@pytest.mark.asyncio
+async def test_previous_bucket_is_weighted_by_overlap(clock):
+    """Test the sliding estimate releases capacity gradually, not all at once"""
+    limiter = RateLimiter(limits={60: 10})
+    clock.now = 60 * 20_000  # start of a bucket
+    for _ in range(10):
+        assert await limiter.is_rate_limited("ip") is False
+
+    # A quarter into the next bucket 75% of the previous count still applies
+    clock.now += 60 + 15
+    allowed = sum([not await limiter.is_rate_limited("ip") for _ in range(10)])
+    assert allowed == 3
+
+    # Two full windows later nothing from the past counts anymore
+    clock.now += 120
+    assert sum([not await limiter.is_rate_limited("ip") for _ in range(12)]) == 10
+
+
+@pytest.mark.asyncio
+async def test_every_window_is_enforced(clock):
+    """Test the longest window keeps limiting after the short one resets"""
+    limiter = RateLimiter(limits={1: 5, 3600: 6})
+    for _ in range(5):
+        assert await limiter.is_rate_limited("ip") is False
+    assert await limiter.is_rate_limited("ip") is True
+
+    clock.now += 2
+    assert await limiter.is_rate_limited("ip") is False
+    assert await limiter.is_rate_limited("ip") is True
+
+
+@pytest.mark.asyncio
+async def test_memory_is_constant_per_client(clock):
+    """Test per-client state does not grow with the number of requests"""
+    limiter = RateLimiter(limits={60: 30, 3600: 300})
+    for _ in range(200):
+        await limiter.is_rate_limited("ip")
+    assert len(limiter.stripes[0].history["ip"]) == 9
+
+
+@pytest.mark.asyncio
+async def test_idle_clients_are_evicted(clock):
+    """Test clients whose counters can no longer matter are dropped"""
+    limiter = RateLimiter(limits={60: 3, 3600: 5})
+    await limiter.is_rate_limited("idle")
+    clock.now += 3600
+    await limiter.is_rate_limited("active")
+    assert limiter.stats()["clients"] == 2
+
+    clock.now += 3601
+    await limiter.is_rate_limited("active")
+    assert list(limiter.stripes[0].history) == ["active"]
+    assert limiter.stats()["clients"] == 1
+    assert limiter.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_eviction_does_not_change_decisions(clock):
+    """Test a limiter that evicts decides exactly like one that never forgets"""
+    evicting, keeping = RateLimiter(limits={60: 2, 600: 4}), RateLimiter(limits={60: 2, 600: 4})
+    keeping._evict_idle = lambda stripe, now: None
+    for step in range(400):
+        clock.now += (step * 37) % 700
+        ip = f"ip-{step % 5}"
+        assert await evicting.is_rate_limited(ip) == await keeping.is_rate_limited(ip)
+    assert evicting.stats()["evictions"] > 0
+
+
+@pytest.mark.asyncio
+async def test_max_clients_evicts_least_recently_admitted(clock):
+    """Test the cap drops the client that was admitted longest ago"""
+    limiter = RateLimiter(limits={60: 10}, max_clients=2)
+    await limiter.is_rate_limited("a")
+    await limiter.is_rate_limited("b")
+    await limiter.is_rate_limited("a")
+    await limiter.is_rate_limited("c")
+
+    assert list(limiter.stripes[0].history) == ["a", "c"]
+    assert limiter.stats()["capacity_evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stripes_share_the_cap_and_keep_clients_isolated(clock):
+    """Test each client lives in one stripe and stats sum over all stripes"""
+    limiter = RateLimiter(limits={60: 2}, max_clients=8, stripes=4)
+    ips = [f"10.0.0.{i}" for i in range(8)]
+    for ip in ips:
+        assert [await limiter.is_rate_limited(ip) for _ in range(3)] == [False, False, True]
+
+    placements = [sum(ip in stripe.history for stripe in limiter.stripes) for ip in ips]
+    assert all(count <= 1 for count in placements)
+    stats = limiter.stats()
+    assert stats["stripes"] == 4
+    assert stats["clients"] + stats["capacity_evictions"] == 8
+    assert all(stripe.max_clients == 2 for stripe in limiter.stripes)
+
+
+@pytest.mark.asyncio
+async def test_token_budget_charges_cost_and_refills(clock):
+    """Test expensive requests drain the bucket and it refills over time"""
+    limiter = RateLimiter(limits={60: 100}, budget=TokenBudget(capacity=30, refill_per_second=1))
+    assert [await limiter.is_rate_limited("ip", cost=10) for _ in range(4)] == [False] * 3 + [True]
+    # Cheap requests still fit in what is left after a short refill
+    clock.now += 5
+    assert await limiter.is_rate_limited("ip", cost=1) is False
+
+    clock.now += 7
+    assert await limiter.is_rate_limited("ip", cost=10) is False
+    assert await limiter.is_rate_limited("ip", cost=10) is True
+
+
+@pytest.mark.asyncio
+async def test_spend_takes_tokens_only_when_enough_are_left(clock):
+    """Test spending more tokens on an admitted request fails without touching the bucket"""
+    limiter = RateLimiter(limits={60: 100}, budget=TokenBudget(capacity=20, refill_per_second=0))
+    assert await limiter.is_rate_limited("ip", cost=15) is False
+    assert await limiter.spend("ip", 6) is False
+    assert await limiter.spend("ip", 5) is True
+    assert await limiter.is_rate_limited("ip", cost=1) is True
+    # Unknown (or already evicted) clients have nothing to charge against
+    assert await limiter.spend("other", 100) is True
+
+
+def test_dependency_charges_declared_route_costs(clock, monkeypatch):
+    """Test routes are charged their declared cost and cache hits only their hit cost"""
+    limiter = RateLimiter(limits={60: 100}, budget=TokenBudget(capacity=10, refill_per_second=0))
+    monkeypatch.setattr(rate_limiter, "limiter", limiter)
+    app = FastAPI(dependencies=[Depends(rate_limit_dependency)])
+
+    @app.get("/cheap")
+    async def cheap():
+        return {}
+
+    @app.get("/expensive")
+    @rate_limit_cost(4, cache_hit_cost=1)
+    async def expensive(hit: bool = False, request: Request = None):
+        if not hit:
+            await charge_cache_miss(request)
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/expensive").status_code == 200  # 6 left
+    assert client.get("/expensive").status_code == 200  # 2 left
+    # A miss needs 4, so it's rejected once it has paid the hit cost (1 left)
+    assert client.get("/expensive").status_code == 429
+    # Fewer tokens left than a miss costs, but a cache hit still goes through
+    assert client.get("/expensive", params={"hit": True}).status_code == 200  # 0 left
+    assert client.get("/cheap").status_code == 429
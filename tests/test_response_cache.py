@@ -0,0 +1,165 @@
+"""
+Tests for the analytics response cache
+"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app, prewarm_paths
+from app.utils import rate_limiter
+from app.utils import response_cache as response_cache_module
+from app.utils.data_versions import data_versions
+from app.utils.rate_limiter import RateLimiter, TokenBudget, rate_limit_dependency
+from app.utils.response_cache import ResponseCache, response_cache
+
+
+def test_repeated_requests_are_served_from_cache(monkeypatch):
+    """Test the second identical request runs no SQL and returns the same results"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    with TestClient(app) as client:
+        first = client.get("/orders/sales-summary?country=Mexico")
+        second = client.get("/orders/sales-summary?country=Mexico")
+
+    assert first.status_code == second.status_code == 200
+    assert int(first.headers["x-db-query-count"]) > 0
+    assert second.headers["x-db-query-count"] == "0"
+    assert second.json()["results"] == first.json()["results"]
+    assert second.json()["metadata"]["requested_at"] != first.json()["metadata"]["requested_at"]
+    assert response_cache.stats()["hits"] == 1
+
+
+def test_filters_are_part_of_the_key():
+    """Test different applied filters are cached separately"""
+    with TestClient(app) as client:
+        three = client.get("/customers/high-value?limit=3").json()
+        five = client.get("/customers/high-value?limit=5").json()
+        client.get("/customers/high-value?limit=3")
+
+    assert len(three["results"]) == 3
+    assert len(five["results"]) == 5
+    stats = response_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 2)
+
+
+@pytest.mark.parametrize("directive, stored", [("no-cache", True), ("no-store", False)])
+def test_cache_control_bypasses_lookup(monkeypatch, directive, stored):
+    """Test no-cache forces a fresh result and no-store also skips storing it"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    with TestClient(app) as client:
+        client.get("/customers/per-country")
+        response = client.get("/customers/per-country", headers={"Cache-Control": directive})
+        assert int(response.headers["x-db-query-count"]) > 0
+
+        response_cache.clear()
+        client.get("/customers/per-country", headers={"Cache-Control": directive})
+        client.get("/customers/per-country")
+
+    stats = response_cache.stats()
+    assert stats["bypasses"] == 1
+    assert stats["hits"] == (1 if stored else 0)
+
+
+def test_lru_eviction_and_ttl_expiry(monkeypatch):
+    """Test the least recently used entry is evicted and expired entries are dropped"""
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1, ttl=10)
+    cache.set("b", 2, ttl=10)
+    cache.get("a")
+    cache.set("c", 3, ttl=10)
+
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.evictions == 1
+
+    now[0] += 10
+    assert cache.get("a") is response_cache_module._MISSING
+    assert cache.expirations == 1
+
+
+def test_cache_stats_endpoint(monkeypatch):
+    """Test the admin endpoint reports the cache counters"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    with TestClient(app) as client:
+        client.get("/products/top-revenue")
+        client.get("/products/top-revenue")
+        stats = client.get("/admin/cache").json()
+
+    assert stats["max_entries"] == settings.RESPONSE_CACHE_MAX_ENTRIES
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+
+def expire(key):
+    """Moves an entry's expiry into the past"""
+    _, versions, value = response_cache.entries[key]
+    response_cache.entries[key] = (time.monotonic() - 1, versions, value)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_expired_entry_is_served_stale_and_refreshed(monkeypatch):
+    """Test the request crossing the TTL gets the old result while it is recomputed"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    with TestClient(app) as client:
+        first = client.get("/customers/high-value?limit=3")
+        (key,) = response_cache.entries
+        expire(key)
+
+        stale = client.get("/customers/high-value?limit=3")
+        wait_for(lambda: response_cache.refreshes == 1)
+        fresh = client.get("/customers/high-value?limit=3")
+
+    assert stale.headers["x-db-query-count"] == "0"
+    assert stale.json()["results"] == first.json()["results"]
+    assert fresh.headers["x-db-query-count"] == "0"
+    stats = response_cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["refreshing"]) == (2, 1, 0)
+    assert response_cache.entries[key][0] > time.monotonic()
+
+
+def test_stale_window_bounds_and_no_refresher():
+    """Test stale entries are only served within stale_ttl and while a refresher runs"""
+    cache = ResponseCache(max_entries=10, stale_ttl=30)
+    cache.set("a", 1, ttl=-10)
+    assert cache.lookup("a", allow_stale=True) == (1, True)
+    assert cache.get("a") is response_cache_module._MISSING
+
+    cache.set("b", 2, ttl=-40)
+    assert cache.lookup("b", allow_stale=True) == (response_cache_module._MISSING, False)
+    assert cache.expirations == 2
+
+
+def test_prewarm_fills_dashboard_queries(monkeypatch):
+    """Test startup computes the common filter combinations in the background"""
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_PREWARM", True)
+    monkeypatch.setattr(settings, "DEBUG", True)
+    # Prewarming can outlast the check interval; re-reading versions would add queries
+    monkeypatch.setattr(data_versions, "check_interval", 3600)
+    data_versions.reset()
+    with TestClient(app) as client:
+        wait_for(lambda: len(response_cache.entries) == len(prewarm_paths()))
+        response = client.get("/orders/sales-summary")
+
+    assert response.headers["x-db-query-count"] == "0"
+    assert response_cache.stats()["hits"] == 1
+
+
+def test_prewarm_is_not_rate_limited(monkeypatch):
+    """Test prewarming warms every path even with a budget smaller than their total cost"""
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_PREWARM", True)
+    limiter = RateLimiter(limits={60: 2}, budget=TokenBudget(capacity=5, refill_per_second=0))
+    monkeypatch.setattr(rate_limiter, "limiter", limiter)
+    # The conftest override turns the limiter off; this test needs it on
+    app.dependency_overrides.pop(rate_limit_dependency)
+    with TestClient(app):
+        wait_for(lambda: len(response_cache.entries) == len(prewarm_paths()))
+
+    assert limiter.stats()["clients"] == 0
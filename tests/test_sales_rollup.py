@@ -0,0 +1,202 @@
+"""
+Tests for the incrementally maintained sales rollup
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+
+from app.database import engine, primary_session
+from app.main import app
+from app.models import RollupWatermark
+from app.repositories import order_repository, rollup_repository
+from app.utils.data_versions import data_versions
+from app.utils.response_cache import response_cache
+from app.utils.rollup_refresher import rollup_refresher
+from tests.helpers import rounded
+
+
+async def refresh(full: bool = False) -> int:
+    async with primary_session(timeout_ms=0) as db:
+        return await rollup_repository.refresh_sales_rollup(db, overlap_seconds=300, full=full)
+
+
+async def rollup_version() -> int:
+    async with primary_session() as db:
+        return await db.scalar(
+            select(RollupWatermark.version).where(
+                RollupWatermark.name == rollup_repository.SALES_ROLLUP
+            )
+        )
+
+
+def assert_same_groups(rollup_rows, raw_rows):
+    assert len(rollup_rows) == len(raw_rows) > 0
+    for rollup, raw in zip(rollup_rows, raw_rows):
+        assert (rollup.country, rollup.year, rollup.count) == (
+            raw.country,
+            int(raw.year),
+            raw.count,
+        )
+        assert rollup.max == raw.max
+        for metric in ("sum", "average", "median", "p90", "p95", "p99"):
+            assert getattr(rollup, metric) == pytest.approx(float(getattr(raw, metric)))
+
+
+@pytest.mark.asyncio
+async def test_rollup_matches_raw_query():
+    """Test every filter combination returns the same groups as aggregating orders"""
+    await refresh(full=True)
+    async with primary_session() as db:
+        everything, _ = await order_repository.get_sales_summary_from_orders(db)
+        sample = everything[0]
+        for filters in ({}, {"country": sample.country}, {"year": int(sample.year)}):
+            rollup_rows, rollup_total = await order_repository.get_sales_summary(
+                db, metrics=order_repository.SALES_METRICS, **filters
+            )
+            raw_rows, raw_total = await order_repository.get_sales_summary_from_orders(
+                db, metrics=order_repository.SALES_METRICS, **filters
+            )
+            assert rollup_total == raw_total
+            assert_same_groups(rollup_rows, raw_rows)
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh_picks_up_changed_order():
+    """Test only a changed order's group is rewritten, and only then is the version bumped"""
+    await refresh()
+    version = await rollup_version()
+    assert await refresh() == 0
+    assert await rollup_version() == version
+
+    async with primary_session() as db:
+        order_id = await db.scalar(text("SELECT max(id) FROM orders WHERE status = 'delivered'"))
+        bump = text(
+            "UPDATE orders SET total_amount = total_amount + :delta, updated_at = now() "
+            "WHERE id = :id"
+        )
+        await db.execute(bump, {"delta": 1, "id": order_id})
+        await db.commit()
+    try:
+        assert await refresh() == 1
+        assert await rollup_version() == version + 1
+        async with primary_session() as db:
+            metrics = order_repository.SALES_METRICS
+            rollup_rows, _ = await order_repository.get_sales_summary(db, metrics=metrics)
+            raw_rows, _ = await order_repository.get_sales_summary_from_orders(db, metrics=metrics)
+        assert_same_groups(rollup_rows, raw_rows)
+    finally:
+        async with primary_session() as db:
+            await db.execute(bump, {"delta": -1, "id": order_id})
+            await db.commit()
+        await refresh()
+
+
+@pytest.mark.asyncio
+async def test_only_requested_metrics_are_selected():
+    """Test both the rollup read and the raw query select just the requested metrics"""
+    async with primary_session() as db:
+        for fn in (
+            order_repository.get_sales_summary,
+            order_repository.get_sales_summary_from_orders,
+        ):
+            rows, _ = await fn(db, metrics=("count", "sum", "count"))
+            assert rows[0]._fields == ("country", "year", "count", "sum")
+            rows, _ = await fn(db, metrics=("p95",))
+            assert rows[0]._fields == ("country", "year", "count", "p95")
+
+        with pytest.raises(ValueError):
+            await order_repository.get_sales_summary(db, metrics=("p50",))
+
+
+def leave_rollups_unbuilt(monkeypatch):
+    """Starts the app as if the first rollup build were still running"""
+
+    async def first_build(full: bool = False):
+        # Never finishes during the test
+        await asyncio.Event().wait()
+
+    async def nothing_built() -> bool:
+        return False
+
+    monkeypatch.setattr(rollup_refresher, "ready", False)
+    monkeypatch.setattr(rollup_refresher, "refresh", first_build)
+    monkeypatch.setattr(rollup_refresher, "check_built", nothing_built)
+
+
+def test_routes_fall_back_to_orders_until_rollups_are_built(monkeypatch):
+    """Test startup doesn't wait for a first build and routes aggregate orders meanwhile"""
+    # Path and the ranked value to compare (customers tied on it may come back in any order)
+    paths = (
+        ("/orders/sales-summary?metric=sum,max,median,p99", None),
+        ("/orders/sales-timeseries?start_date=2023-01-01&end_date=2025-12-31", None),
+        ("/products/top-revenue?limit=10", None),
+        ("/customers/most-frequent?limit=10", "purchases_count"),
+        ("/customers/high-value?total=false&limit=10", "value"),
+    )
+
+    def results(client):
+        responses = [(client.get(path).json()["results"], value) for path, value in paths]
+        return rounded(
+            [rows if value is None else [r[value] for r in rows] for rows, value in responses]
+        )
+
+    with TestClient(app) as client:
+        from_rollups = results(client)
+
+    leave_rollups_unbuilt(monkeypatch)
+    response_cache.clear()
+    with TestClient(app) as client:
+        from_orders = results(client)
+        # Sketches and merged groups only exist in the rollups
+        response = client.get("/orders/sales-summary?metric=sum&group_by=year")
+    response_cache.clear()
+
+    assert from_orders == from_rollups
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(int(rollup_refresher.interval))
+
+
+def test_fallback_responses_follow_order_changes(monkeypatch):
+    """Test while the rollups aren't built a write to orders changes ETags and cached results"""
+    paths = (
+        "/orders/sales-summary?metric=sum,count",
+        "/orders/sales-timeseries?start_date=2023-01-01&end_date=2025-12-31",
+        "/products/top-revenue?limit=3",
+        "/customers/high-value?limit=3",
+    )
+    leave_rollups_unbuilt(monkeypatch)
+    monkeypatch.setattr(data_versions, "check_interval", 3600)
+    update = text("UPDATE orders SET total_amount = :amount, updated_at = now() WHERE id = :id")
+    with engine.begin() as conn:
+        order_id, amount = conn.execute(
+            text("SELECT id, total_amount FROM orders WHERE status = 'delivered' LIMIT 1")
+        ).one()
+
+    response_cache.clear()
+    data_versions.reset()
+    try:
+        with TestClient(app) as client:
+            before = [client.get(path) for path in paths]
+            with engine.begin() as conn:
+                conn.execute(update, {"amount": amount + 1000, "id": order_id})
+            data_versions.reset()
+            after = [
+                client.get(path, headers={"If-None-Match": response.headers["etag"]})
+                for path, response in zip(paths, before)
+            ]
+    finally:
+        with engine.begin() as conn:
+            conn.execute(update, {"amount": amount, "id": order_id})
+        data_versions.reset()
+        response_cache.clear()
+
+    assert [r.status_code for r in after] == [200] * len(paths)
+    for old, new in zip(before, after):
+        assert new.headers["etag"] != old.headers["etag"]
+    # Computed again rather than served from the cache
+    total = sum(group["metrics"]["sum"] for group in before[0].json()["results"])
+    new_total = sum(group["metrics"]["sum"] for group in after[0].json()["results"])
+    assert new_total == pytest.approx(total + 1000)
@@ -0,0 +1,111 @@
+"""
+Tests for the mergeable order value sketches behind approx sales percentiles
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.database import primary_session
+from app.main import app
+from app.repositories import order_repository, rollup_repository
+
+PERCENTILES = rollup_repository.PERCENTILES
+# Float rounding at bucket edges aside, the sketch's documented bound
+TOLERANCE = rollup_repository.SKETCH_RELATIVE_ACCURACY * 1.0001
+
+
+async def exact_percentiles(db, key: str) -> dict:
+    """percentile_cont of delivered order values per country or year, from orders"""
+    key_sql = {"country": "c.country", "year": "extract(year FROM o.created_at)::int"}[key]
+    columns = ", ".join(
+        f"percentile_cont({fraction}) WITHIN GROUP (ORDER BY o.total_amount) AS {metric}"
+        for metric, fraction in PERCENTILES.items()
+    )
+    rows = await db.execute(
+        text(
+            f"SELECT {key_sql} AS key, {columns} FROM orders o "
+            "JOIN customers c ON c.id = o.customer_id "
+            "WHERE o.status = 'delivered' AND c.country IS NOT NULL GROUP BY 1"
+        )
+    )
+    return {row.key: row for row in rows}
+
+
+def assert_within_bound(approx: float, exact: float):
+    assert abs(approx - exact) <= TOLERANCE * exact
+
+
+@pytest.mark.asyncio
+async def test_approx_percentiles_match_exact_groups():
+    """Test sketch percentiles per (country, year) are within the bound of the exact ones"""
+    async with primary_session(timeout_ms=0) as db:
+        await rollup_repository.refresh_sales_rollup(db, overlap_seconds=300, full=True)
+    async with primary_session() as db:
+        metrics = order_repository.SALES_METRICS
+        approx, approx_total = await order_repository.get_sales_summary(
+            db, metrics=metrics, approx=True
+        )
+        exact, exact_total = await order_repository.get_sales_summary(db, metrics=metrics)
+
+    assert approx_total == exact_total > 0
+    for a, e in zip(approx, exact):
+        assert (a.country, a.year, a.count, a.sum, a.max) == (
+            e.country,
+            e.year,
+            e.count,
+            e.sum,
+            e.max,
+        )
+        for metric in PERCENTILES:
+            assert_within_bound(getattr(a, metric), getattr(e, metric))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("key", ["country", "year"])
+async def test_merged_sketches_match_exact_percentiles(key):
+    """Test percentiles merged across years or countries stay within the bound"""
+    async with primary_session() as db:
+        merged, _ = await order_repository.get_sales_summary(
+            db, metrics=tuple(PERCENTILES) + ("count",), approx=True, group_by=key
+        )
+        exact = await exact_percentiles(db, key)
+
+    assert {getattr(row, key) for row in merged} == set(exact)
+    for row in merged:
+        for metric in PERCENTILES:
+            assert_within_bound(getattr(row, metric), getattr(exact[getattr(row, key)], metric))
+
+
+@pytest.mark.asyncio
+async def test_sketch_counts_match_rollup_counts():
+    """Test every group's sketch holds exactly its delivered orders"""
+    async with primary_session() as db:
+        mismatched = await db.scalar(
+            text(
+                "SELECT count(*) FROM sales_rollup r LEFT JOIN ("
+                "  SELECT country, year, sum(count) AS n FROM sales_value_sketch"
+                "  GROUP BY country, year"
+                ") s USING (country, year) WHERE s.n IS DISTINCT FROM r.count"
+            )
+        )
+    assert mismatched == 0
+
+
+def test_sales_summary_approx_and_group_by():
+    """Test the endpoint merges groups and only allows merged percentiles with approx"""
+    with TestClient(app) as client:
+        response = client.get("/orders/sales-summary?approx=true&group_by=year&metric=sum,p95")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["metadata"]["applied_filters"]["group_by"] == "year"
+        for group in data["results"]:
+            assert "country" not in group
+            assert set(group["metrics"]) == {"count", "sum", "p95"}
+
+        response = client.get("/orders/sales-summary?group_by=country&metric=sum")
+        assert response.status_code == 200
+        assert all("year" not in group for group in response.json()["results"])
+
+        response = client.get("/orders/sales-summary?group_by=country&metric=median")
+        assert response.status_code == 422
@@ -107,6 +107,23 @@ def test_sales_summary_ordering():
                     assert curr["metrics"]["sum"] >= nxt["metrics"]["sum"]
 
 
+def test_sales_summary_several_metrics_and_percentiles():
+    """Test a comma-separated metric list returns exactly those metrics, percentiles included"""
+    with TestClient(app) as client:
+        response = client.get("/orders/sales-summary?metric=p99,sum,p90")
+        assert response.status_code == 200
+        data = response.json()
+
+        assert data["metadata"]["applied_filters"]["metric"] == "sum,p90,p99"
+        for group in data["results"]:
+            metrics = group["metrics"]
+            assert set(metrics) == {"count", "sum", "p90", "p99"}
+            assert metrics["p90"] <= metrics["p99"]
+
+        response = client.get("/orders/sales-summary?metric=sum,,p90")
+        assert response.status_code == 422
+
+
 def test_sales_summary_invalid_metric():
     """Test sales summary with invalid metric parameter"""
     with TestClient(app) as client:
@@ -0,0 +1,101 @@
+"""
+Tests for the sales time series
+"""
+
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.database import primary_session
+from app.main import app
+from app.repositories import order_repository, rollup_repository
+
+
+def test_bucket_starts_follow_date_trunc():
+    """Test buckets start where Postgres date_trunc puts them, and cover the whole range"""
+    starts = order_repository.sales_bucket_starts
+    # 2025-01-01 is a Wednesday; ISO weeks start on Monday
+    assert starts("week", date(2025, 1, 1), date(2025, 1, 13)) == [
+        date(2024, 12, 30),
+        date(2025, 1, 6),
+        date(2025, 1, 13),
+    ]
+    assert starts("month", date(2024, 11, 30), date(2025, 2, 1)) == [
+        date(2024, 11, 1),
+        date(2024, 12, 1),
+        date(2025, 1, 1),
+        date(2025, 2, 1),
+    ]
+    assert starts("quarter", date(2024, 12, 31), date(2025, 4, 1)) == [
+        date(2024, 10, 1),
+        date(2025, 1, 1),
+        date(2025, 4, 1),
+    ]
+    assert len(starts("day", date(2024, 2, 1), date(2024, 3, 1))) == 30
+    with pytest.raises(ValueError):
+        starts("day", date(2000, 1, 1), date(2025, 1, 1))
+
+
+@pytest.mark.asyncio
+async def test_rollup_matches_raw_query():
+    """Test every interval and filter returns the same buckets as aggregating orders"""
+    async with primary_session(timeout_ms=0) as db:
+        await rollup_repository.refresh_product_daily_revenue(db, overlap_seconds=300)
+    async with primary_session() as db:
+        first, last, country, category = (
+            await db.execute(
+                text(
+                    "SELECT min(o.created_at)::date, max(o.created_at)::date, "
+                    "min(c.country), min(p.category) FROM orders o "
+                    "JOIN customers c ON c.id = o.customer_id "
+                    "JOIN order_items i ON i.order_id = o.id "
+                    "JOIN products p ON p.id = i.product_id WHERE o.status = 'delivered'"
+                )
+            )
+        ).one()
+        for interval in order_repository.SALES_INTERVALS:
+            for filters in ({}, {"country": country}, {"category": category}):
+                args = {"start_date": first, "end_date": last, "interval": interval, **filters}
+                rows, total = await order_repository.get_sales_timeseries(db, **args)
+                raw_rows, raw_total = await order_repository.get_sales_timeseries_from_orders(
+                    db, **args
+                )
+                assert total == raw_total == len(rows) > 0
+                assert [r.bucket for r in rows] == [r.bucket for r in raw_rows]
+                assert [r.units for r in rows] == [r.units for r in raw_rows]
+                assert [r.revenue for r in rows] == pytest.approx([r.revenue for r in raw_rows])
+
+
+@pytest.mark.asyncio
+async def test_empty_buckets_are_zero():
+    """Test a range without delivered orders still returns every bucket"""
+    async with primary_session() as db:
+        rows, total = await order_repository.get_sales_timeseries(
+            db, start_date=date(1990, 1, 1), end_date=date(1990, 12, 31), interval="quarter"
+        )
+    assert total == 4
+    assert [(r.revenue, r.units) for r in rows] == [(0.0, 0)] * 4
+
+
+def test_sales_timeseries_endpoint():
+    """Test the endpoint's buckets, metadata and parameter validation"""
+    with TestClient(app) as client:
+        response = client.get(
+            "/orders/sales-timeseries?interval=month&start_date=2025-01-15&end_date=2025-06-30"
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert [r["bucket"] for r in data["results"]] == [
+            f"2025-0{month}-01" for month in range(1, 7)
+        ]
+        assert data["metadata"]["total_groups"] == 6
+        assert data["metadata"]["applied_filters"]["interval"] == "month"
+
+        for query in (
+            "interval=year",
+            "start_date=2025-02-01&end_date=2025-01-01",
+            "interval=day&start_date=2000-01-01&end_date=2025-01-01",
+        ):
+            assert client.get(f"/orders/sales-timeseries?{query}").status_code == 422
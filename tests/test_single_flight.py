@@ -0,0 +1,112 @@
+"""
+Tests for single-flight coalescing of concurrent analytics queries
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import text
+from starlette.requests import Request
+
+from app.database import primary_session
+from app.repositories import order_repository
+from app.utils.dependencies import CLIENT_CLOSED_REQUEST, get_read_db
+from app.utils.single_flight import SingleFlight
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def open_pool():
+    """
+    A pool recreated by dispose() runs its first connect under a blocking
+    mutex, so open it once before the tests connect concurrently
+    """
+    async with primary_session() as db:
+        await db.execute(text("SELECT 1"))
+
+
+def make_request(disconnect_after: float) -> Request:
+    """Builds a request whose client disconnects after the given delay"""
+    started = time.monotonic()
+
+    async def receive():
+        if time.monotonic() - started >= disconnect_after:
+            return {"type": "http.disconnect"}
+        await asyncio.sleep(3600)
+
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []}, receive)
+
+
+async def slow_backend_pid(db, seconds: float):
+    """Stand-in repository function: reports which backend ran it"""
+    await db.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": seconds})
+    return (await db.execute(text("SELECT pg_backend_pid()"))).scalar()
+
+
+async def call(flight: SingleFlight, fn, disconnect_after: float = 3600, **kwargs):
+    async with asynccontextmanager(get_read_db)(make_request(disconnect_after)) as db:
+        return await flight.run(db, fn, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_execution():
+    """Test identical concurrent calls run once and all get the same result"""
+    flight = SingleFlight()
+    pids = await asyncio.gather(*(call(flight, slow_backend_pid, seconds=0.3) for _ in range(10)))
+
+    assert len(set(pids)) == 1
+    assert flight.stats() == {"enabled": True, "in_flight": 0, "executions": 1, "coalesced": 9}
+
+
+@pytest.mark.asyncio
+async def test_different_arguments_and_later_calls_run_separately():
+    """Test only identical calls that overlap in time are coalesced"""
+    flight = SingleFlight()
+    kwargs = [{"year": 2024}, {"year": 2025}, {"year": 2025, "country": "Mexico"}]
+    results = await asyncio.gather(
+        *(call(flight, order_repository.get_sales_summary, **kw) for kw in kwargs)
+    )
+    await call(flight, order_repository.get_sales_summary, year=2024)
+
+    assert len({id(r) for r in results}) == 3
+    assert flight.executions == 4
+    assert flight.coalesced == 0
+
+
+@pytest.mark.asyncio
+async def test_disconnected_caller_leaves_without_cancelling_others():
+    """Test one client leaving gets 499 while the others still get the result"""
+    flight = SingleFlight()
+    leaving = call(flight, slow_backend_pid, disconnect_after=0.2, seconds=1)
+    staying = call(flight, slow_backend_pid, seconds=1)
+    left, pid = await asyncio.gather(leaving, staying, return_exceptions=True)
+
+    assert isinstance(left, HTTPException)
+    assert left.status_code == CLIENT_CLOSED_REQUEST
+    assert isinstance(pid, int)
+
+
+@pytest.mark.asyncio
+async def test_last_caller_leaving_cancels_the_shared_query():
+    """Test the backend query stops once nobody waits for it"""
+    flight = SingleFlight()
+    started = time.monotonic()
+    with pytest.raises(HTTPException):
+        await call(flight, slow_backend_pid, disconnect_after=0.3, seconds=10)
+    assert time.monotonic() - started < 5
+    assert flight.stats()["in_flight"] == 0
+
+    query = text(
+        "SELECT count(*) FROM pg_stat_activity "
+        "WHERE query LIKE 'SELECT pg_sleep(%' AND state = 'active'"
+    )
+    async with primary_session() as db:
+        for _ in range(20):
+            running = (await db.execute(query)).scalar()
+            if running == 0:
+                break
+            await asyncio.sleep(0.1)
+    assert running == 0
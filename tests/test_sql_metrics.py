@@ -0,0 +1,62 @@
+"""
+Tests for per-request SQL instrumentation
+"""
+
+import json
+import logging
+
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database import SLOWEST_STATEMENT_HEADER_CHARS
+from app.main import app
+from app.utils.data_versions import data_versions
+
+
+def test_debug_mode_exposes_query_stats_headers(monkeypatch):
+    """Test debug responses report query count and DB time"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+    monkeypatch.setattr(data_versions, "check_interval", 3600)
+    with TestClient(app) as client:
+        # Read the data versions up front so they aren't counted below
+        client.get("/customers/?limit=1")
+        response = client.get("/customers/most-frequent?limit=3")
+        assert response.status_code == 200
+
+        # Only the ranked query, which carries total_groups; the session's own
+        # SET LOCAL statement_timeout isn't counted
+        assert int(response.headers["x-db-query-count"]) == 1
+        assert float(response.headers["x-db-time-ms"]) >= float(response.headers["x-db-slowest-ms"])
+        slowest = response.headers["x-db-slowest-statement"]
+        # The ranked query on one line, cut short
+        assert slowest.startswith("SELECT customers.name, ") and slowest.endswith("...")
+        assert "\n" not in slowest and len(slowest) == SLOWEST_STATEMENT_HEADER_CHARS
+
+        # Requests that never touch the database report zero
+        response = client.get("/")
+        assert response.headers["x-db-query-count"] == "0"
+        assert "x-db-slowest-statement" not in response.headers
+
+
+def test_query_stats_headers_hidden_outside_debug(monkeypatch):
+    """Test the X-DB-* headers are not sent in production mode"""
+    monkeypatch.setattr(settings, "DEBUG", False)
+    with TestClient(app) as client:
+        response = client.get("/customers/most-frequent?limit=3")
+        assert "x-db-query-count" not in response.headers
+        assert "x-db-slowest-statement" not in response.headers
+
+
+def test_slow_query_log(monkeypatch, caplog):
+    """Test statements over the threshold are logged as structured JSON"""
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.database"):
+        with TestClient(app) as client:
+            client.get("/orders/sales-summary")
+
+    entries = [json.loads(r.getMessage()) for r in caplog.records if r.name == "app.database"]
+    # The startup rollup refresh runs outside any request
+    slow = [e for e in entries if e["event"] == "slow_query" and e["path"] is not None]
+    assert slow
+    assert all(e["path"] == "/orders/sales-summary" for e in slow)
+    assert any("FROM sales_rollup" in e["statement"] for e in slow)
@@ -0,0 +1,128 @@
+"""
+Tests for statement timeout classes and query cancellation on client disconnect
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import exc, text
+from starlette.requests import Request
+
+from app.config import settings
+from app.database import is_query_canceled, primary_session
+from app.main import app
+from app.repositories import order_repository, product_repository
+from app.utils.dependencies import CLIENT_CLOSED_REQUEST, get_db, get_read_db
+from app.utils.single_flight import single_flight
+
+
+def make_request(disconnect_after: float) -> Request:
+    """Builds a request whose client disconnects after the given delay"""
+    started = time.monotonic()
+
+    async def receive():
+        if time.monotonic() - started >= disconnect_after:
+            return {"type": "http.disconnect"}
+        await asyncio.sleep(3600)
+
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []}, receive)
+
+
+@pytest.mark.asyncio
+async def test_timeout_classes_applied_per_dependency():
+    """Test lookup and analytics sessions run with their own statement timeout"""
+    # pg_settings reports statement_timeout in milliseconds
+    query = text("SELECT setting::int FROM pg_settings WHERE name = 'statement_timeout'")
+    async with asynccontextmanager(get_db)() as db:
+        lookup = (await db.execute(query)).scalar()
+    async with asynccontextmanager(get_read_db)(make_request(3600)) as db:
+        analytics = (await db.execute(query)).scalar()
+
+    assert lookup == settings.STATEMENT_TIMEOUT_MS
+    assert analytics == settings.ANALYTICS_STATEMENT_TIMEOUT_MS
+
+
+@pytest.mark.asyncio
+async def test_statement_timeout_cancels_query():
+    """Test a query running past its timeout is cancelled by Postgres"""
+    async with primary_session(timeout_ms=100) as db:
+        with pytest.raises(exc.DBAPIError) as info:
+            await db.execute(text("SELECT pg_sleep(2)"))
+
+    assert is_query_canceled(info.value)
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_cancels_backend_query():
+    """Test the in-flight query stops once the client goes away"""
+    started = time.monotonic()
+    with pytest.raises(HTTPException) as info:
+        async with asynccontextmanager(get_read_db)(make_request(0.3)) as db:
+            await db.execute(text("SELECT pg_sleep(10)"))
+
+    assert info.value.status_code == CLIENT_CLOSED_REQUEST
+    assert time.monotonic() - started < 5
+
+    # The cancel request travels on its own connection, so give it a moment to land
+    query = text(
+        "SELECT count(*) FROM pg_stat_activity "
+        "WHERE query = 'SELECT pg_sleep(10)' AND state = 'active'"
+    )
+    async with primary_session() as db:
+        for _ in range(20):
+            running = (await db.execute(query)).scalar()
+            if running == 0:
+                break
+            await asyncio.sleep(0.1)
+    assert running == 0
+
+
+async def slow_query(db, *args, **kwargs):
+    await db.execute(text("SELECT pg_sleep(2)"))
+
+
+@pytest.mark.parametrize(
+    "path, repository, name",
+    [
+        ("/products/top-revenue", product_repository, "get_top_products_by_revenue"),
+        ("/orders/statuses", order_repository, "get_order_counts_by_status"),
+    ],
+    ids=["top-revenue", "statuses"],
+)
+def test_analytics_route_timeout_returns_504(monkeypatch, path, repository, name):
+    """Test a cancelled analytics query surfaces as 504, not as a generic 500"""
+    monkeypatch.setattr(settings, "ANALYTICS_STATEMENT_TIMEOUT_MS", 100)
+    monkeypatch.setattr(repository, name, slow_query)
+    with TestClient(app) as client:
+        response = client.get(path)
+
+    assert response.status_code == 504
+    assert response.json()["detail"] == "Query exceeded its statement timeout"
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/products/top-revenue",
+        "/orders/sales-summary",
+        "/orders/sales-timeseries",
+        "/customers/per-country",
+        "/customers/most-frequent",
+        "/customers/high-value",
+    ],
+)
+def test_routes_pass_client_disconnect_through(monkeypatch, path):
+    """Test a caller leaving a shared query gets 499, not a 500 wrapping it"""
+
+    async def disconnected(db, fn, **kwargs):
+        raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+
+    monkeypatch.setattr(single_flight, "run", disconnected)
+    with TestClient(app) as client:
+        response = client.get(path)
+
+    assert response.status_code == CLIENT_CLOSED_REQUEST